@@ -0,0 +1,184 @@
+import json
+import os
+import statistics
+import time
+
+import pytest
+
+import synthetic
+
+# 效能測試：預設規模很小，數秒內完成；PFM_BENCH_SCALE 放大所有資料夾結構
+# （50 = 100 萬個空檔案）。結果寫入 results/latest.json，並與 baseline.json 比較，
+# 以 --save-baseline 把這次的結果存為新的基準。
+bench_dir = os.path.dirname(__file__)
+baseline_path = os.path.join(bench_dir, "baseline.json")
+latest_path = os.path.join(bench_dir, "results", "latest.json")
+bench_scale = float(os.environ.get("PFM_BENCH_SCALE", "1"))
+# 比基準慢超過此比例時標記為退步
+bench_tolerance = float(os.environ.get("PFM_BENCH_TOLERANCE", "0.25"))
+
+_results_key = pytest.StashKey[dict]()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--save-baseline",
+        action="store_true",
+        help="把這次的結果存為 benchmarks/baseline.json",
+    )
+    parser.addoption(
+        "--fail-on-regression",
+        action="store_true",
+        help="有項目比基準慢超過 PFM_BENCH_TOLERANCE 時回傳失敗",
+    )
+
+
+def pytest_configure(config):
+    config.stash[_results_key] = {}
+
+
+class BenchRecorder:
+    def __init__(self, results: dict) -> None:
+        self.results = results
+
+    def __call__(
+        self,
+        name: str,
+        func,
+        items: int = 0,
+        nbytes: int = 0,
+        rounds: int = 3,
+        setup=None,
+    ) -> dict:
+        # 整段操作的耗時：取最快的一次計算吞吐量，setup 不計時
+        times = []
+        for _ in range(rounds):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        result = {"min_s": min(times), "median_s": statistics.median(times)}
+        if items:
+            result["items_per_s"] = items / min(times)
+        if nbytes:
+            result["mb_per_s"] = nbytes / min(times) / 1024 / 1024
+        self.results[name] = result
+        return result
+
+    def latency(self, name: str, func, args: list) -> dict:
+        # 單次操作的延遲分布，例如點擊、插入
+        times = []
+        for arg in args:
+            start = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        result = {
+            "min_s": times[0],
+            "median_s": statistics.median(times),
+            "p99_s": times[min(len(times) - 1, int(len(times) * 0.99))],
+            "items_per_s": len(times) / sum(times) if sum(times) else 0.0,
+        }
+        self.results[name] = result
+        return result
+
+
+@pytest.fixture
+def bench(request):
+    return BenchRecorder(request.config.stash[_results_key])
+
+
+@pytest.fixture(scope="session")
+def trees(tmp_path_factory):
+    # 各種資料夾結構只在第一次使用時產生，同一次執行中共用
+    root = tmp_path_factory.mktemp("pfm_bench")
+    made: dict[str, tuple[str, int]] = {}
+    makers = {
+        "flat": synthetic.make_flat_tree,
+        "deep": synthetic.make_deep_tree,
+        "large": synthetic.make_large_files,
+        "mixed": synthetic.make_mixed_tree,
+        "log": synthetic.make_text_log,
+        "duplicates": synthetic.make_duplicate_tree,
+        "archives": synthetic.make_archives,
+        "compare": synthetic.make_compare_trees,
+    }
+
+    def get(kind: str) -> tuple[str, int]:
+        if kind not in made:
+            path = str(root / kind)
+            made[kind] = (path, makers[kind](path, bench_scale))
+        return made[kind]
+
+    return get
+
+
+def _load_baseline() -> dict:
+    try:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # 不同規模的結果無法比較
+    if baseline.get("scale") != bench_scale:
+        return {}
+    return baseline.get("results", {})
+
+
+def _regressions(results: dict, baseline: dict) -> list[tuple[str, float, float]]:
+    slower = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None or old["min_s"] <= 0:
+            continue
+        if result["min_s"] > old["min_s"] * (1 + bench_tolerance):
+            slower.append((name, old["min_s"], result["min_s"]))
+    return slower
+
+
+def pytest_sessionfinish(session, exitstatus):
+    results = session.config.stash.get(_results_key, {})
+    if not results:
+        return
+    data = {"scale": bench_scale, "created": time.time(), "results": results}
+    os.makedirs(os.path.dirname(latest_path), exist_ok=True)
+    with open(latest_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    if session.config.getoption("--save-baseline"):
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+    elif session.config.getoption("--fail-on-regression") and _regressions(
+        results, _load_baseline()
+    ):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = config.stash.get(_results_key, {})
+    if not results:
+        return
+    saved = config.getoption("--save-baseline")
+    # --save-baseline 時 baseline.json 已是這次的結果，不再比較
+    baseline = {} if saved else _load_baseline()
+    write = terminalreporter.write_line
+    terminalreporter.section(f"效能測試結果 (scale={bench_scale:g})")
+    for name, result in sorted(results.items()):
+        line = f"{name:<32} {result['min_s'] * 1000:10.3f} ms"
+        if "p99_s" in result:
+            line += f" (p99 {result['p99_s'] * 1000:.3f} ms)"
+        if "items_per_s" in result:
+            line += f" {result['items_per_s']:14.0f} 項/秒"
+        if "mb_per_s" in result:
+            line += f" {result['mb_per_s']:10.1f} MB/s"
+        old = baseline.get(name)
+        if old is not None and old["min_s"] > 0:
+            change = result["min_s"] / old["min_s"] - 1
+            line += f"  基準 {change:+.0%}"
+            if change > bench_tolerance:
+                line += "  退步"
+        write(line)
+    if saved:
+        write(f"已儲存為基準：{baseline_path}")
+    elif not baseline:
+        write("沒有相同規模的基準，可用 --save-baseline 建立")
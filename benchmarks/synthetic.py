@@ -0,0 +1,157 @@
+import io
+import os
+import random
+import tarfile
+import zipfile
+
+# 產生效能測試用的資料夾結構。數量皆乘上 scale，scale = 50 時平面資料夾為 100 萬個空檔案。
+
+_block = random.Random(0).randbytes(1024 * 1024)
+
+
+def _write_file(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        while size > 0:
+            chunk = _block[: min(size, len(_block))]
+            f.write(chunk)
+            size -= len(chunk)
+
+
+def make_flat_tree(root: str, scale: float) -> int:
+    # 單一資料夾中大量的空檔案，檔名含數字以測試自然排序
+    count = max(1, int(20_000 * scale))
+    os.makedirs(root)
+    for i in range(count):
+        open(os.path.join(root, f"file_{i}.txt"), "wb").close()
+    return count
+
+
+def make_deep_tree(root: str, scale: float) -> int:
+    # 單線深層巢狀資料夾，每層放幾個小檔案；深度受路徑長度限制
+    depth = min(max(1, int(100 * scale)), 1500)
+    current = root
+    os.makedirs(current)
+    for level in range(depth):
+        for i in range(4):
+            _write_file(os.path.join(current, f"f{i}.bin"), 512)
+        current = os.path.join(current, "d")
+        os.mkdir(current)
+    return depth
+
+
+def make_large_files(root: str, scale: float) -> int:
+    # 少數大檔案，測試複製的吞吐量
+    size = max(1024 * 1024, int(8 * 1024 * 1024 * scale))
+    os.makedirs(root)
+    for i in range(4):
+        _write_file(os.path.join(root, f"large_{i}.bin"), size)
+    return size * 4
+
+
+def make_mixed_tree(root: str, scale: float) -> int:
+    # 大小混合的檔案分散在多個子資料夾：多數很小，少數數 MB
+    rng = random.Random(1)
+    count = max(1, int(1000 * scale))
+    total = 0
+    for i in range(count):
+        sub = os.path.join(root, f"dir_{i % 20}")
+        os.makedirs(sub, exist_ok=True)
+        roll = rng.random()
+        if roll < 0.8:
+            size = rng.randint(0, 4 * 1024)
+        elif roll < 0.98:
+            size = rng.randint(4 * 1024, 256 * 1024)
+        else:
+            size = rng.randint(1024 * 1024, 4 * 1024 * 1024)
+        _write_file(os.path.join(sub, f"item_{i}.dat"), size)
+        total += size
+    return total
+
+
+def make_text_log(root: str, scale: float) -> int:
+    # 單一大型文字記錄檔，測試預覽的開啟、捲動與行索引
+    count = max(1, int(200_000 * scale))
+    os.makedirs(root)
+    with open(os.path.join(root, "app.log"), "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(f"2024-01-01 00:00:{i % 60:02d} INFO 第 {i} 行 request done\n")
+    return count
+
+
+def make_duplicate_tree(root: str, scale: float) -> int:
+    # 每 4 個檔案中有 2 個內容相同；另有同大小、只有中間不同的檔案，需要完整雜湊才能區分
+    rng = random.Random(2)
+    count = max(4, int(400 * scale))
+    groups = 0
+    for i in range(0, count, 4):
+        sub = os.path.join(root, f"dir_{i % 10}")
+        os.makedirs(sub, exist_ok=True)
+        size = rng.choice((2 * 1024, 64 * 1024, 1024 * 1024))
+        data = bytearray(rng.randbytes(size))
+        for copy in range(2):
+            with open(os.path.join(sub, f"dup_{i}_{copy}.bin"), "wb") as f:
+                f.write(data)
+        data[size // 2] ^= 0xFF
+        with open(os.path.join(sub, f"near_{i}.bin"), "wb") as f:
+            f.write(data)
+        with open(os.path.join(sub, f"unique_{i}.bin"), "wb") as f:
+            f.write(rng.randbytes(size + 1))
+        groups += 1
+    return groups
+
+
+def make_archives(root: str, scale: float) -> int:
+    # 內容相同的 zip 與 tar.gz，大量小成員分在 100 個資料夾，另有一個較大的 big.bin
+    count = max(1, int(20_000 * scale))
+    os.makedirs(root)
+    members = [
+        (f"dir_{i % 100}/file_{i}.txt", f"member {i}\n".encode()) for i in range(count)
+    ]
+    members.append(("big.bin", _block * 4))
+    with zipfile.ZipFile(
+        os.path.join(root, "data.zip"), "w", zipfile.ZIP_DEFLATED
+    ) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    with tarfile.open(os.path.join(root, "data.tar.gz"), "w:gz", compresslevel=1) as tf:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return count
+
+
+def make_compare_trees(root: str, scale: float) -> int:
+    # left 與 right 兩棵內容與時間相同的樹，只有少數項目不同；回傳不同的項目數。
+    # 每 1000 個檔案中右側有一個大小不同、一個不存在，另有 10 個只在右側的檔案，
+    # 以及一個只有中間一個區塊不同、修改時間不同的 big.bin
+    count = max(1000, int(20_000 * scale))
+    mtime_ns = 1_700_000_000_123_456_789
+    differing = 0
+    for side in ("left", "right"):
+        for d in range(100):
+            os.makedirs(os.path.join(root, side, f"dir_{d}"))
+    for i in range(count):
+        rel = os.path.join(f"dir_{i % 100}", f"file_{i}.txt")
+        data = f"content {i:08d}\n".encode()
+        for side in ("left", "right"):
+            if side == "right" and i % 1000 == 1:
+                differing += 1
+                continue
+            path = os.path.join(root, side, rel)
+            with open(path, "wb") as f:
+                f.write(data + b"!" if side == "right" and i % 1000 == 0 else data)
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        if i % 1000 == 0:
+            differing += 1
+    for i in range(10):
+        with open(os.path.join(root, "right", f"extra_{i}.txt"), "wb") as f:
+            f.write(b"extra\n")
+        differing += 1
+    _write_file(os.path.join(root, "left", "big.bin"), 32 * 1024 * 1024)
+    _write_file(os.path.join(root, "right", "big.bin"), 32 * 1024 * 1024)
+    with open(os.path.join(root, "right", "big.bin"), "r+b") as f:
+        f.seek(16 * 1024 * 1024)
+        f.write(b"changed")
+    os.utime(os.path.join(root, "right", "big.bin"), ns=(mtime_ns, mtime_ns))
+    return differing + 1
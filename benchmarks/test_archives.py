@@ -0,0 +1,169 @@
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+
+import pytest
+
+import vfs
+from copy_engine import CopyProgress
+from vfs import ArchiveFS, VirtualFileSystem, archive_open_limit
+
+
+def _list(fs: ArchiveFS, path: str) -> int:
+    return sum(len(model) for model in fs.scan_batches(path))
+
+
+def test_index_zip(bench, trees, tmp_path):
+    # zip 只讀取中央目錄
+    path, count = trees("archives")
+    archive = os.path.join(path, "data.zip")
+    bench(
+        "archives.index_zip",
+        lambda: ArchiveFS(archive, str(tmp_path)).index(),
+        items=count,
+    )
+    fs = ArchiveFS(archive, str(tmp_path))
+    # 100 個資料夾與 big.bin
+    assert _list(fs, archive) == 101
+    assert _list(fs, os.path.join(archive, "dir_0")) == len(range(0, count, 100))
+
+
+def test_index_tar(bench, trees, tmp_path):
+    # 每次使用空的索引快取，需要串流解壓縮整個 tar.gz
+    path, count = trees("archives")
+    archive = os.path.join(path, "data.tar.gz")
+    runs = iter(range(100))
+
+    def index():
+        ArchiveFS(archive, str(tmp_path / f"cold_{next(runs)}")).index()
+
+    bench("archives.index_tar_cold", index, items=count)
+    fs = ArchiveFS(archive, str(tmp_path / "cached"))
+    fs.index()
+    # 之後從快取的索引載入
+    bench(
+        "archives.index_tar_cached",
+        lambda: ArchiveFS(archive, str(tmp_path / "cached")).index(),
+        items=count,
+        rounds=5,
+    )
+    assert _list(fs, archive) == 101
+
+
+def test_extract_member(bench, trees, tmp_path):
+    # 只解開一個成員：zip 直接讀取該成員，tar.gz 解壓縮到成員位置為止
+    path, count = trees("archives")
+    for name in ("data.zip", "data.tar.gz"):
+        archive = os.path.join(path, name)
+        fs = ArchiveFS(archive, str(tmp_path))
+        fs.index()
+        member = os.path.join(archive, "big.bin")
+        runs = iter(range(100))
+        dst_dirs = []
+
+        def extract():
+            dst_dir = str(tmp_path / f"{name}_{next(runs)}")
+            os.makedirs(dst_dir)
+            progress = CopyProgress()
+            fs.extract([member], dst_dir, progress)
+            assert not progress.errors
+            dst_dirs.append(dst_dir)
+
+        size = fs.index().sizes[fs._member(member)]
+        bench(f"archives.extract_{name}", extract, nbytes=size)
+        assert os.path.getsize(os.path.join(dst_dirs[-1], "big.bin")) == size
+
+
+def test_evicted_archive_still_readable(trees, tmp_path):
+    # 超過 archive_open_limit 被關閉的壓縮檔，持有者之後仍可讀取與解壓縮；
+    # 讀取中的成員在關閉後也能讀完
+    path, _ = trees("archives")
+    zips = []
+    for i in range(archive_open_limit + 2):
+        archive = str(tmp_path / f"copy_{i}.zip")
+        shutil.copyfile(os.path.join(path, "data.zip"), archive)
+        zips.append(archive)
+    vfs = VirtualFileSystem(str(tmp_path / "cache"))
+    first = vfs.filesystem_for(zips[0])
+    first.index()
+    member = os.path.join(zips[0], "big.bin")
+    with first.open(member) as f:
+        head = f.read(10)
+        for archive in zips[1:]:
+            vfs.filesystem_for(archive).index()
+        assert zips[0] not in vfs._archives
+        rest = f.read()
+    with first.open(member) as f:
+        assert f.read() == head + rest
+    dst_dir = tmp_path / "out"
+    dst_dir.mkdir()
+    progress = CopyProgress()
+    first.extract([os.path.join(zips[0], "dir_1")], str(dst_dir), progress)
+    assert not progress.errors
+    assert len(os.listdir(dst_dir / "dir_1")) == len(first.index().children["dir_1"])
+    vfs.shutdown()
+
+
+@pytest.mark.parametrize("name", ["data.zip", "data.tar.gz"])
+def test_extract_contents(trees, tmp_path, name):
+    # 解開整個壓縮檔與單一資料夾，每個檔案的內容都與成員相同
+    path, _ = trees("archives")
+    archive = os.path.join(path, name)
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(archive) as zf:
+            members = {info.filename: zf.read(info) for info in zf.infolist()}
+    else:
+        with tarfile.open(archive) as tf:
+            members = {
+                info.name: tf.extractfile(info).read()
+                for info in tf.getmembers()
+                if info.isfile()
+            }
+    fs = ArchiveFS(archive, str(tmp_path / "cache"))
+    dst_dir = tmp_path / "out"
+    dst_dir.mkdir()
+    progress = CopyProgress()
+    fs.extract([archive, os.path.join(archive, "dir_7")], str(dst_dir), progress)
+    assert not progress.errors
+    assert progress.files_done == len(members) + len(
+        [member for member in members if member.startswith("dir_7/")]
+    )
+    extracted = {}
+    for root, _, files in os.walk(dst_dir / "data"):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            member = os.path.relpath(file_path, dst_dir / "data").replace(os.sep, "/")
+            with open(file_path, "rb") as f:
+                extracted[member] = f.read()
+    assert extracted == members
+    for file_name in os.listdir(dst_dir / "dir_7"):
+        member = f"dir_7/{file_name}"
+        assert (dst_dir / "dir_7" / file_name).read_bytes() == members[member]
+    fs.close()
+
+
+def test_index_cache_pruned(trees, tmp_path, monkeypatch):
+    # 建立 tar 索引後在背景整理索引快取：刪除過期的檔案，
+    # 其餘由最久未使用的開始刪除，直到不超過上限；剛建立的索引保留
+    path, _ = trees("archives")
+    archive = os.path.join(path, "data.tar.gz")
+    ArchiveFS(archive, str(tmp_path / "sized")).index()
+    (index_file,) = os.listdir(tmp_path / "sized")
+    index_size = os.path.getsize(tmp_path / "sized" / index_file)
+    monkeypatch.setattr(vfs, "archive_index_cache_max_bytes", index_size + 4500)
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    now = time.time()
+    for i in range(10):
+        old = cache / f"old_{i}.idx"
+        old.write_bytes(b"x" * 1000)
+        age = vfs.archive_index_cache_max_age + 100 if i < 3 else i * 60
+        os.utime(old, (now - age, now - age))
+    ArchiveFS(archive, str(cache)).index()
+    expected = {index_file, "old_3.idx", "old_4.idx", "old_5.idx", "old_6.idx"}
+    deadline = time.monotonic() + 10
+    while set(os.listdir(cache)) != expected:
+        assert time.monotonic() < deadline, sorted(os.listdir(cache))
+        time.sleep(0.01)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from copy_engine import CopyEngine, CopyProgress
+from dir_compare import (
+    CMP_ONLY_RIGHT,
+    DirectoryComparer,
+    delta_block_size,
+    delta_update,
+)
+from jobs import JOB_DONE, JOB_SYNC_DELTA, JobScheduler
+
+
+def _compare(comparer: DirectoryComparer, root: str, content: bool = False):
+    task = comparer.compare(
+        os.path.join(root, "left"), os.path.join(root, "right"), content
+    )
+    while not task.done:
+        time.sleep(0.005)
+    return task
+
+
+def test_compare_metadata(bench, trees):
+    # 大部分相同時只有 scandir 與 lstat，不讀取內容
+    path, differing = trees("compare")
+    comparer = DirectoryComparer()
+    compared = _compare(comparer, path).compared
+    tasks = []
+    result = bench(
+        "compare.metadata",
+        lambda: tasks.append(_compare(comparer, path)),
+        items=compared,
+    )
+    task = tasks[-1]
+    assert len(task.entries) == differing
+    assert task.hashed_bytes == 0
+    assert not task.errors
+    assert result["min_s"] > 0
+    comparer.shutdown()
+
+
+def test_compare_content(bench, trees):
+    path, differing = trees("compare")
+    comparer = DirectoryComparer()
+    tasks = []
+    bench("compare.content", lambda: tasks.append(_compare(comparer, path, True)))
+    # 大小相同的檔案都讀取比較，結果與只比較時間相同
+    assert len(tasks[-1].entries) == differing
+    assert tasks[-1].hashed_bytes > 0
+    comparer.shutdown()
+
+
+def test_delta_update(bench, trees, tmp_path):
+    # 只有一個區塊不同時只寫入該區塊
+    path, _ = trees("compare")
+    src = os.path.join(path, "left", "big.bin")
+    stale = os.path.join(path, "right", "big.bin")
+    dst = str(tmp_path / "big.bin")
+    written = []
+
+    def update():
+        written.append(delta_update(src, dst, CopyProgress()))
+
+    bench(
+        "compare.delta_update",
+        update,
+        nbytes=os.path.getsize(src),
+        setup=lambda: shutil.copyfile(stale, dst),
+    )
+    assert written[-1] == delta_block_size
+    with open(src, "rb") as a, open(dst, "rb") as b:
+        assert a.read() == b.read()
+
+
+def test_sync(bench, trees, tmp_path):
+    # 同步到右側的副本後再比較，只剩右側多出的檔案
+    path, _ = trees("compare")
+    root = str(tmp_path / "sync")
+    os.makedirs(root)
+    shutil.copytree(os.path.join(path, "left"), os.path.join(root, "left"))
+    shutil.copytree(os.path.join(path, "right"), os.path.join(root, "right"))
+    comparer = DirectoryComparer()
+    task = _compare(comparer, root)
+    scheduler = JobScheduler(CopyEngine())
+
+    def sync():
+        job = scheduler.submit(JOB_SYNC_DELTA, task.sync_paths(), task.right, task.left)
+        while not scheduler.poll_finished():
+            time.sleep(0.005)
+        assert job.status == JOB_DONE
+        assert not job.progress.errors
+
+    bench("compare.sync", sync, items=len(task.entries), rounds=1)
+    after = _compare(comparer, root)
+    assert {state for _, state, _, _ in after.entries} == {CMP_ONLY_RIGHT}
+    assert after.counts[CMP_ONLY_RIGHT] == task.counts[CMP_ONLY_RIGHT]
+    comparer.shutdown()
+
+
+@pytest.mark.parametrize("dst_size", [2.3, 2.5, 2.7, 1.0, 0.0])
+def test_delta_update_sizes(tmp_path, dst_size):
+    # 目標較短、相同或較長，最後一個區塊的內容相同時也要得到與來源相同的檔案
+    src = tmp_path / "src.bin"
+    dst = tmp_path / "dst.bin"
+    src.write_bytes(b"\x07" * int(delta_block_size * 2.5))
+    dst.write_bytes(b"\x07" * int(delta_block_size * dst_size))
+    written = delta_update(str(src), str(dst), CopyProgress())
+    assert dst.read_bytes() == src.read_bytes()
+    if dst_size >= 2.5:
+        assert written == 0
+    else:
+        assert written > 0
@@ -0,0 +1,141 @@
+import errno
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import copy_engine
+from copy_engine import CopyEngine, CopyProgress
+
+
+@pytest.fixture
+def target_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("pfm_copy_target")
+
+
+def _copy(engine: CopyEngine, src: str, dst_root: str) -> CopyProgress:
+    # 每次複製到新的空資料夾，目標已存在的檔案不會影響結果
+    dst = os.path.join(dst_root, "out")
+    shutil.rmtree(dst, ignore_errors=True)
+    os.mkdir(dst)
+    progress = CopyProgress()
+    engine.run([src], dst, progress)
+    assert not progress.errors
+    return progress
+
+
+@pytest.mark.parametrize("kind", ["large", "mixed"])
+def test_copy_tree(bench, trees, target_dir, kind):
+    path, total = trees(kind)
+    engine = CopyEngine()
+    bench(
+        f"copy.{kind}",
+        lambda: _copy(engine, path, str(target_dir)),
+        nbytes=total,
+    )
+    progress = _copy(engine, path, str(target_dir))
+    assert progress.bytes_done == total
+
+
+def test_copy_many_empty(bench, trees, target_dir):
+    # 小檔案的每檔成本：建立、複製中繼資料
+    path, count = trees("flat")
+    engine = CopyEngine()
+    bench(
+        "copy.flat_empty_files",
+        lambda: _copy(engine, path, str(target_dir)),
+        items=count,
+        rounds=1,
+    )
+    assert len(os.listdir(os.path.join(str(target_dir), "out", "flat"))) == count
+
+
+def test_copy_deep(bench, trees, target_dir):
+    path, depth = trees("deep")
+    engine = CopyEngine()
+    bench(
+        "copy.deep",
+        lambda: _copy(engine, path, str(target_dir)),
+        items=depth,
+        rounds=1,
+    )
+
+
+_fsize_limited_copy = """
+import os, resource, signal, sys
+from copy_engine import CopyEngine, CopyProgress
+signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+resource.setrlimit(resource.RLIMIT_FSIZE, (1024 * 1024, resource.RLIM_INFINITY))
+src, dst = sys.argv[1:]
+progress = CopyProgress()
+CopyEngine().run([src], dst, progress)
+print(len(progress.errors), progress.files_done)
+"""
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="需要 RLIMIT_FSIZE")
+def test_failed_copy_removes_partial(tmp_path):
+    # 寫入中途失敗（以 RLIMIT_FSIZE 產生 EFBIG，與 ENOSPC 相同的路徑）時不留下截短的檔案
+    src = tmp_path / "big.bin"
+    src.write_bytes(os.urandom(4 * 1024 * 1024))
+    dst = tmp_path / "out"
+    dst.mkdir()
+    pfm_dir = os.path.join(os.path.dirname(__file__), "..", "src", "pfm")
+    result = subprocess.run(
+        [sys.executable, "-c", _fsize_limited_copy, str(src), str(dst)],
+        env=dict(os.environ, PYTHONPATH=pfm_dir),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ["1", "0"]
+    assert os.listdir(dst) == []
+
+
+def _unsupported(*args):
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+
+@pytest.mark.parametrize("disabled", [0, 1, 2, 3])
+def test_copy_fallbacks(tmp_path, monkeypatch, disabled):
+    # 依序停用 reflink、copy_file_range、sendfile，每一種複製方式都得到相同的內容
+    if disabled >= 1:
+        monkeypatch.setattr(copy_engine, "_reflink", lambda *args: False)
+    if disabled >= 2 and hasattr(os, "copy_file_range"):
+        monkeypatch.setattr(os, "copy_file_range", _unsupported)
+    if disabled >= 3:
+        monkeypatch.setattr(copy_engine, "_sendfile", _unsupported)
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    progress = CopyProgress()
+    CopyEngine().copy_file(str(src), str(dst), progress)
+    assert dst.read_bytes() == data
+    assert progress.bytes_done == len(data)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/cpuinfo"), reason="需要 procfs")
+def test_copy_pseudo_file(tmp_path):
+    # procfs 的檔案大小為 0，核心複製不適用時不能留下空檔案
+    with open("/proc/cpuinfo", "rb") as f:
+        data = f.read()
+    dst = tmp_path / "cpuinfo"
+    CopyEngine().copy_file("/proc/cpuinfo", str(dst), CopyProgress())
+    assert dst.read_bytes() == data
+
+
+@pytest.mark.parametrize("size", [0, 100_000])
+def test_kernel_copy_returns_nothing(tmp_path, monkeypatch, size):
+    # 核心複製第一次就回傳 0（某些核心上的 procfs / FUSE）時改用其他方式，不留下空檔案
+    monkeypatch.setattr(copy_engine, "_reflink", lambda *args: False)
+    monkeypatch.setattr(os, "copy_file_range", lambda *args: 0, raising=False)
+    monkeypatch.setattr(copy_engine, "_sendfile", lambda *args: 0)
+    data = os.urandom(size)
+    src = tmp_path / "src.bin"
+    src.write_bytes(data)
+    dst = tmp_path / "dst.bin"
+    CopyEngine().copy_file(str(src), str(dst), CopyProgress())
+    assert dst.read_bytes() == data
@@ -0,0 +1,77 @@
+import os
+import time
+
+from copy_engine import CopyEngine
+from duplicates import DuplicateFinder
+from jobs import JOB_DONE, JOB_LINK, JobScheduler
+
+
+def _wait(task) -> None:
+    while not task.done:
+        time.sleep(0.005)
+
+
+def test_find_cold(bench, trees, tmp_path):
+    # 每次使用空的雜湊快取
+    path, groups = trees("duplicates")
+    tasks = []
+    runs = iter(range(100))
+
+    def find():
+        finder = DuplicateFinder(cache_root=str(tmp_path / f"cold_{next(runs)}"))
+        task = finder.find(path)
+        _wait(task)
+        finder.shutdown()
+        tasks.append(task)
+
+    result = bench("duplicates.find_cold", find)
+    task = tasks[-1]
+    assert len(task.groups) == groups
+    assert all(len(paths) == 2 for _, _, paths in task.groups)
+    # 大小相同、開頭結尾相同的 near_ 檔案需要完整雜湊才排除
+    assert task.hashed_bytes > 0
+    assert result["min_s"] > 0
+
+
+def test_find_cached(bench, trees, tmp_path):
+    path, groups = trees("duplicates")
+    finder = DuplicateFinder(cache_root=str(tmp_path))
+    _wait(finder.find(path))
+    tasks = []
+
+    def find():
+        task = finder.find(path)
+        _wait(task)
+        tasks.append(task)
+
+    bench("duplicates.find_cached", find, rounds=5)
+    assert len(tasks[-1].groups) == groups
+    assert tasks[-1].hashed_bytes == 0
+    finder.shutdown()
+
+
+def test_link_skips_modified(tmp_path):
+    # 掃描後被修改（大小相同）的檔案不以硬連結取代，其餘指向保留的檔案
+    root = tmp_path / "tree"
+    root.mkdir()
+    for name in ("a", "b", "c"):
+        (root / name).write_bytes(b"same content" * 1000)
+    finder = DuplicateFinder(cache_root=str(tmp_path / "cache"))
+    task = finder.find(str(root))
+    _wait(task)
+    finder.shutdown()
+    ((_, _, paths),) = task.groups
+    keep, *others = paths
+    edited = root / "c"
+    edited.write_bytes(b"edit content" * 1000)
+    st = os.stat(edited)
+    os.utime(edited, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    scheduler = JobScheduler(CopyEngine())
+    job = scheduler.submit(JOB_LINK, others, keep, expected=task.keys)
+    while not scheduler.poll_finished():
+        time.sleep(0.005)
+    assert job.status == JOB_DONE
+    assert len(job.progress.errors) == 1
+    assert os.path.samefile(root / "a", root / "b")
+    assert not os.path.samefile(root / "a", edited)
+    assert edited.read_bytes() == b"edit content" * 1000
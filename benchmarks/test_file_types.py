@@ -0,0 +1,32 @@
+import time
+
+from file_types import FileTypeCache, KIND_IMAGE, unknown_type
+
+
+def _sniffed(cache: FileTypeCache, paths: list[str]) -> None:
+    # 讀取內容判斷類型，等背景工作完成
+    for path in paths:
+        assert cache.type_of(path) == unknown_type
+    done: set[str] = set()
+    deadline = time.monotonic() + 30
+    while len(done) < len(paths):
+        assert time.monotonic() < deadline
+        done.update(cache.poll())
+        time.sleep(0.001)
+
+
+def test_cache_bounded(tmp_path):
+    # 瀏覽大量沒有副檔名的檔案時，路徑與 inode 快取都只保留最近使用的 max_entries 個
+    paths = []
+    for i in range(50):
+        path = tmp_path / f"image_{i}"
+        path.write_bytes(b"\x89PNG\r\n\x1a\n" + bytes([i]))
+        paths.append(str(path))
+    cache = FileTypeCache(max_entries=10)
+    _sniffed(cache, paths[:10])
+    assert cache.type_of(paths[0])[0] == KIND_IMAGE
+    _sniffed(cache, paths[10:19])
+    assert len(cache._by_path) == len(cache._by_inode) == 10
+    # paths[0] 最近使用過，保留；paths[1] 最久未使用，已移除
+    assert paths[0] in cache._by_path and paths[1] not in cache._by_path
+    cache.shutdown()
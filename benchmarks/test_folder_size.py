@@ -0,0 +1,66 @@
+import os
+import time
+
+from folder_size import FolderSizeCalculator, FolderSizeTask
+
+
+def _wait(task: FolderSizeTask) -> FolderSizeTask:
+    deadline = time.monotonic() + 600
+    while not task.done:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    return task
+
+
+def test_folder_size(bench, trees):
+    # 冷快取每次走訪整個樹；之後只重新 stat 檔案，不重新讀取資料夾
+    path, total = trees("mixed")
+    results = []
+    bench(
+        "folder_size.cold",
+        lambda: results.append(_wait(FolderSizeCalculator().calculate(path))),
+    )
+    calculator = FolderSizeCalculator()
+    _wait(calculator.calculate(path))
+    bench(
+        "folder_size.cached",
+        lambda: results.append(_wait(calculator.calculate(path))),
+        rounds=5,
+    )
+    assert all(task.size == total and not task.errors for task in results)
+    calculator.shutdown()
+
+
+def test_changed_file_size(tmp_path):
+    # 檔案就地變大 / 變小時資料夾的 mtime 不變，快取的資料夾仍要得到新的大小；
+    # 硬連結只計算一次
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    log = sub / "app.log"
+    log.write_bytes(b"x" * 1000)
+    (tmp_path / "a.bin").write_bytes(b"y" * 300)
+    os.link(tmp_path / "a.bin", sub / "a_link.bin")
+    calculator = FolderSizeCalculator()
+    assert _wait(calculator.calculate(str(tmp_path))).size == 1300
+    stamp = os.stat(sub).st_mtime_ns
+    with open(log, "ab") as f:
+        f.write(b"x" * 500)
+    assert os.stat(sub).st_mtime_ns == stamp
+    task = _wait(calculator.calculate(str(tmp_path)))
+    assert (task.size, task.files, task.dirs) == (1800, 2, 2)
+    log.write_bytes(b"x" * 10)
+    assert _wait(calculator.calculate(str(tmp_path))).size == 310
+    calculator.shutdown()
+
+
+def test_cache_lru(tmp_path):
+    # 超過 max_cache_dirs 時只移除最久未使用的資料夾
+    dirs = {}
+    for name in "abcd":
+        dirs[name] = str(tmp_path / name)
+        os.mkdir(dirs[name])
+    calculator = FolderSizeCalculator(max_cache_dirs=3)
+    for name in "abcad":
+        _wait(calculator.calculate(dirs[name]))
+    assert set(calculator._cache) == {dirs["a"], dirs["c"], dirs["d"]}
+    calculator.shutdown()
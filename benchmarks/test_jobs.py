@@ -0,0 +1,181 @@
+import errno
+import os
+import time
+
+import pytest
+
+import jobs
+from copy_engine import CopyEngine
+from jobs import (
+    JOB_DELETE,
+    JOB_DONE,
+    JOB_MOVE,
+    JOB_RENAME,
+    JOB_SYNC,
+    JOB_SYNC_DELTA,
+    Job,
+    JobScheduler,
+)
+
+
+@pytest.fixture
+def scheduler():
+    return JobScheduler(CopyEngine())
+
+
+def _run(scheduler: JobScheduler, *args, **kwargs) -> Job:
+    job = scheduler.submit(*args, **kwargs)
+    deadline = time.monotonic() + 60
+    while job not in scheduler.poll_finished():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    assert job.status == JOB_DONE
+    return job
+
+
+def _make_tree(root) -> dict[str, bytes]:
+    files = {
+        "a.txt": b"alpha\n",
+        "sub/b.bin": os.urandom(200_000),
+        "sub/deep/c.txt": b"",
+    }
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return files
+
+
+def _read_tree(root) -> dict[str, bytes]:
+    result = {}
+    for dir_path, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dir_path, name)
+            with open(path, "rb") as f:
+                result[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return result
+
+
+def _other_device_dir(tmp_path) -> str | None:
+    # 跨檔案系統移動需要另一個裝置上可寫入的資料夾
+    for candidate in ("/dev/shm", os.environ.get("XDG_RUNTIME_DIR")):
+        if (
+            candidate
+            and os.path.isdir(candidate)
+            and os.access(candidate, os.W_OK)
+            and os.stat(candidate).st_dev != os.stat(tmp_path).st_dev
+        ):
+            return candidate
+    return None
+
+
+def test_move_same_device(scheduler, tmp_path):
+    # 同一個檔案系統直接改名；目標已有同名項目時改用新的名稱
+    files = _make_tree(tmp_path / "src" / "tree")
+    (tmp_path / "dst" / "tree").mkdir(parents=True)
+    job = _run(
+        scheduler, JOB_MOVE, [str(tmp_path / "src" / "tree")], str(tmp_path / "dst")
+    )
+    assert not job.progress.errors
+    assert os.listdir(tmp_path / "src") == []
+    assert os.listdir(tmp_path / "dst" / "tree") == []
+    (moved,) = set(os.listdir(tmp_path / "dst")) - {"tree"}
+    assert _read_tree(tmp_path / "dst" / moved) == files
+
+
+def test_move_across_devices(scheduler, tmp_path):
+    # 不同檔案系統：複製完成後才刪除來源
+    other = _other_device_dir(tmp_path)
+    if other is None:
+        pytest.skip("沒有其他檔案系統上可寫入的資料夾")
+    files = _make_tree(tmp_path / "tree")
+    dst_dir = tmp_path / "dst"
+    dst_dir.mkdir()
+    src_root = os.path.join(other, f"pfm_move_{os.getpid()}")
+    os.mkdir(src_root)
+    try:
+        source = os.path.join(src_root, "tree")
+        job = _run(scheduler, JOB_MOVE, [str(tmp_path / "tree")], src_root)
+        assert not job.progress.errors
+        assert not os.path.exists(tmp_path / "tree")
+        assert _read_tree(source) == files
+        job = _run(scheduler, JOB_MOVE, [source], str(dst_dir))
+        assert not job.progress.errors
+        assert os.listdir(src_root) == []
+        assert _read_tree(dst_dir / "tree") == files
+    finally:
+        for dir_path, dirs, names in os.walk(src_root, topdown=False):
+            for name in names:
+                os.unlink(os.path.join(dir_path, name))
+            for name in dirs:
+                os.rmdir(os.path.join(dir_path, name))
+        os.rmdir(src_root)
+
+
+def test_move_rename_exdev(scheduler, tmp_path, monkeypatch):
+    # 裝置相同但 rename 回傳 EXDEV（bind mount、btrfs 子磁碟區）時改為複製再刪除
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV), src, None, dst)
+
+    monkeypatch.setattr(os, "rename", cross_device)
+    files = _make_tree(tmp_path / "tree")
+    (tmp_path / "single.txt").write_bytes(b"single")
+    dst_dir = tmp_path / "dst"
+    dst_dir.mkdir()
+    sources = [str(tmp_path / "tree"), str(tmp_path / "single.txt")]
+    job = _run(scheduler, JOB_MOVE, sources, str(dst_dir))
+    assert not job.progress.errors
+    assert sorted(os.listdir(tmp_path)) == ["dst"]
+    assert _read_tree(dst_dir / "tree") == files
+    assert (dst_dir / "single.txt").read_bytes() == b"single"
+
+
+def test_rename_existing(scheduler, tmp_path):
+    # 目標已存在時不覆蓋
+    (tmp_path / "a").write_bytes(b"a")
+    (tmp_path / "b").write_bytes(b"b")
+    job = _run(scheduler, JOB_RENAME, [str(tmp_path / "a")], str(tmp_path / "b"))
+    assert len(job.progress.errors) == 1
+    assert (tmp_path / "a").read_bytes() == b"a"
+    assert (tmp_path / "b").read_bytes() == b"b"
+    job = _run(scheduler, JOB_RENAME, [str(tmp_path / "a")], str(tmp_path / "c"))
+    assert not job.progress.errors
+    assert sorted(os.listdir(tmp_path)) == ["b", "c"]
+
+
+def test_delete_keeps_link_targets(scheduler, tmp_path):
+    # 刪除資料夾時只刪除指向外部資料夾的符號連結，不刪除連結指向的內容
+    outside = tmp_path / "outside"
+    files = _make_tree(outside)
+    tree = tmp_path / "tree"
+    _make_tree(tree)
+    os.symlink(outside, tree / "sub" / "link")
+    job = _run(scheduler, JOB_DELETE, [str(tree)])
+    assert not job.progress.errors
+    assert not os.path.lexists(tree)
+    assert _read_tree(outside) == files
+
+
+@pytest.mark.parametrize("kind", [JOB_SYNC, JOB_SYNC_DELTA])
+def test_sync_overwrites(scheduler, tmp_path, monkeypatch, kind):
+    # 覆蓋不同的檔案、複製缺少的項目；檔案與資料夾互換的項目回報錯誤且不修改。
+    # delta 同步降低門檻，讓較長的目標檔案也經過區塊差異更新
+    monkeypatch.setattr(jobs, "delta_min_size", 0)
+    left = tmp_path / "left"
+    right = tmp_path / "right"
+    files = _make_tree(left)
+    (left / "swap").mkdir()
+    (left / "swap" / "x.txt").write_bytes(b"x")
+    (right / "sub").mkdir(parents=True)
+    (right / "sub" / "b.bin").write_bytes(os.urandom(300_000))
+    (right / "swap").write_bytes(b"file")
+    (right / "extra.txt").write_bytes(b"extra")
+    sources = [str(left / name) for name in ("a.txt", "sub/b.bin", "sub/deep", "swap")]
+    job = _run(scheduler, kind, sources, str(right), str(left))
+    assert len(job.progress.errors) == 1
+    assert (right / "swap").read_bytes() == b"file"
+    assert (right / "extra.txt").read_bytes() == b"extra"
+    synced = _read_tree(right)
+    del synced["swap"], synced["extra.txt"]
+    assert synced == files
+    assert not [name for name in os.listdir(right / "sub") if ".pfm-sync" in name]
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+import pytest
+
+import watcher
+from core import FileManagerCore
+from dir_model import DirectoryModel
+from dir_view import SORT_MTIME, SORT_SIZE
+from listing_cache import ListingCache
+
+
+def test_scan_flat(bench, trees):
+    path, count = trees("flat")
+    result = bench("listing.scan_flat", lambda: DirectoryModel.scan(path), items=count)
+    assert len(DirectoryModel.scan(path)) == count
+    assert result["items_per_s"] > 0
+
+
+def test_core_load_flat(bench, trees):
+    # 經過背景讀取與分批套用，與介面開啟資料夾相同的路徑
+    path, count = trees("flat")
+    core = FileManagerCore(path)
+
+    def load():
+        core.listing_cache.clear()
+        core.refresh_dir_list()
+        assert core.wait_loaded(timeout=600)
+
+    bench("listing.core_load_flat", load, items=count)
+    assert len(core.dir_view) == count
+    core.shutdown()
+
+
+def test_core_revisit_cached(bench, trees):
+    # 快取仍有效時只驗證 stamp
+    path, count = trees("flat")
+    core = FileManagerCore(path)
+    core.refresh_dir_list()
+    core.wait_loaded(timeout=600)
+
+    def revisit():
+        core.refresh_dir_list()
+        assert core.wait_loaded(timeout=600)
+
+    bench("listing.core_revisit_cached", revisit, items=count, rounds=5)
+    assert len(core.dir_view) == count
+    core.shutdown()
+
+
+def test_walk_deep(bench, trees):
+    path, depth = trees("deep")
+
+    def walk():
+        current = path
+        while True:
+            model = DirectoryModel.scan(current)
+            subdirs = [i for i in range(len(model)) if model.is_dir(i)]
+            if not subdirs:
+                break
+            current = model.path_at(subdirs[0])
+
+    bench("listing.walk_deep", walk, items=depth)
+    assert os.path.isdir(path)
+
+
+def _apply_watched(core: FileManagerCore, expected: list[str]) -> list[str]:
+    # 套用監看到的變更，直到顯示的檔名與 expected 相同或逾時
+    deadline = time.monotonic() + 10
+    while True:
+        messages = core.dir_watcher.poll()
+        if messages:
+            core.apply_watcher_messages(messages)
+        names = [core.dir_model.name_at(i) for i in core.dir_view.order]
+        if names == expected or time.monotonic() > deadline:
+            return names
+        time.sleep(0.01)
+
+
+def _set_sort(core: FileManagerCore, sort_key: str) -> None:
+    # 需要 stat 的排序在背景計算，等到排序套用為止
+    sorted_now = core.set_sort(sort_key)
+    deadline = time.monotonic() + 10
+    while not sorted_now:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+        sorted_now = core._check_sort()
+
+
+@pytest.mark.parametrize("mode", ["inotify", "poll"])
+def test_watcher_changes(tmp_path, monkeypatch, mode):
+    # 監看到的新增、刪除與大小改變依大小排序套用到正確的位置，選取跟著項目移動。
+    # 輪詢模式也要察覺就地改寫的檔案（資料夾 mtime 不變）
+    if mode == "poll":
+        monkeypatch.setattr(watcher, "_inotify_libc", lambda: None)
+        monkeypatch.setattr(watcher, "watch_poll_interval", 0.02)
+    for name, size in (("a", 10), ("b", 20), ("c", 30), ("d", 40)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    core = FileManagerCore(str(tmp_path))
+    core.refresh_dir_list()
+    assert core.wait_loaded(timeout=60)
+    _set_sort(core, SORT_SIZE)
+    assert [core.dir_model.name_at(i) for i in core.dir_view.order] == list("abcd")
+    core.click(2)
+    core.click(3, ctrl=True)
+    (tmp_path / "b").unlink()
+    (tmp_path / "e").write_bytes(b"x" * 5)
+    (tmp_path / "c").write_bytes(b"x" * 50)
+    assert _apply_watched(core, list("eadc")) == list("eadc")
+    assert sorted(os.path.basename(p) for p in core.selected_paths()) == ["c", "d"]
+    assert core.selection.focus == core.dir_view.row_of(core.dir_model.find("d"))
+    core.shutdown()
+
+
+def test_stat_sort_off_ui_thread(tmp_path, monkeypatch):
+    # 小列表依大小排序也不在 UI 執行緒 stat，且只計算選擇的排序方式
+    for i in range(50):
+        (tmp_path / f"f{i}").write_bytes(b"x" * ((i * 7) % 50))
+    stat_threads = set()
+    stat = DirectoryModel._stat
+
+    def traced_stat(model, index):
+        stat_threads.add(threading.current_thread())
+        stat(model, index)
+
+    monkeypatch.setattr(DirectoryModel, "_stat", traced_stat)
+    core = FileManagerCore(str(tmp_path))
+    core.refresh_dir_list()
+    assert core.wait_loaded(timeout=60)
+    core._check_sort()
+    _set_sort(core, SORT_SIZE)
+    assert stat_threads and threading.current_thread() not in stat_threads
+    sizes = [core.dir_model.size_at(i) for i in core.dir_view.order]
+    assert sizes == sorted(sizes)
+    assert SORT_MTIME not in core.dir_view._keys
+    core.shutdown()
+
+
+def test_listing_cache_tracks_growth():
+    # 放入快取後才變大的列表（監看變更、檔名索引）也計入記憶體上限
+    cache = ListingCache(max_entries=10, max_bytes=1)
+    first = DirectoryModel.from_names("/first", [f"f{i}" for i in range(100)], 0)
+    cache.max_bytes = first.memory_usage() * 3
+    cache.put("/first", first, (0, 0))
+    second = DirectoryModel.from_names("/second", ["s"], 0)
+    cache.put("/second", second, (0, 0))
+    for i in range(5000):
+        first.append(f"new_{i}", 0)
+    first.find("f0")
+    cache.trim()
+    assert cache.total_bytes <= cache.max_bytes
+    assert "/first" not in cache and "/second" in cache
+    assert cache.total_bytes == second.memory_usage()
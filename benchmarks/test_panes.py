@@ -0,0 +1,106 @@
+import os
+import time
+
+from core import FileManagerCore
+from prefetch import Prefetcher, prefetch_delay, prefetch_max_entries
+
+
+def _wait_prefetched(core: FileManagerCore, path: str) -> None:
+    deadline = time.monotonic() + 60
+    while path not in core.listing_cache:
+        assert time.monotonic() < deadline
+        core.apply_prefetched()
+        time.sleep(0.005)
+
+
+def test_open_prefetched(bench, trees):
+    # 選取資料夾時已在背景預讀，開啟時只驗證 stamp
+    path, count = trees("flat")
+    if count > prefetch_max_entries:
+        return None
+    parent = os.path.dirname(path)
+    core = FileManagerCore(parent)
+
+    def setup():
+        core.change_path(parent)
+        assert core.wait_loaded(timeout=600)
+        core.listing_cache.clear()
+        core.prefetch(path)
+        _wait_prefetched(core, path)
+
+    def open_dir():
+        core.change_path(path)
+        assert core.wait_loaded(timeout=600)
+
+    bench("panes.open_prefetched", open_dir, items=count, setup=setup)
+    assert len(core.dir_view) == count
+    assert core.prefetcher.prefetched >= 3
+    core.shutdown()
+
+
+def test_second_tab_same_dir(bench, trees):
+    # 另一個分頁已開啟的資料夾不重新列出，複製列表後只驗證 stamp
+    path, count = trees("flat")
+    core = FileManagerCore(path)
+    core.refresh_dir_list()
+    assert core.wait_loaded(timeout=600)
+    first = core.dir_model
+
+    def open_tab():
+        core.new_tab()
+        assert core.wait_loaded(timeout=600)
+
+    bench(
+        "panes.second_tab_same_dir",
+        open_tab,
+        items=count,
+        rounds=5,
+        setup=lambda: core.close_tab(1),
+    )
+    assert len(core.panes) == 2
+    assert core.dir_model is not first
+    assert len(core.dir_model) == len(first) == count
+    core.switch_tab(0)
+    assert core.dir_model is first
+    core.shutdown()
+
+
+def test_prefetch_yields_to_foreground(trees):
+    # 前景讀取中不預讀，結束後才開始
+    path, _ = trees("deep")
+    busy = [True]
+    prefetcher = Prefetcher(lambda: busy[0])
+    prefetcher.request(path)
+    time.sleep(prefetch_delay * 3)
+    assert prefetcher.poll() == []
+    busy[0] = False
+    deadline = time.monotonic() + 10
+    results = []
+    while not results:
+        assert time.monotonic() < deadline
+        results = prefetcher.poll()
+        time.sleep(0.005)
+    assert results[0][0] == path
+    prefetcher.shutdown()
+
+
+def test_background_tab_load_not_busy(trees):
+    # 切換到其他分頁後才讀取完成的分頁，訊息留在佇列中，但不再阻擋預讀
+    path, _ = trees("flat")
+    deep, _ = trees("deep")
+    core = FileManagerCore(deep)
+    core.refresh_dir_list()
+    assert core.wait_loaded(timeout=600)
+    core.new_tab(path)
+    core.switch_tab(0)
+    background = core.panes[1]
+    deadline = time.monotonic() + 60
+    while core._foreground_busy():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    assert background.dir_loader.loading
+    core.prefetch(os.path.dirname(path))
+    _wait_prefetched(core, os.path.dirname(path))
+    core.switch_tab(1)
+    assert core.wait_loaded(timeout=600)
+    core.shutdown()
@@ -0,0 +1,94 @@
+import os
+
+from preview import FilePreview, PREVIEW_HEX, PREVIEW_TEXT
+
+
+def test_open_log(bench, trees):
+    # 開啟只讀取開頭判斷編碼，與檔案大小無關
+    path, count = trees("log")
+    log_path = os.path.join(path, "app.log")
+    bench("preview.open_log", lambda: FilePreview(log_path).close(), rounds=5)
+    preview = FilePreview(log_path)
+    assert preview.mode == PREVIEW_TEXT
+    assert preview.encoding == "utf-8"
+    preview.close()
+
+
+def test_index_log(bench, trees):
+    path, count = trees("log")
+    log_path = os.path.join(path, "app.log")
+    previews = []
+
+    def index():
+        preview = FilePreview(log_path)
+        previews.append(preview)
+        preview.start_index()
+        preview._index_thread.join()
+
+    bench("preview.index_log", index, nbytes=os.path.getsize(log_path))
+    assert previews[-1].line_count() == count
+    for preview in previews:
+        preview.close()
+
+
+def test_scroll_log(bench, trees):
+    path, count = trees("log")
+    preview = FilePreview(os.path.join(path, "app.log"))
+    visible = 40
+    offsets = [preview.seek(i / 200) for i in range(200)]
+    bench.latency(
+        "preview.seek_render",
+        lambda offset: preview.lines(offset, visible),
+        offsets,
+    )
+    bench.latency(
+        "preview.scroll_up",
+        lambda offset: preview.scroll(offset, -visible),
+        offsets,
+    )
+    middle = preview.seek(0.5)
+    assert preview.lines(middle, 1)[0].endswith("request done")
+    assert preview.scroll(preview.scroll(middle, 10), -10) == middle
+    preview.close()
+
+
+def test_goto_line(bench, trees):
+    path, count = trees("log")
+    preview = FilePreview(os.path.join(path, "app.log"))
+    preview.start_index()
+    preview._index_thread.join()
+    lines = list(range(0, count, max(1, count // 200)))
+    bench.latency("preview.goto_line", preview.line_offset, lines)
+    for line in lines[:20]:
+        assert preview.lines(preview.line_offset(line), 1)[0].startswith(
+            f"2024-01-01 00:00:{line % 60:02d} INFO 第 {line} 行"
+        )
+    preview.close()
+
+
+def test_hex_large(bench, trees):
+    path, size = trees("large")
+    preview = FilePreview(os.path.join(path, "large_0.bin"))
+    assert preview.mode == PREVIEW_HEX
+    offsets = [preview.seek(i / 200) for i in range(200)]
+    bench.latency(
+        "preview.hex_render", lambda offset: preview.lines(offset, 40), offsets
+    )
+    assert len(preview.lines(preview.seek(1.0), 40)) == 1
+    preview.close()
+
+
+def test_truncated_while_open(tmp_path):
+    # 開啟後被截短（copytruncate 的日誌輪替）時只讀到較短的內容，不會 SIGBUS
+    log_path = tmp_path / "rotating.log"
+    log_path.write_bytes(b"".join(b"line %d\n" % i for i in range(200_000)))
+    preview = FilePreview(str(log_path))
+    end = preview.seek(0.9)
+    os.truncate(log_path, 100)
+    assert preview.lines(end, 40) == []
+    assert preview.lines(preview.start_offset(), 3) == ["line 0", "line 1", "line 2"]
+    assert preview.scroll(end, -5) <= end
+    preview.start_index()
+    preview._index_thread.join()
+    assert preview.line_number(end) is not None
+    preview.close()
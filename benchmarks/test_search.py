@@ -0,0 +1,51 @@
+import os
+import time
+
+from file_index import FileIndex
+
+
+def _build(roots: list[str], cache_root: str) -> FileIndex:
+    index = FileIndex(roots, cache_root)
+    index.start()
+    deadline = time.monotonic() + 600
+    while not index.ready or index.scanning:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    return index
+
+
+def test_search_flat(bench, trees, tmp_path):
+    # 所有檔名都包含查詢字串時，仍要走訪全部符合的檔名才能找出最好的結果
+    path, count = trees("flat")
+    index = _build([path], str(tmp_path))
+    results = {}
+    for name, query in (("prefix", "file_1"), ("substring", "ile_1")):
+        bench(
+            f"search.{name}",
+            lambda: results.__setitem__(query, index.search(query)),
+            items=count,
+        )
+    for query, found in results.items():
+        names = [os.path.basename(p) for p, _ in found]
+        assert names[0] == "file_1.txt"
+        assert all(query in name for name in names)
+    index.shutdown()
+
+
+def test_exact_after_many_matches(tmp_path):
+    # 完全相同與開頭相同的檔名排在最前面，不論前面已走訪多少包含查詢字串的檔名
+    root = tmp_path / "root"
+    many = root / "a"
+    many.mkdir(parents=True)
+    for i in range(6000):
+        (many / f"xreport_{i}").write_bytes(b"")
+    late = root / "b" / "c"
+    late.mkdir(parents=True)
+    for name in ("report", "report_2024.txt", "Quarterly Report.pdf"):
+        (late / name).write_bytes(b"")
+    index = _build([str(root)], str(tmp_path))
+    names = [os.path.basename(p) for p, _ in index.search("report", limit=20)]
+    assert names[:3] == ["report", "report_2024.txt", "Quarterly Report.pdf"]
+    assert len(names) == 20
+    assert all(name.startswith("xreport_") for name in names[3:])
+    index.shutdown()
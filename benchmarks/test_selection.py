@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from core import CLICK_SELECT, FileManagerCore
+
+
+@pytest.fixture(scope="module")
+def loaded_core(trees):
+    path, _ = trees("flat")
+    core = FileManagerCore(path)
+    core.refresh_dir_list()
+    assert core.wait_loaded(timeout=600)
+    while not core._check_sort():
+        core._sort_thread.join()
+    yield core
+    core.shutdown()
+
+
+def test_click(bench, loaded_core):
+    # 點擊的命中判斷與單選，成本應與列表大小無關
+    core = loaded_core
+    rng = random.Random(0)
+    rows = [rng.randrange(len(core.dir_view)) for _ in range(2000)]
+    bench.latency("selection.click", core.click, rows)
+    assert core.click(rows[-1] + 1 if rows[-1] + 1 < len(core.dir_view) else 0) == (
+        CLICK_SELECT
+    )
+
+
+def test_ctrl_toggle(bench, loaded_core):
+    core = loaded_core
+    core.selection.clear()
+    rng = random.Random(1)
+    rows = rng.sample(range(len(core.dir_view)), min(2000, len(core.dir_view)))
+    bench.latency("selection.ctrl_toggle", lambda row: core.click(row, ctrl=True), rows)
+    assert len(core.selection) == len(rows)
+
+
+def test_select_all_range(bench, loaded_core):
+    # shift 範圍選取整個列表，再取出所有選取的路徑
+    core = loaded_core
+    count = len(core.dir_view)
+
+    def select_all():
+        core.selection.clear()
+        core.click(0)
+        core.click(count - 1, shift=True)
+
+    bench("selection.range_all", select_all, items=count)
+    bench("selection.selected_paths", core.selected_paths, items=count)
+    assert len(core.selected_paths()) == count
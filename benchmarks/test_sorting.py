@@ -0,0 +1,167 @@
+import random
+
+import pytest
+
+from dir_model import DirectoryModel, KIND_DIR, KIND_FILE
+from dir_view import (
+    DirectoryView,
+    SORT_MTIME,
+    SORT_NAME,
+    SORT_SIZE,
+    SORT_TYPE,
+    sort_modes,
+)
+
+
+@pytest.fixture(scope="module")
+def flat_model(trees):
+    path, _ = trees("flat")
+    return DirectoryModel.scan(path)
+
+
+def test_first_sort(bench, flat_model):
+    # 沒有快取的排序鍵，每種排序方式各從頭排序一次
+    count = len(flat_model)
+    for mode in sort_modes:
+        bench(
+            f"sorting.first_{mode}",
+            lambda: DirectoryView(flat_model, mode).sort(),
+            items=count,
+        )
+
+
+def test_precompute(bench, flat_model):
+    bench(
+        "sorting.precompute_all",
+        lambda: DirectoryView(flat_model).precompute(sort_modes),
+        items=len(flat_model),
+        rounds=1,
+    )
+
+
+def test_switch_cached(bench, flat_model):
+    # 排序鍵計算完成後切換排序方式與反向
+    view = DirectoryView(flat_model)
+    view.precompute(sort_modes)
+    modes = [(mode, reverse) for mode in sort_modes for reverse in (False, True)]
+    bench.latency("sorting.switch_cached", lambda args: view.sort(*args), modes * 5)
+    view.sort(SORT_NAME, reverse=False)
+    names = [flat_model.name_at(view.index_at(row)) for row in range(3)]
+    assert names == ["file_0.txt", "file_1.txt", "file_2.txt"]
+
+
+def test_filter(bench, flat_model):
+    view = DirectoryView(flat_model)
+    view.sort()
+
+    def typing():
+        view.set_filter("")
+        for length in range(1, 8):
+            view.set_filter("file_12"[:length])
+
+    bench("sorting.filter_typing", typing, items=len(flat_model))
+    assert all("file_12" in flat_model.name_at(i) for i in view.order)
+
+
+def test_insert_remove(bench, flat_model):
+    # 監看到的單一項目變更，插入到已排序的位置
+    model = DirectoryModel.from_names(
+        flat_model.path, list(flat_model.iter_names()), KIND_FILE
+    )
+    view = DirectoryView(model, SORT_SIZE)
+    view.sort()
+    view.sort(SORT_NAME)
+    rng = random.Random(0)
+    names = [f"new_{rng.randint(0, 10**9)}.txt" for _ in range(200)]
+    indices = []
+
+    def insert(name):
+        index = model.append(name, KIND_FILE, 0, 0)
+        indices.append(index)
+        view.insert(index)
+
+    bench.latency("sorting.insert_one", insert, names)
+
+    def remove(index):
+        view.remove(index)
+        model.remove(index)
+
+    bench.latency("sorting.remove_one", remove, indices)
+    assert len(view) == len(flat_model)
+    for mode in (SORT_MTIME, SORT_TYPE):
+        view.sort(mode)
+
+
+def test_remove_batch(bench, flat_model):
+    # 一批變更每個陣列只重建一次，以二分搜尋找位置，不逐一 array.remove
+    model = DirectoryModel.from_names(
+        flat_model.path, list(flat_model.iter_names()), KIND_FILE
+    )
+    view = DirectoryView(model)
+    view.precompute()
+    view.sort()
+    rng = random.Random(2)
+    removed = rng.sample(range(len(model)), min(1000, len(model) // 2))
+
+    def remove():
+        for index in removed:
+            model.remove(index)
+        view.apply_changes(removed, [], [])
+
+    bench("sorting.remove_batch", remove, items=len(removed), rounds=1)
+    assert len(view) == len(model) - len(removed)
+    assert all(view.row_of(index) == -1 for index in removed)
+
+
+def _random_entry(rng: random.Random, model: DirectoryModel) -> int:
+    kind = KIND_DIR if rng.random() < 0.2 else KIND_FILE
+    name = f"e{rng.randrange(10**9)}_{len(model)}.{rng.choice('abc')}"
+    return model.append(name, kind, rng.randrange(100), rng.randrange(100))
+
+
+@pytest.mark.parametrize("mode", sort_modes)
+@pytest.mark.parametrize("reverse", [False, True])
+def test_apply_changes_matches_sort(mode, reverse):
+    # 隨機的增刪改套用後，顯示順序、各排序方式的遞增順序都與重新排序相同
+    rng = random.Random(3)
+    model = DirectoryModel("/")
+    for _ in range(500):
+        _random_entry(rng, model)
+    view = DirectoryView(model, mode, reverse)
+    view.precompute()
+    view.sort()
+    view.set_filter("1")
+    live = list(model.live_indices())
+    for _ in range(30):
+        removed = rng.sample(live, rng.randrange(8))
+        for index in removed:
+            model.remove(index)
+        live = [index for index in live if index not in removed]
+        changed = rng.sample(live, rng.randrange(8))
+        for index in changed:
+            model.set_stat(index, rng.randrange(100), rng.randrange(100))
+        added = [_random_entry(rng, model) for _ in range(rng.randrange(8))]
+        live += added
+        shown = list(view.order)
+        removed_rows, inserted_rows = view.apply_changes(removed, added, changed)
+        assert removed_rows == sorted(
+            shown.index(index) for index in removed + changed if index in shown
+        )
+        assert [view.order[row] for row in inserted_rows] == [
+            index for index in view.order if index in added + changed
+        ]
+        expected = DirectoryView(model, mode, reverse)
+        expected.sort()
+        expected.set_filter("1")
+        assert list(view.order) == list(expected.order)
+        for index in live:
+            assert view.row_of(index) == (
+                view.order.index(index) if index in view.order else -1
+            )
+        for other in sort_modes:
+            view.sort(other, reverse=False)
+            expected = DirectoryView(model, other)
+            expected.sort()
+            expected.set_filter("1")
+            assert list(view.order) == list(expected.order)
+        view.sort(mode, reverse)
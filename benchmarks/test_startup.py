@@ -0,0 +1,93 @@
+import glob
+import os
+import subprocess
+import sys
+import tokenize
+
+import pytest
+
+from core import startup_target_ms
+from ui_glyphs import ui_glyphs
+
+pfm_dir = os.path.join(os.path.dirname(__file__), "..", "src", "pfm")
+
+
+def _source_glyphs() -> set[str]:
+    # 各模組字串常數中的非 ASCII 字元（不含註解）
+    chars = set()
+    for source_path in glob.glob(os.path.join(pfm_dir, "*.py")):
+        with open(source_path, "rb") as f:
+            for token in tokenize.tokenize(f.readline):
+                if token.type in (tokenize.STRING, tokenize.FSTRING_MIDDLE):
+                    chars.update(c for c in token.string if ord(c) > 0xFF)
+    return chars
+
+
+def test_ui_glyphs_cover_sources():
+    missing = "".join(sorted(_source_glyphs() - set(ui_glyphs)))
+    assert not missing, f"ui_glyphs 缺少字元：{missing}"
+
+
+_headless_startup = """
+import sys
+import app_launcher, file_index, file_types, folder_size, icon_atlas, thumbnails
+from core import FileManagerCore
+core = FileManagerCore(sys.argv[1])
+core.refresh_dir_list()
+assert core.wait_loaded(timeout=60)
+core.shutdown()
+print(" ".join(sorted(set(sys.argv[2:]) & set(sys.modules))))
+"""
+
+# 壓縮檔與縮圖行程池第一次使用時才匯入
+_lazy_modules = (
+    "concurrent.futures.process",
+    "gzip",
+    "multiprocessing",
+    "tarfile",
+    "zipfile",
+)
+
+
+def test_headless_startup(bench, tmp_path):
+    # 不需要 dearpygui 與顯示環境：啟動直譯器、匯入介面以外的模組、讀取第一個資料夾，
+    # 必須在 startup_target_ms 內完成，且不匯入 _lazy_modules
+    for i in range(200):
+        (tmp_path / f"file_{i}.txt").write_bytes(b"")
+    outputs = []
+
+    def start():
+        result = subprocess.run(
+            [sys.executable, "-c", _headless_startup, str(tmp_path), *_lazy_modules],
+            env=dict(os.environ, PYTHONPATH=pfm_dir),
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=60,
+        )
+        outputs.append(result.stdout.strip())
+
+    result = bench("startup.headless_listing", start)
+    assert outputs[-1] == ""
+    assert result["min_s"] * 1000 < startup_target_ms
+
+
+def test_startup(bench):
+    # 從啟動直譯器到畫出第一幀後結束，需要 dearpygui 與顯示環境
+    pytest.importorskip("dearpygui.dearpygui")
+    pytest.importorskip("pt")
+    if sys.platform.startswith("linux") and not (
+        os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")
+    ):
+        pytest.skip("沒有顯示環境")
+    env = dict(os.environ, PFM_STARTUP_BENCH="1")
+
+    def start():
+        subprocess.run(
+            [sys.executable, os.path.join(pfm_dir, "pfm.py")],
+            env=env,
+            check=True,
+            timeout=60,
+        )
+
+    bench("startup.first_frame", start)
@@ -0,0 +1,81 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+
+# 快取資料夾：Linux 依 XDG_CACHE_HOME，Windows 使用 LOCALAPPDATA，macOS 使用 ~/Library/Caches
+def cache_dir(name: str) -> str:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "positive_file_manager", name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# 每個快取資料夾每次執行只整理一次
+_pruned: set[str] = set()
+_pruned_lock = threading.Lock()
+
+
+def prune_cache_dir(path: str, max_bytes: int, max_age: float) -> tuple[int, int]:
+    # 刪除超過 max_age 秒未使用的檔案，之後由最久未使用的開始刪除，直到總大小不超過 max_bytes。
+    # 讀取快取不一定更新 atime（relatime），以 atime 與 mtime 較新的一個為最後使用時間。
+    # 回傳 (刪除的檔案數, 剩餘的總大小)
+    entries = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            file_path = os.path.join(root, name)
+            try:
+                st = os.stat(file_path, follow_symlinks=False)
+            except OSError:
+                continue
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, file_path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - max_age
+    removed = 0
+    for used, size, file_path in entries:
+        if used >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed, total
+
+
+def prune_cache_dir_later(path: str, max_bytes: int, max_age: float) -> None:
+    # 在背景執行緒整理快取資料夾，不阻擋呼叫端
+    with _pruned_lock:
+        if path in _pruned:
+            return None
+        _pruned.add(path)
+    threading.Thread(
+        target=_prune_logged,
+        args=(path, max_bytes, max_age),
+        name="pfm-cache-prune",
+        daemon=True,
+    ).start()
+    return None
+
+
+def _prune_logged(path: str, max_bytes: int, max_age: float) -> None:
+    removed, total = prune_cache_dir(path, max_bytes, max_age)
+    if removed:
+        pfm_logger.info(
+            "已整理快取資料夾：「 %s 」刪除 %d 個檔案，剩餘 %d bytes",
+            path,
+            removed,
+            total,
+        )
+    return None
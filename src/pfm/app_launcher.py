@@ -0,0 +1,65 @@
+import logging
+import os
+import platform
+import subprocess
+import time
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 以預設程式開啟檔案：啟動獨立的子行程後立即返回，不等待。xdg-open 可能要到開啟的程式
+# 結束才返回，因此只記錄子行程，由 poll 定期回收並回報失敗的結束代碼。
+poll_interval = 0.5
+
+
+class AppLauncher:
+    def __init__(self) -> None:
+        self.system = platform.system()
+        # (子行程, 路徑)
+        self._processes: list[tuple[subprocess.Popen, str]] = []
+        self._poll_time = 0.0
+
+    def _command(self, full_path: str) -> list[str]:
+        if self.system == "Darwin":
+            return ["open", full_path]
+        if self.system == "Linux":
+            return ["xdg-open", full_path]
+        raise OSError(f"無法開啟檔案，不支援的系統：{self.system}")
+
+    def launch(self, full_path: str) -> None:
+        # 無法啟動時丟出 OSError，開啟失敗則由之後的 poll 回報
+        if self.system == "Windows":
+            # startfile 不等待開啟的程式
+            os.startfile(full_path)
+            return None
+        process = subprocess.Popen(
+            self._command(full_path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            # 新的 session：不接收終端機的訊號，檔案管理員結束後開啟的程式繼續執行
+            start_new_session=True,
+        )
+        self._processes.append((process, full_path))
+        pfm_logger.debug("開啟檔案：「 %s 」，pid %d", full_path, process.pid)
+        return None
+
+    def poll(self) -> list[tuple[str, int]]:
+        # 回收已結束的子行程，回傳失敗的 (路徑, 結束代碼)
+        now = time.monotonic()
+        if not self._processes or now - self._poll_time < poll_interval:
+            return []
+        self._poll_time = now
+        failed = []
+        running = []
+        for process, full_path in self._processes:
+            code = process.poll()
+            if code is None:
+                running.append((process, full_path))
+            elif code != 0:
+                pfm_logger.warning(
+                    "開啟檔案失敗：「 %s 」，結束代碼 %d", full_path, code
+                )
+                failed.append((full_path, code))
+        self._processes = running
+        return failed
@@ -0,0 +1,339 @@
+import errno
+import logging
+import os
+import shutil
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrument import traced
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# Linux FICLONE ioctl，btrfs / xfs 等支援 reflink 的檔案系統可以直接共用資料區塊
+FICLONE = 0x40049409
+
+# 核心複製每次處理的量，同時也是進度回報與取消檢查的間隔
+kernel_copy_chunk = 64 * 1024 * 1024
+
+# 這些錯誤代表核心複製不適用於這對檔案，改用下一種方式
+_fallback_errnos = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.ETXTBSY,
+    errno.EPERM,
+}
+
+
+class CopyCancelledError(Exception):
+    pass
+
+
+class CopyProgress:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.files_found = 0
+        self.files_done = 0
+        self.bytes_found = 0
+        self.bytes_done = 0
+        self.errors: list[str] = []
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.cancel_event = threading.Event()
+        # 清除時暫停，複製執行緒在 checkpoint 等待
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+
+    def add_found(self, size: int) -> None:
+        with self._lock:
+            self.files_found += 1
+            self.bytes_found += size
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self.bytes_done += size
+
+    def file_done(self) -> None:
+        with self._lock:
+            self.files_done += 1
+
+    def add_error(self, msg: str) -> None:
+        with self._lock:
+            self.errors.append(msg)
+
+    def finish(self) -> None:
+        self.finished = time.monotonic()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        self.resume_event.set()
+
+    def pause(self) -> None:
+        self.resume_event.clear()
+
+    def resume(self) -> None:
+        self.resume_event.set()
+
+    def checkpoint(self) -> None:
+        self.resume_event.wait()
+        if self.cancel_event.is_set():
+            raise CopyCancelledError
+
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return 0.0
+        return self.bytes_done / elapsed
+
+
+def unique_destination(dst: str) -> str:
+    # 目標已存在時改名為「名稱 (n).副檔名」，不覆蓋既有檔案
+    if not os.path.lexists(dst):
+        return dst
+    root, ext = os.path.splitext(dst)
+    if os.path.isdir(dst):
+        root, ext = dst, ""
+    n = 1
+    while os.path.lexists(f"{root} ({n}){ext}"):
+        n += 1
+    return f"{root} ({n}){ext}"
+
+
+class CopyEngine:
+    def __init__(
+        self, max_workers: int = 8, buffer_size: int = 8 * 1024 * 1024
+    ) -> None:
+        self.max_workers = max_workers
+        self.buffer_size = buffer_size
+
+    def start(self, sources: list[str], dst_dir: str) -> CopyProgress:
+        # 在背景執行緒複製，UI 只讀取回傳的 CopyProgress
+        progress = CopyProgress()
+        thread = threading.Thread(
+            target=self.run,
+            args=(sources, dst_dir, progress),
+            name="pfm-copy",
+            daemon=True,
+        )
+        thread.start()
+        return progress
+
+    @traced("copy")
+    def run(self, sources: list[str], dst_dir: str, progress: CopyProgress) -> None:
+        try:
+            self.copy_sources(sources, dst_dir, progress)
+        finally:
+            progress.finish()
+        pfm_logger.info(
+            "複製完成：%d 個檔案，%d bytes，%.1f MB/s，錯誤 %d 個",
+            progress.files_done,
+            progress.bytes_done,
+            progress.bytes_per_second() / 1024 / 1024,
+            len(progress.errors),
+        )
+        return None
+
+    def copy_sources(
+        self, sources: list[str], dst_dir: str, progress: CopyProgress
+    ) -> list[str]:
+        # 回傳每個來源實際複製到的路徑，失敗或略過的來源不會出現在結果中
+        if not os.path.isdir(dst_dir):
+            progress.add_error(f"目標不是資料夾：{dst_dir}")
+            return []
+        copied: list[str] = []
+        # 限制尚未完成的工作數，走訪不會一次把整棵樹放進記憶體
+        slots = threading.BoundedSemaphore(self.max_workers * 4)
+        copied_dirs: list[tuple[str, str]] = []
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="pfm-copy-worker"
+        ) as pool:
+            for src in sources:
+                try:
+                    progress.checkpoint()
+                except CopyCancelledError:
+                    break
+                src = os.path.normpath(src)
+                dst = unique_destination(os.path.join(dst_dir, os.path.basename(src)))
+                real_src = os.path.realpath(src)
+                if os.path.realpath(dst).startswith(real_src + os.sep):
+                    progress.add_error(f"無法將資料夾複製到自己底下：{src}")
+                    continue
+                self._copy_source(src, dst, pool, slots, progress, copied_dirs)
+                copied.append(dst)
+        # 資料夾的時間要在所有檔案寫入後才設定，由深到淺套用
+        for src_dir, dst_dir_path in reversed(copied_dirs):
+            try:
+                shutil.copystat(src_dir, dst_dir_path)
+            except OSError as e:
+                progress.add_error(f"{dst_dir_path}：{e}")
+        return copied
+
+    def _copy_source(self, src, dst, pool, slots, progress, copied_dirs) -> None:
+        try:
+            st = os.lstat(src)
+        except OSError as e:
+            progress.add_error(f"{src}：{e}")
+            return None
+        if not stat.S_ISDIR(st.st_mode):
+            self._submit(src, dst, st, pool, slots, progress)
+            return None
+        # 以堆疊走訪來源資料夾，邊走訪邊送出複製工作
+        stack = [(src, dst)]
+        while stack:
+            try:
+                progress.checkpoint()
+            except CopyCancelledError:
+                return None
+            src_dir, dst_dir = stack.pop()
+            try:
+                os.mkdir(dst_dir)
+                copied_dirs.append((src_dir, dst_dir))
+                with os.scandir(src_dir) as it:
+                    for entry in it:
+                        entry_dst = os.path.join(dst_dir, entry.name)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, entry_dst))
+                        else:
+                            entry_st = entry.stat(follow_symlinks=False)
+                            self._submit(
+                                entry.path, entry_dst, entry_st, pool, slots, progress
+                            )
+            except OSError as e:
+                progress.add_error(f"{src_dir}：{e}")
+        return None
+
+    def _submit(self, src, dst, st, pool, slots, progress) -> None:
+        progress.add_found(st.st_size)
+        slots.acquire()
+        future = pool.submit(self._copy_entry, src, dst, st, progress)
+        future.add_done_callback(lambda _: slots.release())
+
+    def _copy_entry(
+        self, src: str, dst: str, st: os.stat_result, progress: CopyProgress
+    ) -> None:
+        try:
+            progress.checkpoint()
+            if stat.S_ISLNK(st.st_mode):
+                os.symlink(os.readlink(src), dst)
+                shutil.copystat(src, dst, follow_symlinks=False)
+            elif stat.S_ISREG(st.st_mode):
+                self.copy_file(src, dst, progress)
+                shutil.copystat(src, dst)
+            else:
+                progress.add_error(f"略過特殊檔案：{src}")
+                return None
+            progress.file_done()
+        except CopyCancelledError:
+            pass
+        except OSError as e:
+            progress.add_error(f"{src}：{e}")
+        return None
+
+    @traced("copy.file")
+    def copy_file(self, src: str, dst: str, progress: CopyProgress) -> None:
+        # dst 由這裡建立；取消或複製中途失敗（ENOSPC、EIO、關閉時的錯誤）時刪除，
+        # 不留下大小不足卻看似完整的檔案
+        with open(src, "rb") as fsrc:
+            fdst = open(dst, "xb")
+            try:
+                with fdst:
+                    self._copy_data(fsrc, fdst, progress)
+            except BaseException:
+                _remove_partial(dst)
+                raise
+        return None
+
+    def _copy_data(self, fsrc, fdst, progress: CopyProgress) -> None:
+        # 依序嘗試 reflink、copy_file_range、sendfile，都不支援時以緩衝區複製
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        if _reflink(src_fd, dst_fd, progress):
+            return None
+        if hasattr(os, "copy_file_range") and _kernel_copy(
+            os.copy_file_range, src_fd, dst_fd, progress
+        ):
+            return None
+        if sys.platform.startswith("linux") and _kernel_copy(
+            _sendfile, src_fd, dst_fd, progress
+        ):
+            return None
+        self._buffer_copy(fsrc, fdst, progress)
+        return None
+
+    def _buffer_copy(self, fsrc, fdst, progress: CopyProgress) -> None:
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            progress.checkpoint()
+            size = fsrc.readinto(buffer)
+            if not size:
+                break
+            fdst.write(view[:size])
+            progress.add_bytes(size)
+        return None
+
+
+def _reflink(src_fd: int, dst_fd: int, progress: CopyProgress) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError:
+        return False
+    progress.add_bytes(os.fstat(src_fd).st_size)
+    return True
+
+
+def _sendfile(src_fd: int, dst_fd: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, None, count)
+
+
+def _kernel_copy(copy_func, src_fd: int, dst_fd: int, progress: CopyProgress) -> bool:
+    # 回傳 False 代表一個位元組都還沒複製就不支援，呼叫端可以改用其他方式。
+    # procfs / sysfs 與部分 FUSE 檔案在某些核心上第一次就回傳 0 而不是錯誤，
+    # 除非來源確實是空檔案，否則也改用其他方式，避免留下空的目標檔案
+    copied = 0
+    while True:
+        progress.checkpoint()
+        try:
+            size = copy_func(src_fd, dst_fd, kernel_copy_chunk)
+        except OSError as e:
+            if copied == 0 and e.errno in _fallback_errnos:
+                return False
+            raise
+        if size == 0:
+            if copied == 0 and not _known_empty(src_fd):
+                return False
+            return True
+        copied += size
+        progress.add_bytes(size)
+
+
+def _known_empty(src_fd: int) -> bool:
+    # 一般檔案大小為 0 才確定是空檔案；偽檔案的 st_size 通常也是 0，以讀取一個位元組確認
+    try:
+        st = os.fstat(src_fd)
+        if not stat.S_ISREG(st.st_mode):
+            return False
+        return st.st_size == 0 and not os.pread(src_fd, 1, 0)
+    except OSError:
+        return False
+
+
+def _remove_partial(dst: str) -> None:
+    try:
+        os.remove(dst)
+    except OSError:
+        pass
@@ -0,0 +1,624 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from dir_model import DirectoryModel, KIND_DIR
+from dir_loader import (
+    LOADER_BATCH,
+    LOADER_DONE,
+    LOADER_ERROR,
+    LOADER_STAMP,
+    LOADER_VALID,
+)
+from dir_view import DirectoryView
+from listing_cache import ListingCache
+from mounts import MountTable
+from watcher import WATCH_OVERFLOW
+from pane import Pane
+from prefetch import Prefetcher
+from copy_engine import CopyEngine
+from instrument import traced
+from preview import FilePreview
+from duplicates import CacheKey, DuplicateFinder, DuplicateTask
+from dir_compare import CompareTask, DirectoryComparer
+from vfs import VirtualFileSystem, archive_format
+from jobs import (
+    Job,
+    JobScheduler,
+    JOB_COPY,
+    JOB_DELETE,
+    JOB_EXTRACT,
+    JOB_LINK,
+    JOB_MOVE,
+    JOB_RENAME,
+    JOB_SYNC,
+    JOB_SYNC_DELTA,
+)
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+path_history_limit = 100
+
+# 從啟動到第一幀的目標時間 (ms)，超過時記錄警告
+startup_target_ms = 300
+
+# 項目數不超過此值時直接在 UI 執行緒排序，較大的列表在背景計算排序鍵；
+# 需要 stat 的大小 / 時間排序不論列表大小都在背景計算
+sort_sync_limit = 20_000
+
+# click() 的結果，由介面決定如何開啟
+CLICK_NONE = "none"
+CLICK_SELECT = "select"
+CLICK_OPEN_DIR = "open_dir"
+CLICK_OPEN_FILE = "open_file"
+
+
+class _PaneAttribute:
+    # 目前分頁的狀態：core.path 等同 core.pane.path，切換分頁後指向另一個分頁
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, core, owner=None):
+        if core is None:
+            return self
+        return getattr(core.pane, self.name)
+
+    def __set__(self, core, value) -> None:
+        setattr(core.pane, self.name, value)
+
+
+# 不依賴 DearPyGui 的檔案管理核心：設定、路徑與歷史、列表讀取與監看、排序、選取、
+# 剪貼簿與檔案工作。介面 (FileManager) 繼承此類別，覆寫 refresh_dir_list 等方法加上繪製，
+# 並以 _on_* 方法接收讀取狀態；效能測試直接建立此類別，不需要顯示器。
+class FileManagerCore:
+    path = _PaneAttribute()
+    path_history_back = _PaneAttribute()
+    path_history_forward = _PaneAttribute()
+    sort_key = _PaneAttribute()
+    sort_reverse = _PaneAttribute()
+    _sort_thread = _PaneAttribute()
+    fs = _PaneAttribute()
+    dir_model = _PaneAttribute()
+    dir_view = _PaneAttribute()
+    dir_loader = _PaneAttribute()
+    dir_watcher = _PaneAttribute()
+    _pending_dir_model = _PaneAttribute()
+    _dir_stamp = _PaneAttribute()
+    selection = _PaneAttribute()
+
+    def __init__(self, start_path: str, config_path: str | None = None) -> None:
+        # config_path 為 None 時只使用預設設定，不讀寫檔案
+        self.config_path = config_path
+        self.config: dict = {}
+        self.init_config()
+        if config_path is not None and os.path.exists(config_path) is True:
+            self.load_config()
+        self._config_save_to_file()
+        # 本機磁碟與壓縮檔的檔案系統
+        self.vfs = VirtualFileSystem()
+        # 分頁：路徑、列表、選取等瀏覽狀態屬於分頁，path / dir_model 等屬性指向目前的分頁
+        self.panes = [Pane(start_path, self.vfs.local_fs)]
+        self.pane = self.panes[0]
+        self.mount_table = MountTable()
+        # 所有分頁共用的列表快取，同一個資料夾只讀取一次
+        self.listing_cache = ListingCache(
+            self.config["listing_cache_max_entries"],
+            self.config["listing_cache_max_bytes"],
+        )
+        self.prefetcher = Prefetcher(self._foreground_busy)
+        self._clipboard: list[str] = []
+        self._clipboard_job_kind = JOB_COPY
+        self.copy_engine = CopyEngine()
+        self.job_scheduler = JobScheduler(
+            self.copy_engine, self.config["job_per_device_limit"], self.vfs
+        )
+        self.duplicate_finder = DuplicateFinder()
+        self.dir_comparer = DirectoryComparer()
+        # 選取的檔案的預覽，同時只開啟一個
+        self.preview: FilePreview | None = None
+
+    # ---- 設定 ----
+
+    @traced("config.load")
+    def load_config(self) -> None:
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            tmp = json.load(f)
+        for key in tmp:
+            if key in [
+                "selected_rectangle_color_fill",
+                "selected_rectangle_color_outline",
+            ]:
+                self.config[key] = tuple(tmp[key])
+            else:
+                self.config[key] = tmp[key]
+        pfm_logger.debug("設定：%s", self.config)
+        return None
+
+    def init_config(self):
+        self.config = {
+            "selected_rectangle_color_fill": (99, 118, 255, 255),
+            "selected_rectangle_color_outline": (99, 118, 255, 255),
+            "selected_rectangle_color_width": 2,
+            "listing_cache_max_entries": 32,
+            "listing_cache_max_bytes": 256 * 1024 * 1024,
+            "job_per_device_limit": 1,
+            "thumbnail_texture_limit": 512,
+            "index_roots": [os.path.expanduser("~")],
+        }
+
+    @traced("config.save")
+    def _config_save_to_file(self):
+        if self.config_path is None:
+            return
+        text = json.dumps(self.config, ensure_ascii=False, indent=4)
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                if f.read() == text:
+                    pfm_logger.debug("設定未變更，略過寫入。")
+                    return
+        except OSError:
+            pass
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        pfm_logger.debug("已將設定儲存到檔案。")
+
+    # ---- 路徑與歷史 ----
+
+    def change_path(self, new_path: str, record_history: bool = True) -> None:
+        if record_history is True and new_path != self.path:
+            self.path_history_back.append(self.path)
+            del self.path_history_back[:-path_history_limit]
+            self.path_history_forward.clear()
+        self.path = new_path
+        self.refresh_dir_list()
+
+    def history_back(self) -> None:
+        if not self.path_history_back:
+            return
+        self.path_history_forward.append(self.path)
+        self.change_path(self.path_history_back.pop(), record_history=False)
+
+    def history_forward(self) -> None:
+        if not self.path_history_forward:
+            return
+        self.path_history_back.append(self.path)
+        self.change_path(self.path_history_forward.pop(), record_history=False)
+
+    # ---- 分頁 ----
+
+    def new_tab(self, path: str | None = None) -> Pane:
+        # 在目前分頁之後開啟新分頁（預設為目前的資料夾）並切換過去
+        pane = Pane(
+            self.path if path is None else path,
+            self.vfs.local_fs,
+            self.sort_key,
+            self.sort_reverse,
+        )
+        self.panes.insert(self.panes.index(self.pane) + 1, pane)
+        self.pane = pane
+        self.refresh_dir_list()
+        self._on_pane_changed()
+        return pane
+
+    def switch_tab(self, index: int) -> None:
+        # 切換後的分頁保留自己的列表與選取；背景分頁的讀取與監看結果留在各自的佇列，
+        # 切換回來後由 update_frame 繼續套用
+        if not 0 <= index < len(self.panes) or self.panes[index] is self.pane:
+            return None
+        self.pane = self.panes[index]
+        self._on_pane_changed()
+        return None
+
+    def close_tab(self, index: int) -> None:
+        # 最後一個分頁不能關閉
+        if len(self.panes) == 1 or not 0 <= index < len(self.panes):
+            return None
+        pane = self.panes.pop(index)
+        pane.close()
+        if pane is self.pane:
+            self.pane = self.panes[min(index, len(self.panes) - 1)]
+        self._on_pane_changed()
+        return None
+
+    def _on_pane_changed(self) -> None:
+        # 目前的分頁改變（新增、切換或關閉）
+        return None
+
+    # ---- 預讀 ----
+
+    def prefetch(self, path: str) -> None:
+        # 在背景預先讀取 path，之後開啟時直接顯示快取；壓縮檔與已快取的資料夾不需要
+        if path in self.listing_cache or self.vfs.is_virtual(path):
+            return None
+        if self.vfs.is_archive(path):
+            return None
+        self.prefetcher.request(path)
+        return None
+
+    def apply_prefetched(self) -> int:
+        # 每幀呼叫：把預讀完成的列表放入共用的列表快取；回傳加入的數量
+        added = 0
+        for path, model, stamp in self.prefetcher.poll():
+            if path in self.listing_cache or any(
+                pane.path == path for pane in self.panes
+            ):
+                # 已由前景讀取
+                continue
+            self.listing_cache.put(path, model, stamp)
+            added += 1
+        return added
+
+    def _foreground_busy(self) -> bool:
+        # 在預讀執行緒呼叫：任一分頁正在讀取時預讀讓出磁碟。
+        # 背景分頁的讀取訊息要切換回來才取出，以讀取執行緒自己清除的 scanning 判斷
+        return any(pane.dir_loader.scanning for pane in self.panes)
+
+    def go_up(self) -> None:
+        pfm_logger.info("返回上層資料夾，原路徑： 「 %s 」", self.path)
+        self.mount_table.refresh()
+        if self.mount_table.is_mount_root(self.path):
+            self.change_path("/")
+        else:
+            self.change_path(os.path.dirname(self.path))
+
+    # ---- 列表讀取 ----
+
+    @traced("refresh")
+    def refresh_dir_list(self) -> None:
+        path = self.path
+        pfm_logger.info("開始重新整理檔案列表...，路徑：「 %s 」", path)
+        # 讀取在背景執行，結果由 apply_loader_messages 分批套用；
+        # 有快取時先顯示快取，背景只驗證 stamp，不同才重新列出
+        self._pending_dir_model = None
+        cached = None if path == "/" else self.listing_cache.get(path)
+        fs = self.fs = self.vfs.filesystem_for(path)
+        # 先開始監看再讀取，讀取期間的變更不會遺漏；壓縮檔內容不需要監看
+        if path != "/" and fs.local:
+            self.dir_watcher.watch(path)
+        else:
+            self.dir_watcher.stop()
+        if path == "/":
+            self.mount_table.refresh()
+            self.dir_model = DirectoryModel(path)
+            self.dir_loader.load(path, self._list_disks)
+        elif cached is not None:
+            model = cached.model
+            if any(
+                pane is not self.pane and pane.dir_model is model for pane in self.panes
+            ):
+                # 另一個分頁正在顯示同一個資料夾：複製列表而不重新列出，
+                # 兩個分頁的監看各自更新自己的列表
+                model = model.copy()
+            self.dir_model = model
+            self._pending_dir_model = DirectoryModel(path)
+            self.dir_loader.load(path, fs.scan_batches, cached.stamp, fs.stamp)
+        else:
+            self.dir_model = DirectoryModel(path)
+            self.dir_loader.load(path, fs.scan_batches, stamper=fs.stamp)
+        self.dir_view = self._new_dir_view(self.dir_model)
+        self.selection.clear()
+        self.prefetcher.discard(path)
+
+    def _list_disks(self, path: str):
+        # 在背景執行緒執行；以掛載點作為名稱，點擊後可直接進入該儲存空間
+        mounts = self.mount_table.partitions()
+        yield DirectoryModel.from_names(
+            path, [mount.mountpoint for mount in mounts], KIND_DIR
+        )
+
+    @traced("refresh.apply_loader")
+    def apply_loader_messages(self, messages) -> None:
+        for kind, payload in messages:
+            if kind == LOADER_BATCH:
+                if self._pending_dir_model is None:
+                    self.dir_model.extend(payload)
+                    self.dir_view.sync()
+                else:
+                    self._pending_dir_model.extend(payload)
+            elif kind == LOADER_STAMP:
+                self._dir_stamp = payload
+            elif kind == LOADER_VALID:
+                pfm_logger.debug("快取仍有效：「 %s 」", self.dir_model.path)
+                self._on_listing_loaded()
+            elif kind == LOADER_DONE:
+                if self._pending_dir_model is not None:
+                    self.dir_model = self._pending_dir_model
+                    self.dir_view = self._new_dir_view(self.dir_model)
+                    self._pending_dir_model = None
+                    self.selection.clear()
+                    self._on_listing_replaced()
+                if self.dir_model.path != "/":
+                    self.listing_cache.put(
+                        self.dir_model.path, self.dir_model, self._dir_stamp
+                    )
+                else:
+                    for mountpoint in self.dir_model.iter_names():
+                        self.mount_table.request_usage(mountpoint)
+                if pfm_logger.isEnabledFor(logging.DEBUG):
+                    pfm_logger.debug(
+                        "讀取完成：「 %s 」，檔案數量：%d，列表記憶體：%d bytes",
+                        self.dir_model.path,
+                        len(self.dir_model),
+                        self.dir_model.memory_usage(),
+                    )
+                self._on_listing_loaded()
+            elif kind == LOADER_ERROR:
+                err_msg = f"無法讀取資料夾：{payload}"
+                pfm_logger.warning(err_msg)
+                self._on_listing_loaded()
+                self._on_listing_error(err_msg)
+
+    def _on_listing_loaded(self) -> None:
+        # 讀取結束（完成、快取仍有效或失敗）
+        return None
+
+    def _on_listing_replaced(self) -> None:
+        # 快取的列表被新讀取的列表取代，列號全部失效
+        return None
+
+    def _on_listing_error(self, err_msg: str) -> None:
+        return None
+
+    def _on_entry_changed(self, full_path: str) -> None:
+        # 監看到既有項目的內容改變
+        return None
+
+    def wait_loaded(self, timeout: float | None = None) -> bool:
+        # 不經過畫面更新，直接等待背景讀取並套用結果；逾時回傳 False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.dir_loader.loading:
+            messages = self.dir_loader.poll()
+            if messages:
+                self.apply_loader_messages(messages)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    @traced("refresh.apply_watcher")
+    def apply_watcher_messages(self, messages) -> int | None:
+        # 只更新變更的項目，回傳第一個變更的列號（沒有變更時為列數）；
+        # 事件遺失而重新讀取時回傳 None
+        model = self.dir_model
+        view = self.dir_view
+        first_changed = len(view)
+        for kind, payload in messages:
+            if kind == WATCH_OVERFLOW:
+                pfm_logger.info("監看事件遺失，重新讀取：「 %s 」", model.path)
+                self.listing_cache.discard(model.path)
+                self.refresh_dir_list()
+                return None
+            stamp, changes = payload
+            # 先更新 model，整批變更再一次套用到顯示順序
+            removed, added, changed = [], [], []
+            for name, info in changes:
+                index = model.find(name)
+                if info is None:
+                    if index == -1:
+                        continue
+                    model.remove(index)
+                    self.selection.discard(index)
+                    removed.append(index)
+                elif index == -1:
+                    added.append(model.append(name, *info))
+                else:
+                    model.set_kind(index, info[0])
+                    model.set_stat(index, info[1], info[2])
+                    self._on_entry_changed(model.path_at(index))
+                    changed.append(index)
+            if removed or added or changed:
+                removed_rows, inserted_rows = view.apply_changes(
+                    removed, added, changed
+                )
+                self.selection.rows_changed(removed_rows, inserted_rows)
+                # 類型或大小改變可能移動位置，新舊位置之後的列都需要重繪
+                first_changed = min(first_changed, *removed_rows, *inserted_rows)
+            self._dir_stamp = stamp
+        cached = self.listing_cache.get(model.path)
+        if cached is not None and cached.model is model:
+            cached.stamp = self._dir_stamp
+            # 新增的項目讓快取中的列表變大
+            self.listing_cache.trim()
+        return first_changed
+
+    # ---- 排序與篩選 ----
+
+    def _new_dir_view(self, model: DirectoryModel, sort_key: str | None = None):
+        # 換新的列表時停止舊列表的背景排序，篩選條件不保留
+        self.dir_view.cancel_precompute()
+        self._sort_thread = None
+        if sort_key is None:
+            sort_key = self.sort_key
+        return DirectoryView(model, sort_key, self.sort_reverse)
+
+    @traced("sort")
+    def _check_sort(self) -> bool:
+        # 讀取完成後排序：不需要 stat 的小列表直接排序，其餘等背景計算好排序鍵再套用；
+        # 回傳顯示順序是否已改變
+        view = self.dir_view
+        if view.sort_ready() or (
+            len(view.model) <= sort_sync_limit and not view.sort_needs_stat()
+        ):
+            view.sort()
+            return True
+        if self._sort_thread is None or not self._sort_thread.is_alive():
+            # 背景計算途中列表被修改時結果會被捨棄，由這裡重新開始
+            self._sort_thread = threading.Thread(
+                target=view.precompute, name="pfm-sort", daemon=True
+            )
+            self._sort_thread.start()
+        return False
+
+    def set_sort(self, sort_key: str) -> bool:
+        # 再選一次目前的排序方式則反向；讀取中則等讀取完成後再排序
+        if sort_key == self.sort_key:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_key = sort_key
+            self.sort_reverse = False
+        view = self.dir_view
+        view.sort_key = self.sort_key
+        view.reverse = self.sort_reverse
+        view.unsorted = True
+        if self.dir_loader.loading:
+            return False
+        return self._check_sort()
+
+    # ---- 選取 ----
+
+    @traced("hit_test")
+    def click(self, row: int, shift: bool = False, ctrl: bool = False) -> str:
+        # 點擊列號 row；再次點擊唯一選取的項目時回傳開啟動作，由呼叫端開啟
+        if row < 0 or row >= len(self.dir_view):
+            return CLICK_NONE
+        index = self.dir_view.index_at(row)
+        if shift is True:
+            self.selection.select_range(row, self.dir_view, additive=ctrl)
+        elif ctrl is True:
+            self.selection.toggle(row, index)
+        elif self.selection.is_single(row, index):
+            if self.dir_model.is_dir(index):
+                return CLICK_OPEN_DIR
+            elif self.dir_model.is_file(index) and archive_format(
+                self.dir_model.name_at(index)
+            ):
+                # 壓縮檔以虛擬資料夾開啟
+                return CLICK_OPEN_DIR
+            elif self.dir_model.is_file(index):
+                return CLICK_OPEN_FILE
+        else:
+            self.selection.select_only(row, index)
+            pfm_logger.info("選擇：%s", self.dir_model.path_at(index))
+            if self.dir_model.is_dir(index) and self.fs.local:
+                # 選取的資料夾很可能接著被開啟
+                self.prefetch(self.dir_model.path_at(index))
+        return CLICK_SELECT
+
+    def selected_paths(self) -> list[str]:
+        count = len(self.dir_model)
+        return [
+            self.dir_model.path_at(index)
+            for index in self.selection.indices()
+            if index < count and not self.dir_model.is_removed(index)
+        ]
+
+    def focused_path(self) -> str | None:
+        row = self.selection.focus
+        if row is None or row >= len(self.dir_view):
+            return None
+        index = self.dir_view.index_at(row)
+        if index not in self.selection:
+            return None
+        return self.dir_model.path_at(index)
+
+    # ---- 剪貼簿與檔案工作 ----
+
+    def read_only(self) -> bool:
+        # 壓縮檔內容只能複製出來，不能刪除、改名、移動或貼上
+        return not self.fs.local
+
+    def copy_selection(self, job_kind: str = JOB_COPY) -> bool:
+        selected = self.selected_paths()
+        if not selected or (job_kind == JOB_MOVE and self.read_only()):
+            return False
+        self._clipboard = selected
+        self._clipboard_job_kind = job_kind
+        return True
+
+    def cut_selection(self) -> bool:
+        return self.copy_selection(JOB_MOVE)
+
+    def paste(self, target: str | None = None) -> Job | None:
+        if not self._clipboard:
+            return None
+        target = self.path if target is None else target
+        if self.vfs.is_virtual(target) or self.vfs.is_archive(target):
+            pfm_logger.warning("無法貼上到壓縮檔中：「 %s 」", target)
+            return None
+        job_kind = self._clipboard_job_kind
+        if any(self.vfs.is_virtual(path) for path in self._clipboard):
+            # 壓縮檔中的項目串流解壓縮到目標，不解開其他成員
+            job_kind = JOB_EXTRACT
+        pfm_logger.info(
+            "新增工作：%s「 %s 」 -> 「 %s 」",
+            job_kind,
+            self._clipboard,
+            target,
+        )
+        job = self.job_scheduler.submit(job_kind, self._clipboard, target)
+        if self._clipboard_job_kind == JOB_MOVE:
+            # 移動後來源已不存在，不能再次貼上
+            self._clipboard = []
+        return job
+
+    def extract(self, paths: list[str], target: str) -> Job:
+        # 把壓縮檔中的項目解壓縮到 target 資料夾
+        return self.job_scheduler.submit(JOB_EXTRACT, paths, target)
+
+    def delete(self, paths: list[str]) -> Job:
+        return self.job_scheduler.submit(JOB_DELETE, paths)
+
+    def rename(self, src: str, new_name: str) -> Job:
+        if os.sep in new_name or (os.altsep and os.altsep in new_name):
+            raise ValueError(f"名稱不能包含路徑分隔符號：{new_name}")
+        target = os.path.join(os.path.dirname(src), new_name)
+        return self.job_scheduler.submit(JOB_RENAME, [src], target)
+
+    def link_duplicates(
+        self, keep: str, paths: list[str], keys: dict[str, CacheKey]
+    ) -> Job:
+        # 以指向 keep 的硬連結取代內容相同的 paths；keys 為掃描時的 stat（DuplicateTask.keys），
+        # 之後被修改過的檔案不處理
+        expected = {path: keys[path] for path in (keep, *paths) if path in keys}
+        return self.job_scheduler.submit(JOB_LINK, paths, keep, expected=expected)
+
+    def find_duplicates(self, root: str | None = None) -> DuplicateTask:
+        # 在背景搜尋 root（預設為目前資料夾）以下的重複檔案
+        return self.duplicate_finder.find(self.path if root is None else root)
+
+    def compare_dirs(self, left: str, right: str, content: bool = False) -> CompareTask:
+        # 在背景比較兩個資料夾；content 為 True 時大小相同的檔案再比較內容
+        for path in (left, right):
+            if self.vfs.is_virtual(path) or self.vfs.is_archive(path):
+                raise ValueError(f"無法比較壓縮檔內容：{path}")
+            if not os.path.isdir(path):
+                raise ValueError(f"不是資料夾：{path}")
+        return self.dir_comparer.compare(left, right, content)
+
+    def sync_dirs(self, task: CompareTask, delta: bool = False) -> Job | None:
+        # 依比較結果把左側不同的項目複製到右側；右側多出的項目保留不刪除
+        sources = task.sync_paths()
+        if not task.done or not sources:
+            return None
+        kind = JOB_SYNC_DELTA if delta else JOB_SYNC
+        return self.job_scheduler.submit(kind, sources, task.right, task.left)
+
+    # ---- 預覽 ----
+
+    def open_preview(self, full_path: str) -> FilePreview | None:
+        # 關閉前一個預覽並開啟 full_path，行索引在背景建立；無法開啟時為 None
+        self.close_preview()
+        try:
+            self.preview = FilePreview(full_path)
+        except (OSError, ValueError) as e:
+            pfm_logger.warning("無法預覽檔案：「 %s 」，%s", full_path, e)
+            return None
+        self.preview.start_index()
+        return self.preview
+
+    def close_preview(self) -> None:
+        if self.preview is not None:
+            self.preview.close()
+            self.preview = None
+
+    def shutdown(self) -> None:
+        self.close_preview()
+        self.duplicate_finder.shutdown()
+        self.dir_comparer.shutdown()
+        self.vfs.shutdown()
+        self.prefetcher.shutdown()
+        for pane in self.panes:
+            pane.close()
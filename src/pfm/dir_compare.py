@@ -0,0 +1,328 @@
+import logging
+import os
+import queue
+import stat
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from copy_engine import CopyProgress
+from duplicates import full_digest, partial_digest, partial_hash_size
+from instrument import traced
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 比較兩個資料夾：兩邊同時走訪，每對資料夾由執行緒池處理（scandir / lstat 都會釋放 GIL，
+# 慢速磁碟與網路磁碟上同時送出多個請求才能填滿延遲）。
+# 預設只比較大小與修改時間，大部分相同時只受 metadata 系統呼叫限制，不讀取檔案內容；
+# 要求比較內容時，大小相同的檔案再以部分雜湊、完整雜湊確認。
+# 只在一邊的資料夾不再進入，整個資料夾視為一個項目。
+CMP_ONLY_LEFT = "only_left"
+CMP_ONLY_RIGHT = "only_right"
+CMP_SAME = "same"
+CMP_DIFFERENT = "different"
+
+compare_workers = 16
+# 區塊差異同步：只寫入與目標不同的區塊，適合原地修改的大型檔案（映像檔、資料庫）
+delta_block_size = 1024 * 1024
+delta_min_size = 16 * 1024 * 1024
+
+# (相對路徑, 狀態, 左側大小, 右側大小)，資料夾或未取得的大小為 -1
+CompareEntry = tuple[str, str, int, int]
+
+
+def same_mtime(a: int, b: int) -> bool:
+    # 目標檔案系統的時間精度較低時（微秒、秒、FAT 的 2 秒），較粗的一方是截斷後的值
+    if a == b:
+        return True
+    for unit in (1_000, 1_000_000_000, 2_000_000_000):
+        if (a % unit == 0 or b % unit == 0) and a // unit == b // unit:
+            return True
+    return False
+
+
+def delta_update(src: str, dst: str, progress: CopyProgress) -> int:
+    # 逐區塊比較 src 與 dst，只把不同的區塊寫入 dst，最後截斷為 src 的大小；
+    # 回傳寫入的位元組數。取消時 dst 的修改時間已改變，下次比較仍會視為不同。
+    written = 0
+    offset = 0
+    src_buffer = bytearray(delta_block_size)
+    dst_buffer = bytearray(delta_block_size)
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "r+b", buffering=0) as fdst:
+        while True:
+            progress.checkpoint()
+            count = fsrc.readinto(src_buffer)
+            if not count:
+                break
+            fdst.seek(offset)
+            old_count = fdst.readinto(dst_buffer)
+            # dst 較短時 dst_buffer 的尾端仍是上一個區塊的內容，讀到的比 src 少一定要寫入；
+            # dst 較長時多出的部分最後截斷
+            changed = (
+                old_count < count
+                or memoryview(src_buffer)[:count] != memoryview(dst_buffer)[:count]
+            )
+            if changed:
+                fdst.seek(offset)
+                fdst.write(memoryview(src_buffer)[:count])
+                written += count
+            offset += count
+            progress.add_bytes(count)
+        fdst.truncate(offset)
+    return written
+
+
+class CompareTask:
+    def __init__(self, left: str, right: str, content: bool) -> None:
+        self.left = left
+        self.right = right
+        self.content = content
+        self._lock = threading.Lock()
+        # 比較過的項目數，各狀態的數量
+        self.compared = 0
+        self.counts = {
+            CMP_ONLY_LEFT: 0,
+            CMP_ONLY_RIGHT: 0,
+            CMP_SAME: 0,
+            CMP_DIFFERENT: 0,
+        }
+        # 只保留不同的項目，相同的只計數
+        self.entries: list[CompareEntry] = []
+        self.hashed_bytes = 0
+        self.errors = 0
+        self.stage = "scan"
+        self.done = False
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.cancel_event = threading.Event()
+        self._new_entries: queue.SimpleQueue = queue.SimpleQueue()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def poll(self) -> list[CompareEntry]:
+        # 取出上次之後找到的不同項目
+        entries = []
+        while True:
+            try:
+                entries.append(self._new_entries.get_nowait())
+            except queue.Empty:
+                return entries
+
+    def sync_paths(self) -> list[str]:
+        # 單向同步需要複製的左側路徑：只在左側或內容不同的項目
+        return [
+            os.path.join(self.left, rel)
+            for rel, state, _, _ in self.entries
+            if state in (CMP_ONLY_LEFT, CMP_DIFFERENT)
+        ]
+
+    def _add(self, entries: list[CompareEntry], same: int) -> None:
+        with self._lock:
+            self.compared += same + len(entries)
+            self.counts[CMP_SAME] += same
+            for entry in entries:
+                self.counts[entry[1]] += 1
+            self.entries += entries
+        for entry in entries:
+            self._new_entries.put(entry)
+
+    def _add_hashed(self, size: int) -> None:
+        with self._lock:
+            self.hashed_bytes += size
+
+    def _add_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+
+class DirectoryComparer:
+    def __init__(self, max_workers: int = compare_workers) -> None:
+        self.max_workers = max_workers
+        self._pool: ThreadPoolExecutor | None = None
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="pfm-compare"
+            )
+        return self._pool
+
+    def compare(self, left: str, right: str, content: bool = False) -> CompareTask:
+        task = CompareTask(left, right, content)
+        threading.Thread(
+            target=self._run, args=(task,), name="pfm-compare", daemon=True
+        ).start()
+        return task
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @traced("compare")
+    def _run(self, task: CompareTask) -> None:
+        try:
+            hash_pending = self._walk(task)
+            if hash_pending and not task.cancel_event.is_set():
+                task.stage = "content"
+                self._compare_contents(task, hash_pending)
+        except Exception:
+            pfm_logger.exception(
+                "比較資料夾失敗：「 %s 」「 %s 」", task.left, task.right
+            )
+            task._add_error()
+        finally:
+            task.finished = time.monotonic()
+            task.done = True
+        pfm_logger.info(
+            "比較資料夾：「 %s 」「 %s 」 %d 個項目，%s，%.2f 秒",
+            task.left,
+            task.right,
+            task.compared,
+            task.counts,
+            task.finished - task.started,
+        )
+        return None
+
+    def _walk(self, task: CompareTask) -> list[tuple[str, int]]:
+        # 每完成一對資料夾就送出它的子資料夾，執行緒池中同時有多對資料夾在讀取；
+        # 回傳需要比較內容的 (相對路徑, 大小)
+        pool = self._executor()
+        hash_pending: list[tuple[str, int]] = []
+        pending = {pool.submit(self._compare_dir, task, "")}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, to_hash = future.result()
+                hash_pending += to_hash
+                if task.cancel_event.is_set():
+                    continue
+                for rel in subdirs:
+                    pending.add(pool.submit(self._compare_dir, task, rel))
+        return hash_pending
+
+    def _compare_dir(
+        self, task: CompareTask, rel: str
+    ) -> tuple[list[str], list[tuple[str, int]]]:
+        if task.cancel_event.is_set():
+            return [], []
+        left = self._scan(task, os.path.join(task.left, rel))
+        right = self._scan(task, os.path.join(task.right, rel))
+        if left is None or right is None:
+            return [], []
+        subdirs: list[str] = []
+        to_hash: list[tuple[str, int]] = []
+        entries: list[CompareEntry] = []
+        same = 0
+        # 相對路徑只在需要記錄時才組合
+        prefix = rel + os.sep if rel else ""
+        for name, left_entry in left.items():
+            right_entry = right.get(name)
+            left_is_dir = left_entry.is_dir(follow_symlinks=False)
+            if right_entry is None:
+                size = -1 if left_is_dir else self._size(task, left_entry)
+                entries.append((prefix + name, CMP_ONLY_LEFT, size, -1))
+                continue
+            right_is_dir = right_entry.is_dir(follow_symlinks=False)
+            if left_is_dir and right_is_dir:
+                subdirs.append(prefix + name)
+                continue
+            if left_is_dir or right_is_dir:
+                entries.append((prefix + name, CMP_DIFFERENT, -1, -1))
+                continue
+            try:
+                left_st = left_entry.stat(follow_symlinks=False)
+                right_st = right_entry.stat(follow_symlinks=False)
+                state = self._compare_files(
+                    task, left_entry, right_entry, left_st, right_st
+                )
+            except OSError:
+                task._add_error()
+                continue
+            if state is None:
+                to_hash.append((prefix + name, left_st.st_size))
+            elif state == CMP_SAME:
+                same += 1
+            else:
+                entries.append(
+                    (prefix + name, state, left_st.st_size, right_st.st_size)
+                )
+        for name, right_entry in right.items():
+            if name not in left:
+                entries.append((prefix + name, CMP_ONLY_RIGHT, -1, -1))
+        task._add(entries, same)
+        return subdirs, to_hash
+
+    def _scan(self, task: CompareTask, path: str) -> dict[str, os.DirEntry] | None:
+        try:
+            with os.scandir(path) as it:
+                return {entry.name: entry for entry in it}
+        except OSError:
+            task._add_error()
+            return None
+
+    def _size(self, task: CompareTask, entry: os.DirEntry) -> int:
+        try:
+            return entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            task._add_error()
+            return -1
+
+    def _compare_files(
+        self,
+        task: CompareTask,
+        left_entry: os.DirEntry,
+        right_entry: os.DirEntry,
+        left_st: os.stat_result,
+        right_st: os.stat_result,
+    ) -> str | None:
+        # 回傳 None 代表需要比較內容
+        if stat.S_IFMT(left_st.st_mode) != stat.S_IFMT(right_st.st_mode):
+            return CMP_DIFFERENT
+        if stat.S_ISLNK(left_st.st_mode):
+            same = os.readlink(left_entry.path) == os.readlink(right_entry.path)
+            return CMP_SAME if same else CMP_DIFFERENT
+        if left_st.st_size != right_st.st_size:
+            return CMP_DIFFERENT
+        if task.content and stat.S_ISREG(left_st.st_mode) and left_st.st_size:
+            return None
+        if same_mtime(left_st.st_mtime_ns, right_st.st_mtime_ns):
+            return CMP_SAME
+        return CMP_DIFFERENT
+
+    def _compare_contents(
+        self, task: CompareTask, hash_pending: list[tuple[str, int]]
+    ) -> None:
+        pool = self._executor()
+        results = pool.map(lambda item: self._content_state(task, *item), hash_pending)
+        entries = []
+        same = 0
+        for (rel, size), state in zip(hash_pending, results):
+            if state == CMP_SAME:
+                same += 1
+            elif state is not None:
+                entries.append((rel, state, size, size))
+        task._add(entries, same)
+        return None
+
+    def _content_state(self, task: CompareTask, rel: str, size: int) -> str | None:
+        if task.cancel_event.is_set():
+            return None
+        left = os.path.join(task.left, rel)
+        right = os.path.join(task.right, rel)
+        try:
+            if partial_digest(left, size) != partial_digest(right, size):
+                return CMP_DIFFERENT
+            if size <= partial_hash_size * 2:
+                # 部分雜湊已涵蓋整個檔案
+                return CMP_SAME
+            left_digest = full_digest(left, task.cancel_event)
+            right_digest = full_digest(right, task.cancel_event)
+        except (OSError, ValueError):
+            task._add_error()
+            return None
+        if task.cancel_event.is_set():
+            return None
+        task._add_hashed(size * 2)
+        return CMP_SAME if left_digest == right_digest else CMP_DIFFERENT
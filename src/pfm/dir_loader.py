@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+from typing import Callable, Iterator
+
+from dir_model import DirectoryModel
+from listing_cache import DirStamp, dir_stamp
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 背景讀取資料夾，結果以 (generation, 類型, 內容) 放入佇列，由 UI 執行緒每幀取出。
+# 類型："stamp"（開始列出前的資料夾 DirStamp）、"valid"（與快取相同，不需重新列出）、
+# "batch"（DirectoryModel 片段）、"done"、"error"（OSError）
+LOADER_STAMP = "stamp"
+LOADER_VALID = "valid"
+LOADER_BATCH = "batch"
+LOADER_DONE = "done"
+LOADER_ERROR = "error"
+
+Lister = Callable[[str], Iterator[DirectoryModel]]
+Stamper = Callable[[str], DirStamp]
+
+
+class DirectoryLoader:
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._cancel_event: threading.Event | None = None
+        self.generation = 0
+        # loading：UI 執行緒尚未取出完成的訊息；scanning：背景執行緒仍在讀取磁碟，
+        # 由執行緒結束時清除，分頁在背景時訊息不會被取出也能得知讀取已結束
+        self.loading = False
+        self.scanning = False
+        self._lock = threading.Lock()
+
+    def load(
+        self,
+        path: str,
+        lister: Lister = DirectoryModel.scan_batches,
+        expected_stamp: DirStamp | None = None,
+        stamper: Stamper = dir_stamp,
+    ) -> int:
+        # lister / stamper 由檔案系統提供，例如壓縮檔以壓縮檔本身的 stamp 判斷快取
+        self.cancel()
+        with self._lock:
+            self.generation += 1
+            self.scanning = True
+        self._cancel_event = threading.Event()
+        self.loading = True
+        thread = threading.Thread(
+            target=self._worker,
+            args=(
+                path,
+                lister,
+                stamper,
+                expected_stamp,
+                self.generation,
+                self._cancel_event,
+            ),
+            name=f"pfm-dir-loader-{self.generation}",
+            daemon=True,
+        )
+        thread.start()
+        return self.generation
+
+    def cancel(self) -> None:
+        # 卡在慢速掛載點的執行緒無法中斷，只能讓它的結果在 poll 時被丟棄
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+            self._cancel_event = None
+            with self._lock:
+                self.generation += 1
+        self.loading = False
+        self.scanning = False
+
+    def _worker(
+        self,
+        path: str,
+        lister: Lister,
+        stamper: Stamper,
+        expected_stamp: DirStamp | None,
+        generation: int,
+        cancel_event: threading.Event,
+    ) -> None:
+        try:
+            self._scan(path, lister, stamper, expected_stamp, generation, cancel_event)
+        finally:
+            with self._lock:
+                if generation == self.generation:
+                    self.scanning = False
+        return None
+
+    def _scan(
+        self,
+        path: str,
+        lister: Lister,
+        stamper: Stamper,
+        expected_stamp: DirStamp | None,
+        generation: int,
+        cancel_event: threading.Event,
+    ) -> None:
+        try:
+            # 先取得 stamp 再列出，列出期間的變更會讓下次驗證失敗而重新讀取
+            stamp = stamper(path)
+            if stamp == expected_stamp:
+                self._queue.put((generation, LOADER_VALID, stamp))
+                return None
+            self._queue.put((generation, LOADER_STAMP, stamp))
+            for batch in lister(path):
+                if cancel_event.is_set():
+                    pfm_logger.debug("已取消讀取：「 %s 」", path)
+                    return None
+                self._queue.put((generation, LOADER_BATCH, batch))
+        except OSError as e:
+            self._queue.put((generation, LOADER_ERROR, e))
+            return None
+        self._queue.put((generation, LOADER_DONE, None))
+        return None
+
+    def poll(self, max_items: int = 64) -> list[tuple[str, object]]:
+        # 只回傳目前 generation 的訊息，舊的讀取結果直接丟棄
+        messages = []
+        while len(messages) < max_items:
+            try:
+                generation, kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            if kind in (LOADER_VALID, LOADER_DONE, LOADER_ERROR):
+                self.loading = False
+            messages.append((kind, payload))
+        return messages
@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+from array import array
+from typing import Iterator
+
+# 檔案類型位元，取自 DirEntry 的 d_type，不需要額外 stat
+KIND_OTHER = 0
+KIND_FILE = 1
+KIND_DIR = 2
+KIND_SYMLINK = 4
+# 已刪除的項目只標記，不搬移陣列，已存在的 index 保持不變
+KIND_REMOVED = 0x80
+
+_removed_table = bytes(1 if value & KIND_REMOVED else 0 for value in range(256))
+
+# size / mtime 尚未取得時的值
+STAT_UNKNOWN = -1
+
+
+# 單一資料夾的列表，以欄位陣列儲存，不保留 DirEntry 物件。
+# 檔名以 os.fsencode 後串接在同一個 bytearray，另以 offsets 記錄邊界；
+# size / mtime(ns) 只在第一次需要時才 stat 並寫回陣列。
+class DirectoryModel:
+    __slots__ = ("path", "_names", "_offsets", "_kinds", "_sizes", "_mtimes", "_index")
+
+    def __init__(self, path: str, name_offset: int = 0) -> None:
+        self.path = path
+        self._names = bytearray()
+        # name_offset 不為 0 時代表這是一個分批讀取的片段，offsets 延續前一批
+        self._offsets = array("Q", [name_offset])
+        self._kinds = bytearray()
+        self._sizes = array("q")
+        self._mtimes = array("q")
+        # 檔名 -> index，只在需要套用增量變更時才建立
+        self._index: dict[str, int] | None = None
+
+    @classmethod
+    def scan(cls, path: str) -> "DirectoryModel":
+        model = cls(path)
+        for batch in cls.scan_batches(path):
+            model.extend(batch)
+        return model
+
+    @classmethod
+    def scan_batches(
+        cls, path: str, batch_size: int = 2000, batch_interval: float = 0.05
+    ) -> Iterator["DirectoryModel"]:
+        # 每累積 batch_size 筆或經過 batch_interval 秒就交出一批，
+        # 讓慢速的掛載點也能逐步顯示
+        batch = cls(path)
+        last_yield = time.monotonic()
+        with os.scandir(path) as it:
+            for entry in it:
+                batch.append_entry(entry)
+                if (
+                    len(batch) >= batch_size
+                    or time.monotonic() - last_yield >= batch_interval
+                ):
+                    yield batch
+                    batch = cls(path, batch.name_offset_end())
+                    last_yield = time.monotonic()
+        yield batch
+
+    @classmethod
+    def from_names(cls, path: str, names: list[str], kind: int) -> "DirectoryModel":
+        model = cls(path)
+        for name in names:
+            model.append(name, kind)
+        return model
+
+    def copy(self) -> "DirectoryModel":
+        # 複製欄位陣列，不重新列出；兩個分頁顯示同一個資料夾時各自套用監看到的變更
+        model = DirectoryModel(self.path)
+        model._names = bytearray(self._names)
+        model._offsets = array("Q", self._offsets)
+        model._kinds = bytearray(self._kinds)
+        model._sizes = array("q", self._sizes)
+        model._mtimes = array("q", self._mtimes)
+        return model
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def append(
+        self, name: str, kind: int, size: int = STAT_UNKNOWN, mtime: int = STAT_UNKNOWN
+    ) -> int:
+        index = len(self._kinds)
+        self._names += os.fsencode(name)
+        self._offsets.append(self._offsets[0] + len(self._names))
+        self._kinds.append(kind)
+        self._sizes.append(size)
+        self._mtimes.append(mtime)
+        if self._index is not None:
+            self._index[name] = index
+        return index
+
+    def find(self, name: str) -> int:
+        if self._index is None:
+            self._index = {
+                self.name_at(index): index
+                for index in range(len(self))
+                if not self._kinds[index] & KIND_REMOVED
+            }
+        return self._index.get(name, -1)
+
+    def remove(self, index: int) -> None:
+        if self._index is not None:
+            self._index.pop(self.name_at(index), None)
+        self._kinds[index] = KIND_REMOVED
+
+    def is_removed(self, index: int) -> bool:
+        return bool(self._kinds[index] & KIND_REMOVED)
+
+    def set_kind(self, index: int, kind: int) -> None:
+        self._kinds[index] = kind
+
+    def set_stat(self, index: int, size: int, mtime: int) -> None:
+        self._sizes[index] = size
+        self._mtimes[index] = mtime
+
+    def name_offset_end(self) -> int:
+        return self._offsets[-1]
+
+    def extend(self, batch: "DirectoryModel") -> None:
+        if batch._offsets[0] != self._offsets[-1]:
+            raise ValueError("批次的檔名位移與目前列表不連續")
+        self._names += batch._names
+        self._offsets.extend(batch._offsets[1:])
+        self._kinds += batch._kinds
+        self._sizes.extend(batch._sizes)
+        self._mtimes.extend(batch._mtimes)
+        if self._index is not None:
+            base = len(self) - len(batch)
+            for offset in range(len(batch)):
+                self._index[batch.name_at(offset)] = base + offset
+
+    def append_entry(self, entry: os.DirEntry) -> None:
+        kind = KIND_OTHER
+        try:
+            if entry.is_symlink():
+                kind |= KIND_SYMLINK
+            # 符號連結需要追蹤到目標才知道類型，其餘直接使用 d_type
+            if entry.is_dir():
+                kind |= KIND_DIR
+            elif entry.is_file():
+                kind |= KIND_FILE
+        except OSError:
+            pass
+        size = mtime = STAT_UNKNOWN
+        if os.name == "nt" and not kind & KIND_SYMLINK:
+            # Windows 的 DirEntry.stat() 已由 FindNextFile 帶回，不會產生系統呼叫
+            try:
+                st = entry.stat()
+                size, mtime = st.st_size, st.st_mtime_ns
+            except OSError:
+                pass
+        self.append(entry.name, kind, size, mtime)
+
+    def name_at(self, index: int) -> str:
+        base = self._offsets[0]
+        start = self._offsets[index] - base
+        end = self._offsets[index + 1] - base
+        return os.fsdecode(bytes(self._names[start:end]))
+
+    def live_indices(self, start: int = 0, end: int | None = None) -> range | list[int]:
+        # 未刪除項目的 index；範圍內沒有刪除過的項目時直接回傳 range
+        kinds = self._kinds[start:end]
+        if 1 not in kinds.translate(_removed_table):
+            return range(start, start + len(kinds))
+        return [i for i, kind in enumerate(kinds, start) if not kind & KIND_REMOVED]
+
+    def iter_names(self) -> Iterator[str]:
+        for index in range(len(self)):
+            if not self._kinds[index] & KIND_REMOVED:
+                yield self.name_at(index)
+
+    def name_list(self, start: int = 0, end: int | None = None) -> list[str]:
+        # 一次解碼多個檔名（含已刪除的項目），全為 ASCII 時直接切割字串
+        end = len(self) if end is None else end
+        bounds = self._offsets[start : end + 1]
+        if len(bounds) < 2:
+            return []
+        base = bounds[0]
+        first = base - self._offsets[0]
+        blob = bytes(self._names[first : first + bounds[-1] - base])
+        if blob.isascii():
+            text = blob.decode("ascii")
+            return [text[a - base : b - base] for a, b in zip(bounds, bounds[1:])]
+        return [
+            os.fsdecode(blob[a - base : b - base]) for a, b in zip(bounds, bounds[1:])
+        ]
+
+    def path_at(self, index: int) -> str:
+        return os.path.join(self.path, self.name_at(index))
+
+    def kind_at(self, index: int) -> int:
+        return self._kinds[index]
+
+    def is_dir(self, index: int) -> bool:
+        return bool(self._kinds[index] & KIND_DIR)
+
+    def is_file(self, index: int) -> bool:
+        return bool(self._kinds[index] & KIND_FILE)
+
+    def _stat(self, index: int) -> None:
+        try:
+            st = os.stat(self.path_at(index))
+            self._sizes[index] = st.st_size
+            self._mtimes[index] = st.st_mtime_ns
+        except OSError:
+            self._sizes[index] = 0
+            self._mtimes[index] = 0
+
+    def size_at(self, index: int) -> int:
+        if self._sizes[index] == STAT_UNKNOWN:
+            self._stat(index)
+        return self._sizes[index]
+
+    def known_size(self, index: int) -> int:
+        # 不觸發 stat，尚未取得時回傳 STAT_UNKNOWN
+        return self._sizes[index]
+
+    def stat_known(self) -> bool:
+        # 所有項目都已有 size / mtime，依大小或時間排序不需要 stat
+        return STAT_UNKNOWN not in self._sizes
+
+    def mtime_at(self, index: int) -> int:
+        if self._mtimes[index] == STAT_UNKNOWN:
+            self._stat(index)
+        return self._mtimes[index]
+
+    def memory_usage(self) -> int:
+        # find() 建立的檔名索引也算在內，監看到變更後才會建立
+        usage = (
+            sys.getsizeof(self._names)
+            + sys.getsizeof(self._offsets)
+            + sys.getsizeof(self._kinds)
+            + sys.getsizeof(self._sizes)
+            + sys.getsizeof(self._mtimes)
+        )
+        if self._index is not None:
+            usage += sys.getsizeof(self._index)
+        return usage
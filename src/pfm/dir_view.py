@@ -0,0 +1,436 @@
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from functools import cmp_to_key
+
+from dir_model import DirectoryModel
+
+SORT_NONE = ""
+SORT_NAME = "name"
+SORT_SIZE = "size"
+SORT_MTIME = "mtime"
+SORT_TYPE = "type"
+sort_modes = (SORT_NAME, SORT_SIZE, SORT_MTIME, SORT_TYPE)
+# 排序鍵需要 stat 的排序方式，只能在背景 precompute 計算
+stat_sort_modes = (SORT_SIZE, SORT_MTIME)
+
+# 一批變更的項目數不超過此值時就地修改陣列，否則重建一次
+splice_in_place_limit = 4
+
+_digits = re.compile(r"0*(\d+)")
+
+
+def natural_key(name: str) -> str:
+    # 數字前加上位數，字串比較即為自然排序："file2" < "file10"
+    parts = _digits.split(name.casefold())
+    if len(parts) == 1:
+        return parts[0]
+    for i in range(1, len(parts), 2):
+        digits = parts[i]
+        parts[i] = f"{len(digits):04d}{digits}"
+    return "".join(parts)
+
+
+def sort_key_of(mode: str, name: str, natural: str, is_dir: bool, model, index: int):
+    # 資料夾優先直接放在鍵的第一個元素，排序時不需要另外分組
+    group = "0" if is_dir else "1"
+    if mode == SORT_NAME:
+        return group + natural
+    if mode == SORT_TYPE:
+        return f"{group}{os.path.splitext(name)[1].casefold()}\0{natural}"
+    if mode == SORT_SIZE:
+        return (group, model.size_at(index), natural)
+    return (group, model.mtime_at(index), natural)
+
+
+# 顯示順序：列號 (row) -> DirectoryModel index。
+# 排序鍵與各排序方式的遞增順序每個列表只計算一次（可在背景執行 precompute），
+# 之後切換排序只需複製或反轉陣列；篩選只縮小 order，不重新排序也不重新讀取。
+class DirectoryView:
+    __slots__ = (
+        "model",
+        "order",
+        "sort_key",
+        "reverse",
+        "filter_text",
+        "unsorted",
+        "_full",
+        "_synced",
+        "_natural",
+        "_keys",
+        "_lower",
+        "_ascending",
+        "_lock",
+        "_version",
+        "_cancel_event",
+    )
+
+    def __init__(
+        self,
+        model: DirectoryModel,
+        sort_key: str = SORT_NAME,
+        reverse: bool = False,
+    ) -> None:
+        self.model = model
+        self.sort_key = sort_key
+        self.reverse = reverse
+        self.filter_text = ""
+        # sync() 之後新項目附加在最後，尚未排序
+        self.unsorted = False
+        # _full：排序後的全部項目；order：再經過篩選、實際顯示的項目
+        self._full = array("L")
+        self.order = array("L")
+        # model 中已加入 _full 的 index 數量
+        self._synced = 0
+        self._natural: list[str] = []
+        self._keys: dict[str, list] = {}
+        self._lower: list[str] = []
+        # 各排序方式的遞增順序，增刪項目時就地更新
+        self._ascending: dict[str, array] = {}
+        # 背景 precompute 與 UI 執行緒的修改以 _version 判斷是否衝突
+        self._lock = threading.Lock()
+        self._version = 0
+        self._cancel_event = threading.Event()
+        self.sync()
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def index_at(self, row: int) -> int:
+        return self.order[row]
+
+    def row_of(self, index: int) -> int:
+        if not self.matches(index):
+            return -1
+        return self._locate(self.order, self._order_keys(), index, self.reverse)
+
+    # ---- 排序鍵 ----
+
+    def _natural_keys(self) -> list[str]:
+        natural = self._natural
+        if len(natural) < len(self.model):
+            names = self.model.name_list(len(natural))
+            natural.extend(map(natural_key, names))
+        return natural
+
+    def _lower_names(self) -> list[str]:
+        lower = self._lower
+        if len(lower) < len(self.model):
+            lower.extend(name.casefold() for name in self.model.name_list(len(lower)))
+        return lower
+
+    def _sort_keys(self, mode: str) -> list:
+        keys = self._keys.setdefault(mode, [])
+        if len(keys) < len(self.model):
+            model = self.model
+            natural = self._natural_keys()
+            start = len(keys)
+            names = model.name_list(start)
+            keys.extend(
+                sort_key_of(mode, name, natural[i], model.is_dir(i), model, i)
+                for i, name in enumerate(names, start)
+            )
+        return keys
+
+    def precompute(self, modes: tuple[str, ...] | None = None) -> None:
+        # 在背景執行緒計算 modes（預設為目前的排序方式）的排序鍵與遞增順序；
+        # 大小 / 時間需要 stat，只在選擇該排序方式時計算。期間列表被修改時放棄結果，由呼叫端重新執行。
+        if modes is None:
+            modes = () if self.sort_key == SORT_NONE else (self.sort_key,)
+        model = self.model
+        version = self._version
+        count = len(model)
+        names = model.name_list(0, count)
+        natural = list(map(natural_key, names))
+        lower = [name.casefold() for name in names]
+        live = model.live_indices(0, count)
+        for mode in modes:
+            keys = []
+            for i, name in enumerate(names):
+                if i % 4096 == 0 and (
+                    self._cancel_event.is_set() or self._version != version
+                ):
+                    return None
+                keys.append(
+                    sort_key_of(mode, name, natural[i], model.is_dir(i), model, i)
+                )
+            ascending = array("L", sorted(live, key=keys.__getitem__))
+            with self._lock:
+                if self._version != version:
+                    return None
+                self._natural = natural
+                self._lower = lower
+                self._keys[mode] = keys
+                self._ascending[mode] = ascending
+        return None
+
+    def cancel_precompute(self) -> None:
+        self._cancel_event.set()
+
+    def sort_ready(self) -> bool:
+        # 目前的排序方式已有遞增順序，sort() 只需要複製陣列
+        return self.sort_key == SORT_NONE or self.sort_key in self._ascending
+
+    def sort_needs_stat(self) -> bool:
+        # 目前的排序方式在 UI 執行緒排序時會 stat 尚未取得大小 / 時間的項目
+        return (
+            self.sort_key in stat_sort_modes
+            and not self.sort_ready()
+            and not self.model.stat_known()
+        )
+
+    def _before(self, keys, a: int, b: int, reverse: bool) -> bool:
+        # a 是否顯示在 b 之前
+        if keys is None:
+            return a < b
+        key_a = keys[a]
+        key_b = keys[b]
+        if key_a[0] != key_b[0]:
+            return key_a[0] < key_b[0]
+        return key_b < key_a if reverse else key_a < key_b
+
+    def _insert_position(
+        self, seq: array, keys, index: int, reverse: bool, lo: int = 0
+    ) -> int:
+        # 遞增順序中鍵的第一個元素（資料夾優先）比較結果與整個鍵相同，可用 C 實作的 bisect
+        if keys is None:
+            return bisect_left(seq, index, lo)
+        if not reverse:
+            return bisect_left(seq, keys[index], lo, key=keys.__getitem__)
+        hi = len(seq)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._before(keys, seq[mid], index, reverse):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _locate(self, seq: array, keys, index: int, reverse: bool) -> int:
+        # 以排序鍵二分搜尋 index 的位置，鍵相同的項目依序往後找；
+        # 陣列不是依 keys 排列時（讀取中附加、排序尚未套用）才逐一搜尋。不在陣列中時回傳 -1
+        position = self._insert_position(seq, keys, index, reverse)
+        while position < len(seq):
+            current = seq[position]
+            if current == index:
+                return position
+            if self._before(keys, index, current, reverse):
+                break
+            position += 1
+        try:
+            return seq.index(index)
+        except ValueError:
+            return -1
+
+    def _order_keys(self):
+        # _full / order 依照的排序鍵；尚未排序時為 sync 附加的 index 順序
+        if self.unsorted or self.sort_key == SORT_NONE:
+            return None
+        return self._sort_keys(self.sort_key)
+
+    # ---- 排序與篩選 ----
+
+    def sort(self, sort_key: str | None = None, reverse: bool | None = None) -> None:
+        with self._lock:
+            if sort_key is not None:
+                self.sort_key = sort_key
+            if reverse is not None:
+                self.reverse = reverse
+            model = self.model
+            mode = self.sort_key
+            if mode == SORT_NONE:
+                self._full = array("L", model.live_indices())
+            else:
+                ascending = self._ascending.get(mode)
+                if ascending is None:
+                    keys = self._sort_keys(mode)
+                    ascending = array(
+                        "L", sorted(model.live_indices(), key=keys.__getitem__)
+                    )
+                    self._ascending[mode] = ascending
+                if self.reverse:
+                    # 資料夾仍在前面，只反轉各組內的順序
+                    dir_count = self._group_end(ascending, self._keys[mode])
+                    self._full = (
+                        ascending[:dir_count][::-1] + ascending[dir_count:][::-1]
+                    )
+                else:
+                    self._full = array("L", ascending)
+            self._synced = len(model)
+            self.unsorted = False
+            self._apply_filter(self._full)
+        return None
+
+    def _group_end(self, ascending: array, keys: list) -> int:
+        # 遞增順序中資料夾（鍵的第一個元素為 "0"）的數量
+        lo, hi = 0, len(ascending)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[ascending[mid]][0] == "0":
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def set_filter(self, text: str) -> None:
+        text = text.casefold()
+        if text == self.filter_text:
+            return None
+        # 輸入更多字時只在目前顯示的項目中篩選
+        narrowing = bool(self.filter_text) and text.startswith(self.filter_text)
+        self.filter_text = text
+        self._apply_filter(self.order if narrowing else self._full)
+        return None
+
+    def _apply_filter(self, source: array) -> None:
+        text = self.filter_text
+        if not text:
+            self.order = array("L", source)
+            return None
+        lower = self._lower_names()
+        self.order = array("L", (i for i in source if text in lower[i]))
+        return None
+
+    def matches(self, index: int) -> bool:
+        return not self.filter_text or self.filter_text in self._lower_names()[index]
+
+    # ---- 增量更新 ----
+
+    def sync(self) -> int:
+        # 讀取中的批次直接加到最後，讀取完成後再排序；回傳第一個新列的列號
+        with self._lock:
+            first_row = len(self.order)
+            model = self.model
+            for index in model.live_indices(self._synced):
+                self._full.append(index)
+                if self.matches(index):
+                    self.order.append(index)
+            if len(model) > self._synced:
+                self.unsorted = self.sort_key != SORT_NONE
+            self._synced = len(model)
+            self._version += 1
+            self._ascending.clear()
+        return first_row
+
+    def apply_changes(
+        self, removed: list[int], added: list[int], changed: list[int]
+    ) -> tuple[list[int], list[int]]:
+        # 一次套用監看到的一批變更，model 已刪除 removed、附加 added、更新 changed 的類型與大小。
+        # 以排序鍵二分搜尋舊位置，每個陣列只重建一次，成本與變更數量及一次複製成正比。
+        # 回傳 order 中被移除的舊列號，以及插入後的新列號（皆遞增）
+        with self._lock:
+            self._version += 1
+            if added:
+                self._synced = max(self._synced, max(added) + 1)
+            dropped = removed + changed
+            inserted = added + changed
+            shown_dropped = [index for index in dropped if self.matches(index)]
+            shown_inserted = [index for index in inserted if self.matches(index)]
+            # 先以舊的排序鍵找到位置，再更新 changed 的排序鍵
+            order_keys = self._order_keys()
+            removed_rows = self._positions(
+                self.order, order_keys, shown_dropped, self.reverse
+            )
+            full_positions = self._positions(
+                self._full, order_keys, dropped, self.reverse
+            )
+            ascending_positions = {
+                mode: self._positions(ascending, self._sort_keys(mode), dropped, False)
+                for mode, ascending in self._ascending.items()
+            }
+            if changed:
+                model = self.model
+                natural = self._natural_keys()
+                for mode, keys in self._keys.items():
+                    for index in changed:
+                        if index < len(keys):
+                            keys[index] = sort_key_of(
+                                mode,
+                                model.name_at(index),
+                                natural[index],
+                                model.is_dir(index),
+                                model,
+                                index,
+                            )
+            for mode, positions in ascending_positions.items():
+                self._ascending[mode], _ = self._splice(
+                    self._ascending[mode],
+                    positions,
+                    self._sort_keys(mode),
+                    inserted,
+                    False,
+                )
+            self._full, _ = self._splice(
+                self._full, full_positions, order_keys, inserted, self.reverse
+            )
+            self.order, inserted_rows = self._splice(
+                self.order, removed_rows, order_keys, shown_inserted, self.reverse
+            )
+        return removed_rows, inserted_rows
+
+    def _positions(
+        self, seq: array, keys, indices: list[int], reverse: bool
+    ) -> list[int]:
+        positions = {self._locate(seq, keys, index, reverse) for index in indices}
+        positions.discard(-1)
+        return sorted(positions)
+
+    def _splice(
+        self, seq: array, positions: list[int], keys, indices: list[int], reverse: bool
+    ) -> tuple[array, list[int]]:
+        # 移除 positions 的項目並依排序插入 indices，回傳新陣列與插入後的位置
+        if not positions and not indices:
+            return seq, []
+        if len(positions) + len(indices) <= splice_in_place_limit:
+            # 少數項目直接在原陣列刪除與插入（memmove），比複製整個陣列快
+            for position in reversed(positions):
+                del seq[position]
+            rows = []
+            for index in indices:
+                position = self._insert_position(seq, keys, index, reverse)
+                seq.insert(position, index)
+                rows = [row + 1 if row >= position else row for row in rows]
+                rows.append(position)
+            return seq, sorted(rows)
+        kept = array("L")
+        start = 0
+        for position in positions:
+            kept += seq[start:position]
+            start = position + 1
+        kept += seq[start:]
+        if not indices:
+            return kept, []
+
+        def compare(a: int, b: int) -> int:
+            if self._before(keys, a, b, reverse):
+                return -1
+            return 1 if self._before(keys, b, a, reverse) else 0
+
+        # 新項目先排好順序，插入位置便是遞增的，每次只需從上一個位置往後搜尋
+        result = array("L")
+        rows = []
+        start = 0
+        for offset, index in enumerate(sorted(indices, key=cmp_to_key(compare))):
+            position = self._insert_position(kept, keys, index, reverse, start)
+            result += kept[start:position]
+            result.append(index)
+            rows.append(position + offset)
+            start = position
+        result += kept[start:]
+        return result, rows
+
+    def insert(self, index: int) -> int:
+        # 依目前的排序插入單一項目，回傳列號；被篩選掉時回傳 -1
+        _, rows = self.apply_changes([], [index], [])
+        return rows[0] if rows else -1
+
+    def remove(self, index: int) -> int:
+        # 回傳被移除的列號，之後的列全部往前移一列；不在顯示中時回傳 -1
+        rows, _ = self.apply_changes([index], [], [])
+        return rows[0] if rows else -1
+
+    def refresh_keys(self, index: int) -> None:
+        # 項目的類型或大小改變，重新計算排序鍵並移到新的位置
+        self.apply_changes([], [], [index])
@@ -0,0 +1,347 @@
+import hashlib
+import logging
+import os
+import queue
+import stat
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_dirs import cache_dir
+from instrument import traced
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 尋找重複檔案，逐步縮小候選：
+# 1. 走訪資料夾，依大小分組，大小唯一的檔案不可能重複
+# 2. 同大小的檔案計算開頭與結尾各 partial_hash_size 的雜湊
+# 3. 部分雜湊也相同的才計算整個檔案的雜湊
+# 雜湊在執行緒池中計算（讀取與 hashlib 處理大區塊時都會釋放 GIL，可同時使用多個核心），
+# 結果以 (裝置, inode, 大小, mtime) 快取並存到磁碟，再次搜尋時不需重新讀取。
+# 相同 inode 的硬連結只算一次；空檔案不列入。
+partial_hash_size = 4096
+# 整個檔案雜湊時每次處理的大小，也是檢查取消的間隔
+hash_chunk_size = 8 * 1024 * 1024
+hash_cache_magic = b"PFMHASH1\n"
+hash_cache_max_entries = 200_000
+
+# 裝置、inode、大小、mtime、部分雜湊、完整雜湊（未計算時為全 0）
+_record = struct.Struct("<QQqq16s32s")
+_no_digest = bytes(32)
+
+# (大小, 完整雜湊, 路徑)
+DuplicateGroup = tuple[int, bytes, list[str]]
+CacheKey = tuple[int, int, int, int]
+
+
+def partial_digest(path: str, size: int) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        h.update(f.read(partial_hash_size))
+        if size > partial_hash_size:
+            f.seek(max(partial_hash_size, size - partial_hash_size))
+            h.update(f.read(partial_hash_size))
+    return h.digest()
+
+
+def full_digest(path: str, cancel_event: threading.Event | None = None) -> bytes:
+    # 以大區塊 readinto 重複使用同一個緩衝區；不使用 mmap，
+    # 檔案在計算期間被截短時 mmap 會讓整個行程收到 SIGBUS
+    h = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(hash_chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            count = f.readinto(buffer)
+            if not count:
+                break
+            h.update(view[:count])
+    return h.digest()
+
+
+class DuplicateTask:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self.files = 0
+        self.candidates = 0
+        self.hashed_bytes = 0
+        self.errors = 0
+        self.groups: list[DuplicateGroup] = []
+        # 重複組中每個路徑掃描時的 (裝置, inode, 大小, mtime)，連結前確認檔案未再修改
+        self.keys: dict[str, CacheKey] = {}
+        # 可節省的空間：每組保留一個檔案時可釋放的大小
+        self.wasted = 0
+        self.stage = "scan"
+        self.done = False
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.cancel_event = threading.Event()
+        self._new_groups: queue.SimpleQueue = queue.SimpleQueue()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def poll(self) -> list[DuplicateGroup]:
+        # 取出上次之後找到的重複組，依檔案大小由大到小
+        groups = []
+        while True:
+            try:
+                groups.append(self._new_groups.get_nowait())
+            except queue.Empty:
+                return groups
+
+    def _add_group(self, group: DuplicateGroup, keys: dict[str, CacheKey]) -> None:
+        with self._lock:
+            self.groups.append(group)
+            self.keys.update(keys)
+            self.wasted += group[0] * (len(group[2]) - 1)
+        self._new_groups.put(group)
+
+    def _add_hashed(self, size: int) -> None:
+        with self._lock:
+            self.hashed_bytes += size
+
+    def _add_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+
+class DuplicateFinder:
+    def __init__(self, max_workers: int | None = None, cache_root: str | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._cache_root = cache_root
+        self._pool: ThreadPoolExecutor | None = None
+        self._cache_lock = threading.Lock()
+        self._cache: dict[CacheKey, tuple[bytes, bytes]] | None = None
+        self._cache_dirty = False
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="pfm-hash"
+            )
+        return self._pool
+
+    def find(self, root: str) -> DuplicateTask:
+        task = DuplicateTask(root)
+        threading.Thread(
+            target=self._run, args=(task,), name="pfm-duplicates", daemon=True
+        ).start()
+        return task
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self.save_cache()
+
+    # ---- 搜尋 ----
+
+    @traced("duplicates")
+    def _run(self, task: DuplicateTask) -> None:
+        try:
+            self._load_cache()
+            by_size = self._scan(task)
+            if not task.cancel_event.is_set():
+                self._hash_groups(task, by_size)
+        except Exception:
+            pfm_logger.exception("尋找重複檔案失敗：「 %s 」", task.root)
+            task._add_error()
+        finally:
+            self.save_cache()
+            task.finished = time.monotonic()
+            task.done = True
+        pfm_logger.info(
+            "重複檔案：「 %s 」 %d 個檔案，%d 組重複，可節省 %d bytes，%.2f 秒",
+            task.root,
+            task.files,
+            len(task.groups),
+            task.wasted,
+            task.finished - task.started,
+        )
+        return None
+
+    def _scan(self, task: DuplicateTask) -> dict[int, list[tuple[str, CacheKey]]]:
+        # 大小 -> [(路徑, 快取 key)]，不跨越掛載點，不跟隨符號連結
+        by_size: dict[int, list[tuple[str, CacheKey]]] = {}
+        seen: set[tuple[int, int]] = set()
+        try:
+            root_dev = os.stat(task.root).st_dev
+        except OSError:
+            task._add_error()
+            return by_size
+        stack = [task.root]
+        while stack and not task.cancel_event.is_set():
+            dir_path = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            task._add_error()
+                            continue
+                        if stat.S_ISDIR(st.st_mode):
+                            if st.st_dev == root_dev:
+                                stack.append(entry.path)
+                            continue
+                        if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+                            continue
+                        if (st.st_dev, st.st_ino) in seen:
+                            continue
+                        seen.add((st.st_dev, st.st_ino))
+                        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+                        by_size.setdefault(st.st_size, []).append((entry.path, key))
+                        task.files += 1
+            except OSError:
+                task._add_error()
+        return by_size
+
+    def _hash_groups(
+        self, task: DuplicateTask, by_size: dict[int, list[tuple[str, CacheKey]]]
+    ) -> None:
+        # 大檔案先處理，可節省最多空間的結果最先出現
+        sizes = sorted(
+            (size for size in by_size if len(by_size[size]) > 1), reverse=True
+        )
+        candidates = [item for size in sizes for item in by_size[size]]
+        task.candidates = len(candidates)
+        task.stage = "partial"
+        pool = self._executor()
+        partials = pool.map(lambda item: self._partial(task, *item), candidates)
+        # (大小, 部分雜湊) -> [(路徑, 快取 key)]
+        by_partial: dict[tuple[int, bytes], list[tuple[str, CacheKey]]] = {}
+        for item, digest in zip(candidates, partials):
+            if digest is not None:
+                by_partial.setdefault((item[1][2], digest), []).append(item)
+        if task.cancel_event.is_set():
+            return None
+        task.stage = "full"
+        # 先送出所有完整雜湊讓執行緒池保持忙碌，再依大小順序取回結果
+        pending = []
+        for (size, digest), items in by_partial.items():
+            if len(items) < 2:
+                continue
+            if size <= partial_hash_size * 2:
+                # 部分雜湊已涵蓋整個檔案
+                pending.append(
+                    (size, [(path, key, None) for path, key in items], digest)
+                )
+                continue
+            futures = [
+                (path, key, pool.submit(self._full, task, path, key))
+                for path, key in items
+            ]
+            pending.append((size, futures, None))
+        for size, futures, partial in pending:
+            by_full: dict[bytes, dict[str, CacheKey]] = {}
+            for path, key, future in futures:
+                digest = partial if future is None else future.result()
+                if digest is not None:
+                    by_full.setdefault(digest, {})[path] = key
+            if task.cancel_event.is_set():
+                return None
+            for digest, keys in by_full.items():
+                if len(keys) > 1:
+                    task._add_group((size, digest, sorted(keys)), keys)
+        return None
+
+    def _partial(self, task: DuplicateTask, path: str, key: CacheKey) -> bytes | None:
+        if task.cancel_event.is_set():
+            return None
+        cached = self._cached(key)
+        if cached is not None:
+            return cached[0]
+        try:
+            digest = partial_digest(path, key[2])
+        except OSError:
+            task._add_error()
+            return None
+        self._store(key, digest, _no_digest)
+        return digest
+
+    def _full(self, task: DuplicateTask, path: str, key: CacheKey) -> bytes | None:
+        if task.cancel_event.is_set():
+            return None
+        cached = self._cached(key)
+        if cached is not None and cached[1] != _no_digest:
+            return cached[1]
+        try:
+            digest = full_digest(path, task.cancel_event)
+        except (OSError, ValueError):
+            task._add_error()
+            return None
+        if task.cancel_event.is_set():
+            return None
+        task._add_hashed(key[2])
+        self._store(key, cached[0] if cached else _no_digest, digest)
+        return digest
+
+    # ---- 雜湊快取 ----
+
+    def _cached(self, key: CacheKey) -> tuple[bytes, bytes] | None:
+        with self._cache_lock:
+            return self._cache.get(key) if self._cache is not None else None
+
+    def _store(self, key: CacheKey, partial: bytes, full: bytes) -> None:
+        with self._cache_lock:
+            if self._cache is None:
+                return None
+            if len(self._cache) >= hash_cache_max_entries and key not in self._cache:
+                # 超過上限時丟棄最早加入的一半
+                for old in list(self._cache)[: hash_cache_max_entries // 2]:
+                    del self._cache[old]
+            self._cache[key] = (partial, full)
+            self._cache_dirty = True
+        return None
+
+    def _cache_path(self) -> str:
+        return os.path.join(self._cache_root or cache_dir("hashes"), "hashes.bin")
+
+    def _load_cache(self) -> None:
+        with self._cache_lock:
+            if self._cache is not None:
+                return None
+            self._cache = {}
+        try:
+            with open(self._cache_path(), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(hash_cache_magic):
+            return None
+        body = memoryview(data)[len(hash_cache_magic) :]
+        body = body[: len(body) - len(body) % _record.size]
+        cache = {}
+        for dev, ino, size, mtime, partial, full in _record.iter_unpack(body):
+            cache[(dev, ino, size, mtime)] = (partial, full)
+        with self._cache_lock:
+            cache.update(self._cache)
+            self._cache = cache
+        pfm_logger.debug("載入雜湊快取：%d 筆", len(cache))
+        return None
+
+    def save_cache(self) -> None:
+        with self._cache_lock:
+            if not self._cache_dirty or self._cache is None:
+                return None
+            records = [
+                _record.pack(*key, partial, full)
+                for key, (partial, full) in self._cache.items()
+            ]
+            self._cache_dirty = False
+        cache_path = self._cache_path()
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(hash_cache_magic)
+                f.write(b"".join(records))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            pfm_logger.warning("無法儲存雜湊快取：%s", e)
+        return None
@@ -0,0 +1,546 @@
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from app_dirs import cache_dir
+from dir_model import KIND_DIR, KIND_FILE, KIND_REMOVED
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+index_file_magic = b"PFMIDX1\n"
+# 每個搜尋區段的項目數，項目變更時只需重建所在的區段
+index_segment_size = 65536
+# 定期以資料夾 mtime 檢查整個索引的間隔 (秒)
+index_rescan_interval = 600.0
+# 有變更時寫回磁碟的最短間隔 (秒)
+index_save_interval = 60.0
+
+_section = struct.Struct("<Q")
+
+
+def _keep_best(best: list, item: tuple[int, int, int], limit: int) -> None:
+    # best 是以負值保存的堆積，堆頂為目前保留的項目中最差的一個
+    negated = (-item[0], -item[1], -item[2])
+    if len(best) < limit:
+        heapq.heappush(best, negated)
+    elif negated > best[0]:
+        heapq.heapreplace(best, negated)
+
+
+def _sorted_best(best: list) -> list[tuple[int, int, int]]:
+    return sorted((-rank, -length, -entry) for rank, length, entry in best)
+
+
+# 一段項目的小寫檔名，以 "\0" 串接成一個字串。
+# 搜尋時直接對整段字串使用 str.find / re，比對在 C 中完成，不需要逐一走訪檔名。
+class _Segment:
+    __slots__ = ("base", "blob", "starts")
+
+    def __init__(self, base: int, names: list[str]) -> None:
+        self.base = base
+        parts = [name.lower() for name in names]
+        self.blob = "\0" + "\0".join(parts) + "\0"
+        # starts[i]：第 i 個檔名前的 "\0" 位置，最後一個為結尾的 "\0"
+        self.starts = array(
+            "L", itertools.accumulate((len(part) + 1 for part in parts), initial=0)
+        )
+
+    def entry_at(self, pos: int) -> int:
+        return bisect_right(self.starts, pos) - 1
+
+
+# 檔名索引：在背景執行緒走訪索引根目錄，結果存到快取資料夾供下次啟動使用；
+# 之後依資料夾 mtime 與監看通知增量更新。刪除的項目只標記，寫回磁碟時再壓縮。
+class FileIndex:
+    def __init__(self, roots: list[str], cache_root: str | None = None) -> None:
+        self.roots = [os.path.normpath(os.path.expanduser(root)) for root in roots]
+        key = hashlib.sha1(
+            "\0".join(self.roots).encode("utf-8", "surrogateescape")
+        ).hexdigest()
+        self.index_path = os.path.join(
+            cache_root or cache_dir("index"), f"{key[:16]}.idx"
+        )
+        self._lock = threading.Lock()
+        self._notify_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.ready = False
+        self.scanning = False
+        self._dirty = False
+        self._saved_time = 0.0
+        # 搜尋在另一條執行緒執行，輸入期間只保留最新的查詢
+        self._search_cond = threading.Condition()
+        self._search_request: tuple[int, str, int] | None = None
+        self._search_results: tuple[int, str, list] | None = None
+        self.search_generation = 0
+        self._clear()
+
+    def _clear(self) -> None:
+        # 項目：檔名、所在資料夾 id、kind
+        self.names: list[str] = []
+        self.parents = array("l")
+        self.kinds = bytearray()
+        self.removed = 0
+        # 資料夾：完整路徑、mtime(ns)、子項目、對應的項目 id（根目錄為 -1）
+        self.dir_paths: list[str] = []
+        self.dir_mtimes = array("q")
+        self.dir_children: list[array] = []
+        self.dir_entry = array("l")
+        self.dir_ids: dict[str, int] = {}
+        self.dir_of_entry: dict[int, int] = {}
+        self._segments: list[_Segment | None] = []
+
+    def __len__(self) -> int:
+        return len(self.names) - self.removed
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="pfm-file-index", daemon=True
+        )
+        self._thread.start()
+        threading.Thread(
+            target=self._search_loop, name="pfm-file-search", daemon=True
+        ).start()
+
+    def notify(self, path: str) -> None:
+        # 資料夾內容改變（例如監看通知），在背景重新比對這一層
+        self._notify_queue.put(os.path.normpath(path))
+
+    def shutdown(self) -> None:
+        self._stop_event.set()
+        self._notify_queue.put(None)
+        with self._search_cond:
+            self._search_cond.notify()
+        if self._dirty and self.ready:
+            self.save()
+
+    # ---- 建立與更新 ----
+
+    def _run(self) -> None:
+        self.scanning = True
+        started = time.monotonic()
+        loaded = self.load()
+        self.ready = loaded
+        for root in self.roots:
+            if self._stop_event.is_set():
+                return None
+            dir_id = self.dir_ids.get(root)
+            if dir_id is None:
+                with self._lock:
+                    dir_id = self._add_dir(root, -1)
+            self._rescan(dir_id)
+        self.ready = True
+        self.scanning = False
+        pfm_logger.info(
+            "檔名索引完成：%d 個項目，%.1f 秒%s",
+            len(self),
+            time.monotonic() - started,
+            "（由快取更新）" if loaded else "",
+        )
+        self._save_if_dirty(force=True)
+        next_rescan = time.monotonic() + index_rescan_interval
+        while not self._stop_event.is_set():
+            try:
+                path = self._notify_queue.get(
+                    timeout=max(0.0, next_rescan - time.monotonic())
+                )
+            except queue.Empty:
+                self.scanning = True
+                for root in self.roots:
+                    dir_id = self.dir_ids.get(root)
+                    if dir_id is not None:
+                        self._rescan(dir_id)
+                self.scanning = False
+                next_rescan = time.monotonic() + index_rescan_interval
+                self._save_if_dirty()
+                continue
+            if path is None:
+                break
+            dir_id = self.dir_ids.get(path)
+            if dir_id is not None:
+                self._rescan(dir_id, recursive=False)
+                self._save_if_dirty()
+        return None
+
+    def _add_entry(self, dir_id: int, name: str, kind: int) -> int:
+        entry = len(self.names)
+        self.names.append(name)
+        self.parents.append(dir_id)
+        self.kinds.append(kind)
+        self.dir_children[dir_id].append(entry)
+        segment = entry // index_segment_size
+        if segment < len(self._segments):
+            self._segments[segment] = None
+        self._dirty = True
+        return entry
+
+    def _add_dir(self, dir_path: str, entry: int) -> int:
+        dir_id = len(self.dir_paths)
+        self.dir_paths.append(dir_path)
+        self.dir_mtimes.append(-1)
+        self.dir_children.append(array("L"))
+        self.dir_entry.append(entry)
+        self.dir_ids[dir_path] = dir_id
+        if entry != -1:
+            self.dir_of_entry[entry] = dir_id
+        return dir_id
+
+    def _remove_entry(self, entry: int) -> None:
+        if self.kinds[entry] & KIND_REMOVED:
+            return None
+        self.kinds[entry] = KIND_REMOVED
+        self.removed += 1
+        self._dirty = True
+        dir_id = self.dir_of_entry.pop(entry, None)
+        if dir_id is None:
+            return None
+        # 整個子樹一起移除
+        stack = [dir_id]
+        while stack:
+            dir_id = stack.pop()
+            self.dir_ids.pop(self.dir_paths[dir_id], None)
+            self.dir_mtimes[dir_id] = -1
+            for child in self.dir_children[dir_id]:
+                if not self.kinds[child] & KIND_REMOVED:
+                    self.kinds[child] = KIND_REMOVED
+                    self.removed += 1
+                child_dir = self.dir_of_entry.pop(child, None)
+                if child_dir is not None:
+                    stack.append(child_dir)
+        return None
+
+    def _rescan(self, dir_id: int, recursive: bool = True) -> None:
+        # 每個資料夾只 stat 一次，mtime 改變的資料夾才重新列出
+        dev = None
+        stack = [(dir_id, recursive)]
+        while stack and not self._stop_event.is_set():
+            dir_id, recursive = stack.pop()
+            dir_path = self.dir_paths[dir_id]
+            if self.dir_ids.get(dir_path) != dir_id:
+                continue
+            try:
+                st = os.stat(dir_path, follow_symlinks=False)
+            except OSError:
+                with self._lock:
+                    if self.dir_entry[dir_id] != -1:
+                        self._remove_entry(self.dir_entry[dir_id])
+                continue
+            if dev is None:
+                dev = st.st_dev
+            elif st.st_dev != dev:
+                # 不跨越掛載點
+                continue
+            if st.st_mtime_ns != self.dir_mtimes[dir_id]:
+                new_dirs = self._sync_dir(dir_id, dir_path, st.st_mtime_ns)
+                if new_dirs is None:
+                    continue
+                # 新出現的資料夾一定要完整走訪
+                stack.extend((new_dir, True) for new_dir in new_dirs)
+            if recursive:
+                stack.extend(
+                    (self.dir_of_entry[child], True)
+                    for child in self.dir_children[dir_id]
+                    if child in self.dir_of_entry
+                    and self.dir_mtimes[self.dir_of_entry[child]] != -1
+                )
+        return None
+
+    def _sync_dir(self, dir_id: int, dir_path: str, mtime: int) -> list[int] | None:
+        try:
+            with os.scandir(dir_path) as it:
+                items = {
+                    entry.name: (
+                        KIND_DIR if entry.is_dir(follow_symlinks=False) else KIND_FILE
+                    )
+                    for entry in it
+                }
+        except OSError:
+            return None
+        new_dirs = []
+        with self._lock:
+            existing = {}
+            for child in self.dir_children[dir_id]:
+                if not self.kinds[child] & KIND_REMOVED:
+                    existing[self.names[child]] = child
+            for name, child in existing.items():
+                if items.get(name) != self.kinds[child]:
+                    self._remove_entry(child)
+            for name, kind in items.items():
+                child = existing.get(name)
+                if child is not None and self.kinds[child] == kind:
+                    continue
+                child = self._add_entry(dir_id, name, kind)
+                if kind == KIND_DIR:
+                    new_dirs.append(self._add_dir(os.path.join(dir_path, name), child))
+            self.dir_mtimes[dir_id] = mtime
+        return new_dirs
+
+    # ---- 搜尋 ----
+
+    def _segment(self, number: int) -> _Segment:
+        while len(self._segments) <= number:
+            self._segments.append(None)
+        segment = self._segments[number]
+        if segment is None:
+            base = number * index_segment_size
+            segment = _Segment(base, self.names[base : base + index_segment_size])
+            # 仍在增加中的最後一段不保留，下次搜尋再重建
+            if len(segment.starts) - 1 == index_segment_size:
+                self._segments[number] = segment
+        return segment
+
+    def path_of(self, entry: int) -> str:
+        return os.path.join(self.dir_paths[self.parents[entry]], self.names[entry])
+
+    def search(self, query: str, limit: int = 200) -> list[tuple[str, int]]:
+        # 回傳依相關程度排序的 (完整路徑, kind)：
+        # 完全相同 > 開頭相同 > 字首相同 > 包含 > 模糊比對（字元依序出現）
+        query = query.lower()
+        if not query or "\0" in query:
+            return []
+        with self._lock:
+            segments = [
+                self._segment(number)
+                for number in range(
+                    (len(self.names) + index_segment_size - 1) // index_segment_size
+                )
+            ]
+            scored = self._substring_matches(segments, query, limit)
+            if len(scored) < limit and len(query) >= 2:
+                # 包含查詢字串的檔名也符合模糊比對，多保留這些數量再排除
+                seen = {entry for _, _, entry in scored}
+                scored += [
+                    item
+                    for item in self._fuzzy_matches(segments, query, limit + len(seen))
+                    if item[2] not in seen
+                ]
+            best = heapq.nsmallest(limit, scored)
+            return [(self.path_of(entry), self.kinds[entry]) for _, _, entry in best]
+
+    def request_search(self, query: str, limit: int = 200) -> int:
+        with self._search_cond:
+            self.search_generation += 1
+            self._search_request = (self.search_generation, query, limit)
+            self._search_cond.notify()
+        return self.search_generation
+
+    def poll_search(self) -> tuple[str, list[tuple[str, int]]] | None:
+        # 只回傳最新一次查詢的結果，舊查詢的結果直接丟棄
+        results = self._search_results
+        if results is None or results[0] != self.search_generation:
+            return None
+        self._search_results = None
+        return results[1], results[2]
+
+    def _search_loop(self) -> None:
+        while not self._stop_event.is_set():
+            with self._search_cond:
+                while self._search_request is None:
+                    if self._stop_event.is_set():
+                        return None
+                    self._search_cond.wait()
+                generation, query, limit = self._search_request
+                self._search_request = None
+            started = time.perf_counter()
+            results = self.search(query, limit)
+            pfm_logger.debug(
+                "搜尋「%s」：%d 筆，%.1f ms",
+                query,
+                len(results),
+                (time.perf_counter() - started) * 1000,
+            )
+            self._search_results = (generation, query, results)
+        return None
+
+    def _substring_matches(
+        self, segments, query: str, limit: int
+    ) -> list[tuple[int, int, int]]:
+        # 走訪所有符合的檔名，只保留 (rank, 長度) 最好的 limit 個。
+        # 先以 "\0" + query 找出開頭相同的檔名（rank 0 / 1），已經足夠時不再找包含的檔名
+        best: list[tuple[int, int, int]] = []
+        kinds = self.kinds
+        prefix = "\0" + query
+        for segment in segments:
+            blob = segment.blob
+            starts = segment.starts
+            pos = blob.find(prefix)
+            while pos != -1:
+                i = segment.entry_at(pos + 1)
+                end = starts[i + 1]
+                entry = segment.base + i
+                if not kinds[entry] & KIND_REMOVED:
+                    length = end - starts[i] - 1
+                    rank = 0 if length == len(query) else 1
+                    _keep_best(best, (rank, length, entry), limit)
+                pos = blob.find(prefix, end)
+        if len(best) == limit and -best[0][0] <= 1:
+            return _sorted_best(best)
+        for segment in segments:
+            blob = segment.blob
+            starts = segment.starts
+            pos = blob.find(query)
+            while pos != -1:
+                i = segment.entry_at(pos)
+                start = starts[i] + 1
+                end = starts[i + 1]
+                entry = segment.base + i
+                if pos != start and not kinds[entry] & KIND_REMOVED:
+                    rank = 3 if blob[pos - 1].isalnum() else 2
+                    _keep_best(best, (rank, end - start, entry), limit)
+                # 每個檔名只計算一次，直接跳到下一個檔名
+                pos = blob.find(query, end)
+        return _sorted_best(best)
+
+    def _fuzzy_matches(
+        self, segments, query: str, limit: int
+    ) -> list[tuple[int, int, int]]:
+        # 以「不含下一個字元」的字元集合取代 .*?，比對不會回溯，成本與資料量成線性
+        pattern = re.compile(
+            re.escape(query[0])
+            + "".join(
+                f"[^\\0{re.escape(char)}]*{re.escape(char)}" for char in query[1:]
+            )
+        )
+        best: list[tuple[int, int, int]] = []
+        kinds = self.kinds
+        for segment in segments:
+            for match in pattern.finditer(segment.blob):
+                i = segment.entry_at(match.start())
+                entry = segment.base + i
+                if not kinds[entry] & KIND_REMOVED:
+                    # 字元越集中排名越前面
+                    _keep_best(best, (4, match.end() - match.start(), entry), limit)
+        return _sorted_best(best)
+
+    # ---- 讀寫磁碟 ----
+
+    def _save_if_dirty(self, force: bool = False) -> None:
+        if not self._dirty:
+            return None
+        if force or time.monotonic() - self._saved_time >= index_save_interval:
+            self.save()
+        return None
+
+    def save(self) -> None:
+        # 在鎖內只複製參照與陣列，壓縮與寫入在鎖外進行
+        with self._lock:
+            names = list(self.names)
+            parents = array("l", self.parents)
+            kinds = bytearray(self.kinds)
+            dir_paths = list(self.dir_paths)
+            dir_mtimes = array("q", self.dir_mtimes)
+            dir_entry = array("l", self.dir_entry)
+            live_dirs = sorted(self.dir_ids.values())
+            self._dirty = False
+        self._saved_time = time.monotonic()
+        dir_map = {dir_id: new_id for new_id, dir_id in enumerate(live_dirs)}
+        entry_map = {}
+        out_names = []
+        out_parents = array("l")
+        out_kinds = bytearray()
+        for entry, name in enumerate(names):
+            parent = dir_map.get(parents[entry])
+            if parent is None or kinds[entry] & KIND_REMOVED:
+                continue
+            entry_map[entry] = len(out_names)
+            out_names.append(name)
+            out_parents.append(parent)
+            out_kinds.append(kinds[entry])
+        out_dir_paths = [dir_paths[dir_id] for dir_id in live_dirs]
+        out_dir_mtimes = array("q", (dir_mtimes[dir_id] for dir_id in live_dirs))
+        out_dir_entry = array(
+            "l", (entry_map.get(dir_entry[dir_id], -1) for dir_id in live_dirs)
+        )
+        header = json.dumps(
+            {"roots": self.roots, "entries": len(out_names), "dirs": len(live_dirs)}
+        ).encode("utf-8")
+        sections = [
+            header,
+            "\0".join(out_names).encode("utf-8", "surrogateescape"),
+            out_parents.tobytes(),
+            bytes(out_kinds),
+            "\0".join(out_dir_paths).encode("utf-8", "surrogateescape"),
+            out_dir_mtimes.tobytes(),
+            out_dir_entry.tobytes(),
+        ]
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(index_file_magic)
+                for section in sections:
+                    f.write(_section.pack(len(section)))
+                    f.write(section)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            pfm_logger.warning("無法寫入檔名索引：%s", e)
+            return None
+        pfm_logger.debug("已寫入檔名索引：%d 個項目", len(out_names))
+        return None
+
+    def load(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return False
+        if not data.startswith(index_file_magic):
+            return False
+        sections = []
+        offset = len(index_file_magic)
+        try:
+            for _ in range(7):
+                (size,) = _section.unpack_from(data, offset)
+                offset += _section.size
+                sections.append(data[offset : offset + size])
+                offset += size
+            header = json.loads(sections[0])
+        except (struct.error, ValueError):
+            return False
+        if header.get("roots") != self.roots:
+            return False
+        names = sections[1].decode("utf-8", "surrogateescape").split("\0")
+        if not header["entries"]:
+            names = []
+        parents = array("l")
+        parents.frombytes(sections[2])
+        kinds = bytearray(sections[3])
+        dir_paths = sections[4].decode("utf-8", "surrogateescape").split("\0")
+        dir_mtimes = array("q")
+        dir_mtimes.frombytes(sections[5])
+        dir_entry = array("l")
+        dir_entry.frombytes(sections[6])
+        if not (
+            len(names) == len(parents) == len(kinds) == header["entries"]
+            and len(dir_paths) == len(dir_mtimes) == len(dir_entry) == header["dirs"]
+        ):
+            return False
+        dir_children = [array("L") for _ in dir_paths]
+        for entry, parent in enumerate(parents):
+            dir_children[parent].append(entry)
+        with self._lock:
+            self._clear()
+            self.names = names
+            self.parents = parents
+            self.kinds = kinds
+            self.dir_paths = dir_paths
+            self.dir_mtimes = dir_mtimes
+            self.dir_children = dir_children
+            self.dir_entry = dir_entry
+            self.dir_ids = {
+                dir_path: dir_id for dir_id, dir_path in enumerate(dir_paths)
+            }
+            self.dir_of_entry = {
+                entry: dir_id for dir_id, entry in enumerate(dir_entry) if entry != -1
+            }
+        pfm_logger.debug("已讀取檔名索引：%d 個項目", len(names))
+        return True
@@ -0,0 +1,250 @@
+import logging
+import mimetypes
+import os
+import queue
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from preview import detect_encoding
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 檔案類型：先依副檔名判斷（只查表，可在繪製時呼叫），沒有已知副檔名的檔案在背景讀取開頭
+# 的魔術位元組。副檔名的結果以副檔名快取，讀取內容的結果以 (裝置, inode, mtime) 快取，
+# 同一個檔案經由不同路徑或重新進入資料夾時不再讀取。類型同時決定列表中的圖示。
+KIND_FILE = "file"
+KIND_TEXT = "text"
+KIND_CODE = "code"
+KIND_IMAGE = "image"
+KIND_AUDIO = "audio"
+KIND_VIDEO = "video"
+KIND_ARCHIVE = "archive"
+KIND_DOCUMENT = "document"
+KIND_EXECUTABLE = "executable"
+
+file_kinds = (
+    KIND_FILE,
+    KIND_TEXT,
+    KIND_CODE,
+    KIND_IMAGE,
+    KIND_AUDIO,
+    KIND_VIDEO,
+    KIND_ARCHIVE,
+    KIND_DOCUMENT,
+    KIND_EXECUTABLE,
+)
+
+# (類型, MIME)
+FileType = tuple[str, str]
+
+unknown_type: FileType = (KIND_FILE, "application/octet-stream")
+
+# mimetypes 沒有或分類不準確的副檔名
+_extension_types: dict[str, FileType] = {
+    ".py": (KIND_CODE, "text/x-python"),
+    ".c": (KIND_CODE, "text/x-c"),
+    ".h": (KIND_CODE, "text/x-c"),
+    ".cpp": (KIND_CODE, "text/x-c++"),
+    ".hpp": (KIND_CODE, "text/x-c++"),
+    ".rs": (KIND_CODE, "text/x-rust"),
+    ".go": (KIND_CODE, "text/x-go"),
+    ".java": (KIND_CODE, "text/x-java"),
+    ".js": (KIND_CODE, "text/javascript"),
+    ".ts": (KIND_CODE, "text/x-typescript"),
+    ".sh": (KIND_CODE, "application/x-sh"),
+    ".json": (KIND_CODE, "application/json"),
+    ".toml": (KIND_CODE, "application/toml"),
+    ".yaml": (KIND_CODE, "application/yaml"),
+    ".yml": (KIND_CODE, "application/yaml"),
+    ".xml": (KIND_CODE, "application/xml"),
+    ".html": (KIND_CODE, "text/html"),
+    ".css": (KIND_CODE, "text/css"),
+    ".md": (KIND_TEXT, "text/markdown"),
+    ".log": (KIND_TEXT, "text/plain"),
+    ".zip": (KIND_ARCHIVE, "application/zip"),
+    ".tar": (KIND_ARCHIVE, "application/x-tar"),
+    ".gz": (KIND_ARCHIVE, "application/gzip"),
+    ".tgz": (KIND_ARCHIVE, "application/gzip"),
+    ".bz2": (KIND_ARCHIVE, "application/x-bzip2"),
+    ".xz": (KIND_ARCHIVE, "application/x-xz"),
+    ".zst": (KIND_ARCHIVE, "application/zstd"),
+    ".7z": (KIND_ARCHIVE, "application/x-7z-compressed"),
+    ".rar": (KIND_ARCHIVE, "application/vnd.rar"),
+    ".pdf": (KIND_DOCUMENT, "application/pdf"),
+    ".exe": (KIND_EXECUTABLE, "application/vnd.microsoft.portable-executable"),
+    ".msi": (KIND_EXECUTABLE, "application/x-msi"),
+    ".appimage": (KIND_EXECUTABLE, "application/vnd.appimage"),
+}
+
+_document_mime_prefixes = (
+    "application/msword",
+    "application/vnd.ms-",
+    "application/vnd.openxmlformats-officedocument",
+    "application/vnd.oasis.opendocument",
+    "application/rtf",
+    "application/epub",
+)
+
+# (位移, 魔術位元組, 類型)；依序比對，較長、較特定的放前面
+_magic_types: tuple[tuple[int, bytes, FileType], ...] = (
+    (0, b"\x89PNG\r\n\x1a\n", (KIND_IMAGE, "image/png")),
+    (0, b"\xff\xd8\xff", (KIND_IMAGE, "image/jpeg")),
+    (0, b"GIF8", (KIND_IMAGE, "image/gif")),
+    (8, b"WEBP", (KIND_IMAGE, "image/webp")),
+    (8, b"WAVE", (KIND_AUDIO, "audio/wav")),
+    (8, b"AVI ", (KIND_VIDEO, "video/x-msvideo")),
+    (0, b"ID3", (KIND_AUDIO, "audio/mpeg")),
+    (0, b"fLaC", (KIND_AUDIO, "audio/flac")),
+    (0, b"OggS", (KIND_AUDIO, "audio/ogg")),
+    (0, b"\x1a\x45\xdf\xa3", (KIND_VIDEO, "video/x-matroska")),
+    (4, b"ftyp", (KIND_VIDEO, "video/mp4")),
+    (0, b"%PDF-", (KIND_DOCUMENT, "application/pdf")),
+    (0, b"PK\x03\x04", (KIND_ARCHIVE, "application/zip")),
+    (0, b"\x1f\x8b", (KIND_ARCHIVE, "application/gzip")),
+    (0, b"BZh", (KIND_ARCHIVE, "application/x-bzip2")),
+    (0, b"\xfd7zXZ\x00", (KIND_ARCHIVE, "application/x-xz")),
+    (0, b"\x28\xb5\x2f\xfd", (KIND_ARCHIVE, "application/zstd")),
+    (0, b"7z\xbc\xaf\x27\x1c", (KIND_ARCHIVE, "application/x-7z-compressed")),
+    (0, b"Rar!\x1a\x07", (KIND_ARCHIVE, "application/vnd.rar")),
+    (257, b"ustar", (KIND_ARCHIVE, "application/x-tar")),
+    (0, b"\x7fELF", (KIND_EXECUTABLE, "application/x-executable")),
+    (0, b"MZ", (KIND_EXECUTABLE, "application/vnd.microsoft.portable-executable")),
+    (0, b"\xcf\xfa\xed\xfe", (KIND_EXECUTABLE, "application/x-mach-binary")),
+    (0, b"#!", (KIND_CODE, "text/x-script")),
+)
+# 需要讀取的開頭長度：tar 的標記在 257，文字判斷需要多一些內容
+sniff_size = 4096
+
+
+def type_from_extension(name: str) -> FileType | None:
+    extension = os.path.splitext(name)[1].lower()
+    if not extension:
+        return None
+    file_type = _extension_types.get(extension)
+    if file_type is not None:
+        return file_type
+    mime, _ = mimetypes.guess_type(name, strict=False)
+    if mime is None:
+        return None
+    major = mime.split("/", 1)[0]
+    if major in (KIND_IMAGE, KIND_AUDIO, KIND_VIDEO, KIND_TEXT):
+        return major, mime
+    if mime.startswith(_document_mime_prefixes):
+        return KIND_DOCUMENT, mime
+    return KIND_FILE, mime
+
+
+def type_from_content(head: bytes) -> FileType:
+    for offset, magic, file_type in _magic_types:
+        if head.startswith(magic, offset):
+            return file_type
+    if not head:
+        return KIND_TEXT, "text/plain"
+    encoding, _ = detect_encoding(head)
+    if encoding is not None:
+        return KIND_TEXT, "text/plain"
+    return unknown_type
+
+
+class FileTypeCache:
+    def __init__(self, max_entries: int = 100_000) -> None:
+        # 以路徑與 inode 快取的項目數上限，超過時移除最久未使用的項目
+        self.max_entries = max_entries
+        # 副檔名 -> 類型；None 表示需要讀取內容
+        self._by_extension: dict[str, FileType | None] = {}
+        # 完整路徑 -> 讀取內容得到的類型，只在 UI 執行緒使用
+        self._by_path: OrderedDict[str, FileType] = OrderedDict()
+        # (裝置, inode, mtime) -> 類型，由背景執行緒共用
+        self._inode_lock = threading.Lock()
+        self._by_inode: OrderedDict[tuple[int, int, int], FileType] = OrderedDict()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: dict[str, Future] = {}
+        self._done: queue.SimpleQueue = queue.SimpleQueue()
+
+    def type_of(self, full_path: str) -> FileType:
+        # 只查表；需要讀取內容時先回傳未知類型並在背景判斷，完成後由 poll 回傳路徑
+        name = os.path.basename(full_path)
+        extension = os.path.splitext(name)[1].lower()
+        if extension in self._by_extension:
+            file_type = self._by_extension[extension]
+        else:
+            file_type = type_from_extension(name)
+            self._by_extension[extension] = file_type
+        if file_type is not None:
+            return file_type
+        file_type = self._by_path.get(full_path)
+        if file_type is not None:
+            self._by_path.move_to_end(full_path)
+            return file_type
+        self._request(full_path)
+        return unknown_type
+
+    def kind_of(self, full_path: str) -> str:
+        return self.type_of(full_path)[0]
+
+    def _request(self, full_path: str) -> None:
+        if full_path in self._pending:
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="pfm-file-type"
+            )
+        future = self._executor.submit(self._sniff, full_path)
+        self._pending[full_path] = future
+        future.add_done_callback(
+            lambda f, full_path=full_path: self._done.put((full_path, f))
+        )
+        return None
+
+    def _sniff(self, full_path: str) -> FileType:
+        try:
+            st = os.stat(full_path)
+            # FIFO 與裝置檔開啟時可能卡住，只讀取一般檔案
+            if not stat.S_ISREG(st.st_mode):
+                return unknown_type
+            key = (st.st_dev, st.st_ino, st.st_mtime_ns)
+            with self._inode_lock:
+                file_type = self._by_inode.get(key)
+                if file_type is not None:
+                    self._by_inode.move_to_end(key)
+                    return file_type
+            with open(full_path, "rb") as f:
+                file_type = type_from_content(f.read(sniff_size))
+        except OSError as e:
+            pfm_logger.debug("無法讀取檔案類型：「 %s 」，%s", full_path, e)
+            return unknown_type
+        with self._inode_lock:
+            self._by_inode[key] = file_type
+            if len(self._by_inode) > self.max_entries:
+                self._by_inode.popitem(last=False)
+        return file_type
+
+    def poll(self, max_items: int = 256) -> list[str]:
+        # 回傳類型已判斷完成的路徑
+        paths = []
+        while len(paths) < max_items:
+            try:
+                full_path, future = self._done.get_nowait()
+            except queue.Empty:
+                break
+            if self._pending.get(full_path) is future:
+                del self._pending[full_path]
+            if future.cancelled():
+                continue
+            self._by_path[full_path] = future.result()
+            self._by_path.move_to_end(full_path)
+            if len(self._by_path) > self.max_entries:
+                self._by_path.popitem(last=False)
+            paths.append(full_path)
+        return paths
+
+    def forget(self, full_path: str) -> None:
+        # 檔案內容改變時重新判斷
+        self._by_path.pop(full_path, None)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,218 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from dir_model import DirectoryModel
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+
+# 單一資料夾（不含子資料夾）的項目，以資料夾的 (st_mtime_ns, st_ino) 判斷是否仍有效。
+# 資料夾的 mtime 只在新增 / 刪除 / 改名項目時改變，檔案內容變大不會改變，
+# 因此只快取檔名，每次計算仍重新 stat 檔案，只省下讀取資料夾。
+class _DirListing:
+    __slots__ = ("stamp", "files", "subdirs")
+
+    def __init__(self, stamp: tuple[int, int]) -> None:
+        self.stamp = stamp
+        self.files: list[str] = []
+        self.subdirs: list[str] = []
+
+
+class _DirSizes:
+    __slots__ = ("size", "files", "links", "subdirs")
+
+    def __init__(self, subdirs: list[str]) -> None:
+        self.size = 0
+        self.files = 0
+        # 有多個硬連結的檔案：(st_dev, st_ino, size)，在加總時去除重複
+        self.links: list[tuple[int, int, int]] = []
+        self.subdirs = subdirs
+
+    def add_file(self, st: os.stat_result) -> None:
+        if st.st_nlink > 1:
+            self.links.append((st.st_dev, st.st_ino, st.st_size))
+        else:
+            self.size += st.st_size
+            self.files += 1
+
+
+class FolderSizeTask:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.size = 0
+        self.files = 0
+        self.dirs = 0
+        self.errors = 0
+        self.done = False
+        self.started = time.monotonic()
+        self.finished: float | None = None
+        self.cancel_event = threading.Event()
+        self.root_dev = -1
+        self._pending = 0
+        self._links: set[tuple[int, int]] = set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def _add(self, sizes: _DirSizes) -> None:
+        with self._lock:
+            self.size += sizes.size
+            self.files += sizes.files
+            self.dirs += 1
+            for dev, ino, size in sizes.links:
+                if (dev, ino) not in self._links:
+                    self._links.add((dev, ino))
+                    self.size += size
+                    self.files += 1
+
+    def _add_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+
+# 平行計算資料夾大小：每個資料夾是一個工作，子資料夾再送回執行緒池，
+# scandir / stat 期間會釋放 GIL，多個執行緒可以同時等待磁碟。
+# 不跨越掛載點（與 du -x 相同）。
+class FolderSizeCalculator:
+    def __init__(self, max_workers: int = 16, max_cache_dirs: int = 500_000) -> None:
+        self.max_workers = max_workers
+        self.max_cache_dirs = max_cache_dirs
+        self._pool: ThreadPoolExecutor | None = None
+        # 所有工作執行緒共用的 LRU 快取
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict[str, _DirListing] = OrderedDict()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="pfm-folder-size"
+            )
+        return self._pool
+
+    def calculate(self, path: str) -> FolderSizeTask:
+        task = FolderSizeTask(path)
+        try:
+            task.root_dev = os.stat(path).st_dev
+        except OSError:
+            task._add_error()
+            task.done = True
+            task.finished = time.monotonic()
+            return task
+        self._submit(task, path)
+        return task
+
+    def stat_files(
+        self, model: DirectoryModel, indices: list[int], chunk_size: int = 256
+    ) -> FolderSizeTask:
+        # 分段平行 stat 列表中的檔案，大小寫回 model
+        task = FolderSizeTask(model.path)
+        with task._lock:
+            task._pending = 1
+        for start in range(0, len(indices), chunk_size):
+            with task._lock:
+                task._pending += 1
+            self._executor().submit(
+                self._stat_chunk, task, model, indices[start : start + chunk_size]
+            )
+        self._task_done(task)
+        return task
+
+    def _stat_chunk(
+        self, task: FolderSizeTask, model: DirectoryModel, indices: list[int]
+    ) -> None:
+        try:
+            for index in indices:
+                if task.cancel_event.is_set():
+                    break
+                size = model.size_at(index)
+                with task._lock:
+                    task.size += size
+                    task.files += 1
+        finally:
+            self._task_done(task)
+        return None
+
+    def _task_done(self, task: FolderSizeTask) -> None:
+        with task._lock:
+            task._pending -= 1
+            done = task._pending == 0
+        if done:
+            task.finished = time.monotonic()
+            task.done = True
+            pfm_logger.debug(
+                "大小計算完成：「 %s 」 %d bytes，%d 個檔案，%d 個資料夾，%.2f 秒",
+                task.path,
+                task.size,
+                task.files,
+                task.dirs,
+                task.finished - task.started,
+            )
+        return None
+
+    def _submit(self, task: FolderSizeTask, dir_path: str) -> None:
+        with task._lock:
+            task._pending += 1
+        self._executor().submit(self._walk_dir, task, dir_path)
+
+    def _walk_dir(self, task: FolderSizeTask, dir_path: str) -> None:
+        try:
+            if not task.cancel_event.is_set():
+                sizes = self._dir_sizes(dir_path, task.root_dev)
+                task._add(sizes)
+                for name in sizes.subdirs:
+                    self._submit(task, os.path.join(dir_path, name))
+        except OSError:
+            task._add_error()
+        finally:
+            self._task_done(task)
+        return None
+
+    def _dir_sizes(self, dir_path: str, root_dev: int) -> _DirSizes:
+        st = os.stat(dir_path, follow_symlinks=False)
+        stamp = (st.st_mtime_ns, st.st_ino)
+        with self._cache_lock:
+            listing = self._cache.get(dir_path)
+            if listing is not None and listing.stamp == stamp:
+                self._cache.move_to_end(dir_path)
+            else:
+                listing = None
+        if listing is not None:
+            sizes = _DirSizes(listing.subdirs)
+            for name in listing.files:
+                try:
+                    sizes.add_file(
+                        os.stat(os.path.join(dir_path, name), follow_symlinks=False)
+                    )
+                except OSError:
+                    continue
+            return sizes
+        listing = _DirListing(stamp)
+        sizes = _DirSizes(listing.subdirs)
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    entry_st = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry_st.st_dev == root_dev:
+                            listing.subdirs.append(entry.name)
+                    else:
+                        listing.files.append(entry.name)
+                        sizes.add_file(entry_st)
+                except OSError:
+                    continue
+        with self._cache_lock:
+            self._cache[dir_path] = listing
+            self._cache.move_to_end(dir_path)
+            while len(self._cache) > self.max_cache_dirs:
+                self._cache.popitem(last=False)
+        return sizes
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
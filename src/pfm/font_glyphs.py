@@ -0,0 +1,21 @@
+# 記錄字型圖集中已有的非 ASCII 字元；Default 範圍已包含 ASCII 與 Latin-1，
+# 其餘字元（中文等）只在實際出現時才加入，避免一開始就建立整個中文字集的圖集。
+class GlyphSet:
+    __slots__ = ("chars", "_base_limit", "dirty")
+
+    def __init__(self, text: str = "", base_limit: int = 0xFF) -> None:
+        self._base_limit = base_limit
+        self.chars: set[int] = set()
+        self.dirty = False
+        self.add_text(text)
+        self.dirty = False
+
+    def add_text(self, text: str) -> bool:
+        if text.isascii():
+            return False
+        missing = {ord(c) for c in text if ord(c) > self._base_limit} - self.chars
+        if not missing:
+            return False
+        self.chars |= missing
+        self.dirty = True
+        return True
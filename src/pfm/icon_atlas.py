@@ -0,0 +1,79 @@
+from file_types import (
+    KIND_ARCHIVE,
+    KIND_AUDIO,
+    KIND_CODE,
+    KIND_DOCUMENT,
+    KIND_EXECUTABLE,
+    KIND_IMAGE,
+    KIND_TEXT,
+    KIND_VIDEO,
+)
+
+# 所有圖示放在同一張材質中，列表中的圖片元件只切換 uv 範圍，不需要每種類型一張材質。
+# 原始圖示為 600x600 的單色圖形，縮小為 atlas_cell_size 後依檔案類型改變顏色。
+atlas_cell_size = 64
+
+# 檔案類型圖示的顏色 (RGB)，只保留原圖的透明度；沒有列出的類型使用原本的檔案圖示
+kind_icon_colors = {
+    KIND_TEXT: (220, 220, 220),
+    KIND_CODE: (90, 160, 255),
+    KIND_IMAGE: (90, 200, 120),
+    KIND_AUDIO: (190, 120, 230),
+    KIND_VIDEO: (235, 90, 90),
+    KIND_ARCHIVE: (200, 140, 70),
+    KIND_DOCUMENT: (240, 200, 80),
+    KIND_EXECUTABLE: (255, 130, 40),
+}
+
+UV = tuple[tuple[float, float], tuple[float, float]]
+
+
+def scale_icon(width: int, height: int, data, size: int) -> list[float]:
+    # 以最近點取樣縮放為 size x size 的 RGBA，保持長寬比並置中
+    scale = max(width, height) / size
+    out_width = max(1, int(width / scale))
+    out_height = max(1, int(height / scale))
+    left = (size - out_width) // 2
+    top = (size - out_height) // 2
+    columns = [min(width - 1, int(x * scale)) * 4 for x in range(out_width)]
+    transparent = [0.0, 0.0, 0.0, 0.0]
+    out: list[float] = []
+    for y in range(size):
+        if y < top or y >= top + out_height:
+            out += transparent * size
+            continue
+        row_start = min(height - 1, int((y - top) * scale)) * width * 4
+        out += transparent * left
+        for column in columns:
+            start = row_start + column
+            out += data[start : start + 4]
+        out += transparent * (size - left - out_width)
+    return out
+
+
+def recolor(data: list[float], color: tuple[int, int, int]) -> list[float]:
+    red, green, blue = (c / 255 for c in color)
+    out = list(data)
+    out[0::4] = [red] * (len(data) // 4)
+    out[1::4] = [green] * (len(data) // 4)
+    out[2::4] = [blue] * (len(data) // 4)
+    return out
+
+
+def build_atlas(
+    icons: dict[str, list[float]], size: int = atlas_cell_size
+) -> tuple[int, int, list[float], dict[str, UV]]:
+    # icons 皆為 size x size 的 RGBA，橫向排成一列；回傳 (寬, 高, 資料, 名稱 -> uv)
+    names = list(icons)
+    width = size * len(names)
+    rows: list[list[float]] = [[] for _ in range(size)]
+    uvs: dict[str, UV] = {}
+    for i, name in enumerate(names):
+        data = icons[name]
+        for y in range(size):
+            rows[y] += data[y * size * 4 : (y + 1) * size * 4]
+        uvs[name] = ((i / len(names), 0.0), ((i + 1) / len(names), 1.0))
+    atlas: list[float] = []
+    for row in rows:
+        atlas += row
+    return width, size, atlas, uvs
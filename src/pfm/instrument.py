@@ -0,0 +1,136 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# 熱路徑的計時區段。停用時 span() 回傳共用的空物件，成本只有一次屬性檢查；
+# 啟用時把完成的區段放入固定長度的環狀緩衝，可匯出為 Chrome trace (chrome://tracing、Perfetto)。
+# 環境變數 PFM_TRACE=1 時從啟動就開始記錄，另設定 PFM_TRACE_FILE 時在結束時自動匯出。
+
+trace_buffer_size = 100_000
+frame_buffer_size = 240
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: "Tracer", name: str) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        tid = threading.get_ident()
+        tracer = self.tracer
+        if tid not in tracer._thread_names:
+            tracer._thread_names[tid] = threading.current_thread().name
+        tracer.spans.append((self.name, self.start, end - self.start, tid))
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        # (名稱, 開始 ns, 耗時 ns, 執行緒)；deque.append 為原子操作，背景執行緒可直接寫入
+        self.spans: deque[tuple[str, int, int, int]] = deque(maxlen=trace_buffer_size)
+        # 每幀耗時 (ns)
+        self.frames: deque[int] = deque(maxlen=frame_buffer_size)
+        self._last_frame = 0
+        self._thread_names: dict[int, str] = {}
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name)
+
+    def frame(self) -> None:
+        # 每幀呼叫一次，記錄與上一幀的間隔
+        if not self.enabled:
+            return None
+        now = time.perf_counter_ns()
+        if self._last_frame:
+            self.frames.append(now - self._last_frame)
+        self._last_frame = now
+        return None
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._last_frame = 0
+
+    def recent(self, count: int) -> list[tuple[str, int, int, int]]:
+        spans = list(self.spans)
+        return spans[-count:]
+
+    def frame_stats(self) -> tuple[float, float]:
+        # 最近幾幀的平均與最大耗時 (ms)
+        frames = list(self.frames)
+        if not frames:
+            return 0.0, 0.0
+        return sum(frames) / len(frames) / 1e6, max(frames) / 1e6
+
+    def export_chrome_trace(self, path: str) -> int:
+        # Chrome trace 的完整事件 (ph = "X")，時間單位為微秒；回傳事件數
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, duration, tid in list(self.spans)
+        ]
+        for tid, thread_name in list(self._thread_names.items()):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+            )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+tracer = Tracer(os.environ.get("PFM_TRACE") == "1")
+span = tracer.span
+
+
+def traced(name: str):
+    # 以區段包住整個函式；停用時只多一次函式呼叫與屬性檢查
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _Span(tracer, name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
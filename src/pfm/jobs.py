@@ -0,0 +1,435 @@
+import errno
+import itertools
+import logging
+import os
+import shutil
+import stat
+import threading
+from collections import deque
+
+from copy_engine import CopyCancelledError, CopyEngine, CopyProgress, unique_destination
+from dir_compare import delta_min_size, delta_update
+from instrument import traced
+from vfs import VirtualFileSystem
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+JOB_COPY = "copy"
+JOB_MOVE = "move"
+JOB_DELETE = "delete"
+JOB_RENAME = "rename"
+JOB_LINK = "link"
+JOB_EXTRACT = "extract"
+# 單向同步：把左側不同的項目複製到右側，覆蓋既有檔案；delta 只寫入大型檔案中不同的區塊
+JOB_SYNC = "sync"
+JOB_SYNC_DELTA = "sync_delta"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+
+_job_ids = itertools.count(1)
+# 目標資料夾也佔用裝置的工作
+_target_kinds = (JOB_COPY, JOB_MOVE, JOB_EXTRACT, JOB_SYNC, JOB_SYNC_DELTA)
+
+
+def _stat_key(st: os.stat_result) -> tuple[int, int, int, int]:
+    # 與重複檔案掃描相同的 (裝置, inode, 大小, mtime)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class Job:
+    def __init__(
+        self,
+        kind: str,
+        sources: list[str],
+        target: str | None,
+        source_root: str | None = None,
+        expected: dict[str, tuple[int, int, int, int]] | None = None,
+    ) -> None:
+        self.id = next(_job_ids)
+        self.kind = kind
+        self.sources = sources
+        # copy / move / extract：目標資料夾；rename：新的完整路徑；link：保留的檔案；
+        # sync：右側資料夾；delete：None
+        self.target = target
+        # sync：來源的根資料夾，來源相對於此的路徑對應到 target 下的同一個位置
+        self.source_root = source_root
+        # link：來源與 target 掃描時的 (裝置, inode, 大小, mtime)，不同則不處理
+        self.expected = expected or {}
+        self.status = JOB_QUEUED
+        self.started = False
+        self.progress = CopyProgress()
+        # 佔用的裝置 (st_dev)，排程前由 JobScheduler 解析
+        self.devices: frozenset[int] = frozenset()
+
+    def pause(self) -> None:
+        if self.status in (JOB_QUEUED, JOB_RUNNING):
+            self.progress.pause()
+            self.status = JOB_PAUSED
+
+    def resume(self) -> None:
+        if self.status == JOB_PAUSED:
+            self.progress.resume()
+            self.status = JOB_RUNNING if self.started else JOB_QUEUED
+
+    def cancel(self) -> None:
+        self.progress.cancel()
+        if self.status in (JOB_QUEUED, JOB_PAUSED):
+            self.status = JOB_CANCELLED
+
+
+# 依裝置排程的工作佇列：同一個裝置同時最多 per_device_limit 個工作，
+# 不同裝置的工作可以平行執行。
+class JobScheduler:
+    def __init__(
+        self,
+        copy_engine: CopyEngine,
+        per_device_limit: int = 1,
+        vfs: VirtualFileSystem | None = None,
+    ) -> None:
+        self.copy_engine = copy_engine
+        # 解壓縮工作使用的檔案系統
+        self.vfs = vfs
+        self.per_device_limit = per_device_limit
+        self.jobs: list[Job] = []
+        self._cond = threading.Condition()
+        self._queued: deque[Job] = deque()
+        self._device_running: dict[int, int] = {}
+        self._finished: deque[Job] = deque()
+        threading.Thread(
+            target=self._dispatch_loop, name="pfm-job-dispatcher", daemon=True
+        ).start()
+
+    def submit(
+        self,
+        kind: str,
+        sources: list[str],
+        target: str | None = None,
+        source_root: str | None = None,
+        expected: dict[str, tuple[int, int, int, int]] | None = None,
+    ) -> Job:
+        job = Job(kind, sources, target, source_root, expected)
+        self.jobs.append(job)
+        # 取得裝置需要 stat，慢速掛載點可能卡住，因此不在 UI 執行緒執行
+        threading.Thread(
+            target=self._enqueue, args=(job,), name=f"pfm-job-{job.id}", daemon=True
+        ).start()
+        return job
+
+    def poll_finished(self) -> list[Job]:
+        finished = []
+        while self._finished:
+            finished.append(self._finished.popleft())
+        return finished
+
+    def clear_finished(self) -> None:
+        self.jobs = [
+            job for job in self.jobs if job.status not in (JOB_DONE, JOB_CANCELLED)
+        ]
+
+    def _enqueue(self, job: Job) -> None:
+        paths = list(job.sources)
+        if job.kind in _target_kinds and job.target is not None:
+            paths.append(job.target)
+        devices = set()
+        for p in paths:
+            try:
+                devices.add(os.stat(p, follow_symlinks=False).st_dev)
+            except OSError:
+                pass
+        job.devices = frozenset(devices)
+        with self._cond:
+            self._queued.append(job)
+            self._cond.notify()
+
+    def _dispatch_loop(self) -> None:
+        with self._cond:
+            while True:
+                for job in list(self._queued):
+                    if job.status == JOB_CANCELLED:
+                        self._queued.remove(job)
+                        job.progress.finish()
+                        self._finished.append(job)
+                        continue
+                    if job.status == JOB_PAUSED:
+                        continue
+                    if all(
+                        self._device_running.get(device, 0) < self.per_device_limit
+                        for device in job.devices
+                    ):
+                        self._queued.remove(job)
+                        for device in job.devices:
+                            self._device_running[device] = (
+                                self._device_running.get(device, 0) + 1
+                            )
+                        job.status = JOB_RUNNING
+                        job.started = True
+                        threading.Thread(
+                            target=self._run_job,
+                            args=(job,),
+                            name=f"pfm-job-{job.id}",
+                            daemon=True,
+                        ).start()
+                self._cond.wait()
+
+    def pause(self, job: Job) -> None:
+        job.pause()
+
+    def resume(self, job: Job) -> None:
+        job.resume()
+        self._wake()
+
+    def cancel(self, job: Job) -> None:
+        job.cancel()
+        self._wake()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify()
+
+    @traced("job")
+    def _run_job(self, job: Job) -> None:
+        pfm_logger.info(
+            "開始工作 #%d：%s %s -> %s", job.id, job.kind, job.sources, job.target
+        )
+        try:
+            if job.kind == JOB_COPY:
+                self.copy_engine.copy_sources(job.sources, job.target, job.progress)
+            elif job.kind == JOB_MOVE:
+                self._move(job)
+            elif job.kind == JOB_DELETE:
+                for src in job.sources:
+                    delete_tree(src, job.progress)
+            elif job.kind == JOB_RENAME:
+                self._rename(job)
+            elif job.kind == JOB_LINK:
+                self._link(job)
+            elif job.kind == JOB_EXTRACT:
+                self.vfs.extract(job.sources, job.target, job.progress)
+            elif job.kind in (JOB_SYNC, JOB_SYNC_DELTA):
+                self._sync(job)
+        except CopyCancelledError:
+            pass
+        except OSError as e:
+            job.progress.add_error(str(e))
+        finally:
+            job.progress.finish()
+            job.status = (
+                JOB_CANCELLED if job.progress.cancel_event.is_set() else JOB_DONE
+            )
+            with self._cond:
+                for device in job.devices:
+                    self._device_running[device] -= 1
+                self._finished.append(job)
+                self._cond.notify()
+        pfm_logger.info(
+            "工作 #%d 結束：%s，錯誤 %d 個",
+            job.id,
+            job.status,
+            len(job.progress.errors),
+        )
+        return None
+
+    def _move(self, job: Job) -> None:
+        target_dev = os.stat(job.target).st_dev
+        for src in job.sources:
+            job.progress.checkpoint()
+            src = os.path.normpath(src)
+            dst = unique_destination(os.path.join(job.target, os.path.basename(src)))
+            try:
+                src_dev = os.stat(src, follow_symlinks=False).st_dev
+            except OSError as e:
+                job.progress.add_error(f"{src}：{e}")
+                continue
+            if src_dev == target_dev:
+                # 同一個檔案系統直接改名，不需要複製再刪除；
+                # bind mount、btrfs 子磁碟區與 overlayfs 的裝置相同也可能回傳 EXDEV，改為複製再刪除
+                try:
+                    os.rename(src, dst)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        job.progress.add_error(f"{src}：{e}")
+                        continue
+                else:
+                    job.progress.add_found(0)
+                    job.progress.file_done()
+                    continue
+            errors_before = len(job.progress.errors)
+            copied = self.copy_engine.copy_sources([src], job.target, job.progress)
+            # 複製完整成功才刪除來源
+            if copied and len(job.progress.errors) == errors_before:
+                job.progress.checkpoint()
+                delete_tree(src, job.progress, count_files=False)
+        return None
+
+    def _rename(self, job: Job) -> None:
+        src = job.sources[0]
+        if os.path.lexists(job.target):
+            job.progress.add_error(f"已存在同名檔案：{job.target}")
+            return None
+        os.rename(src, job.target)
+        job.progress.add_found(0)
+        job.progress.file_done()
+        return None
+
+    def _link(self, job: Job) -> None:
+        # 以指向 target 的硬連結取代每個來源：先在同一個資料夾建立暫存連結再改名覆蓋，
+        # 失敗時來源保持原狀。大小不同或不在同一個檔案系統的來源不處理；
+        # 掃描後被修改過（inode、大小或 mtime 與 expected 不同）的檔案內容可能已不同，也不處理。
+        keep = os.stat(job.target)
+        if _stat_key(keep) != job.expected.get(job.target):
+            job.progress.add_error(f"{job.target}：掃描後已修改，未建立連結")
+            return None
+        for src in job.sources:
+            job.progress.checkpoint()
+            try:
+                st = os.stat(src, follow_symlinks=False)
+            except OSError as e:
+                job.progress.add_error(f"{src}：{e}")
+                continue
+            if st.st_dev != keep.st_dev or st.st_size != keep.st_size:
+                job.progress.add_error(f"{src}：與 {job.target} 大小或裝置不同")
+                continue
+            if st.st_ino != keep.st_ino and _stat_key(st) != job.expected.get(src):
+                job.progress.add_error(f"{src}：掃描後已修改，未建立連結")
+                continue
+            if st.st_ino == keep.st_ino:
+                continue
+            tmp_path = unique_destination(f"{src}.pfm-link")
+            try:
+                os.link(job.target, tmp_path)
+                os.replace(tmp_path, src)
+            except OSError as e:
+                job.progress.add_error(f"{src}：{e}")
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                continue
+            job.progress.add_found(st.st_size)
+            job.progress.file_done()
+        return None
+
+    def _sync(self, job: Job) -> None:
+        # 目標不存在的項目依所在資料夾分組交給 copy_engine；已存在的檔案先寫到暫存檔再改名覆蓋，
+        # 失敗時目標保持原狀。檔案與資料夾互換的項目不處理。
+        new_by_dir: dict[str, list[str]] = {}
+        for src in job.sources:
+            job.progress.checkpoint()
+            dst = os.path.join(job.target, os.path.relpath(src, job.source_root))
+            if not os.path.lexists(dst):
+                new_by_dir.setdefault(os.path.dirname(dst), []).append(src)
+                continue
+            try:
+                src_st = os.lstat(src)
+                dst_st = os.lstat(dst)
+            except OSError as e:
+                job.progress.add_error(f"{src}：{e}")
+                continue
+            if stat.S_ISDIR(src_st.st_mode) or stat.S_ISDIR(dst_st.st_mode):
+                job.progress.add_error(f"{dst}：檔案與資料夾類型不同，未同步")
+                continue
+            self._sync_file(job, src, dst, src_st, dst_st)
+        for dst_dir, sources in new_by_dir.items():
+            job.progress.checkpoint()
+            try:
+                os.makedirs(dst_dir, exist_ok=True)
+            except OSError as e:
+                job.progress.add_error(f"{dst_dir}：{e}")
+                continue
+            self.copy_engine.copy_sources(sources, dst_dir, job.progress)
+        return None
+
+    def _sync_file(
+        self,
+        job: Job,
+        src: str,
+        dst: str,
+        src_st: os.stat_result,
+        dst_st: os.stat_result,
+    ) -> None:
+        job.progress.add_found(src_st.st_size)
+        if (
+            job.kind == JOB_SYNC_DELTA
+            and stat.S_ISREG(src_st.st_mode)
+            and stat.S_ISREG(dst_st.st_mode)
+            and src_st.st_size >= delta_min_size
+        ):
+            try:
+                written = delta_update(src, dst, job.progress)
+                shutil.copystat(src, dst)
+            except OSError as e:
+                job.progress.add_error(f"{src}：{e}")
+                return None
+            pfm_logger.debug(
+                "區塊差異同步：「 %s 」寫入 %d / %d bytes", dst, written, src_st.st_size
+            )
+            job.progress.file_done()
+            return None
+        if not stat.S_ISREG(src_st.st_mode) and not stat.S_ISLNK(src_st.st_mode):
+            job.progress.add_error(f"略過特殊檔案：{src}")
+            return None
+        tmp_path = unique_destination(f"{dst}.pfm-sync")
+        replaced = False
+        try:
+            if stat.S_ISLNK(src_st.st_mode):
+                os.symlink(os.readlink(src), tmp_path)
+            else:
+                self.copy_engine.copy_file(src, tmp_path, job.progress)
+            shutil.copystat(src, tmp_path, follow_symlinks=False)
+            os.replace(tmp_path, dst)
+            replaced = True
+        except OSError as e:
+            job.progress.add_error(f"{src}：{e}")
+        finally:
+            # 失敗或取消時刪除暫存檔
+            if not replaced:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+        if replaced:
+            job.progress.file_done()
+        return None
+
+
+def delete_tree(path: str, progress: CopyProgress, count_files: bool = True) -> None:
+    try:
+        if not os.path.isdir(path) or os.path.islink(path):
+            os.unlink(path)
+            if count_files:
+                progress.add_found(0)
+                progress.file_done()
+            return None
+    except OSError as e:
+        progress.add_error(f"{path}：{e}")
+        return None
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            progress.checkpoint()
+            file_path = os.path.join(root, name)
+            try:
+                os.unlink(file_path)
+                if count_files:
+                    progress.add_found(0)
+                    progress.file_done()
+            except OSError as e:
+                progress.add_error(f"{file_path}：{e}")
+        for name in dirs:
+            dir_path = os.path.join(root, name)
+            try:
+                # 指向資料夾的符號連結出現在 dirs 中，但 os.walk 不會進入
+                if os.path.islink(dir_path):
+                    os.unlink(dir_path)
+                else:
+                    os.rmdir(dir_path)
+            except OSError as e:
+                progress.add_error(f"{dir_path}：{e}")
+    try:
+        os.rmdir(path)
+    except OSError as e:
+        progress.add_error(f"{path}：{e}")
+    return None
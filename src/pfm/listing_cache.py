@@ -0,0 +1,74 @@
+import os
+from collections import OrderedDict
+
+from dir_model import DirectoryModel
+
+# 以資料夾的 (st_mtime_ns, st_ino) 判斷快取是否仍有效
+DirStamp = tuple[int, int]
+
+
+def dir_stamp(path: str) -> DirStamp:
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_ino)
+
+
+class CachedListing:
+    __slots__ = ("model", "stamp", "size")
+
+    def __init__(self, model: DirectoryModel, stamp: DirStamp) -> None:
+        self.model = model
+        self.stamp = stamp
+        self.size = model.memory_usage()
+
+
+# 以路徑為 key 的 LRU 列表快取，同時限制項目數與總記憶體
+class ListingCache:
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: OrderedDict[str, CachedListing] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._entries
+
+    def get(self, path: str) -> CachedListing | None:
+        cached = self._entries.get(path)
+        if cached is not None:
+            self._entries.move_to_end(path)
+        return cached
+
+    def put(self, path: str, model: DirectoryModel, stamp: DirStamp) -> None:
+        self.discard(path)
+        cached = CachedListing(model, stamp)
+        if cached.size > self.max_bytes:
+            return None
+        self._entries[path] = cached
+        self.trim()
+        return None
+
+    def trim(self) -> None:
+        # 快取中的列表之後仍會被監看到的變更、資料夾大小寫回等修改而變大，
+        # 檢查上限前重新計算每個列表的大小
+        self.total_bytes = 0
+        for cached in self._entries.values():
+            cached.size = cached.model.memory_usage()
+            self.total_bytes += cached.size
+        while (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+        return None
+
+    def discard(self, path: str) -> None:
+        cached = self._entries.pop(path, None)
+        if cached is not None:
+            self.total_bytes -= cached.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
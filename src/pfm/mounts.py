@@ -0,0 +1,179 @@
+import logging
+import os
+import queue
+import re
+import select
+import shutil
+import sys
+import threading
+import time
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+mountinfo_path = "/proc/self/mountinfo"
+filesystems_path = "/proc/filesystems"
+# 沒有 mountinfo 可以監看時，重新讀取 psutil.disk_partitions 的最短間隔 (秒)
+mount_poll_interval = 5.0
+
+_mountinfo_escape = re.compile(r"\\([0-7]{3})")
+
+
+class MountInfo:
+    __slots__ = ("mountpoint", "device", "fstype", "dev")
+
+    def __init__(self, mountpoint: str, device: str, fstype: str, dev: int) -> None:
+        self.mountpoint = mountpoint
+        self.device = device
+        self.fstype = fstype
+        # st_dev，取不到時為 -1
+        self.dev = dev
+
+
+def _unescape(field: str) -> str:
+    # mountinfo 以八進位跳脫空白等字元，例如 \040
+    return _mountinfo_escape.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def _physical_fstypes() -> set[str]:
+    # 與 psutil.disk_partitions(all=False) 相同：排除 nodev 的虛擬檔案系統
+    fstypes = set()
+    with open(filesystems_path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] != "nodev":
+                fstypes.add(fields[0])
+            elif fields[-1] == "zfs":
+                fstypes.add("zfs")
+    return fstypes
+
+
+def parse_mountinfo(text: str, fstypes: set[str]) -> list[MountInfo]:
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split(" ")
+        try:
+            separator = fields.index("-", 6)
+            major, minor = fields[2].split(":")
+            mountpoint = _unescape(fields[4])
+            fstype = fields[separator + 1]
+            device = _unescape(fields[separator + 2])
+        except (ValueError, IndexError):
+            continue
+        if device == "none" or fstype not in fstypes:
+            continue
+        dev = os.makedev(int(major), int(minor))
+        mounts.append(MountInfo(os.path.normpath(mountpoint), device, fstype, dev))
+    return mounts
+
+
+# 掛載表：只在掛載變更時重新解析。Linux 以 poll 監看 /proc/self/mountinfo，
+# 核心在掛載 / 卸載時會送出 POLLPRI；其他系統則以固定間隔重新讀取 psutil。
+class MountTable:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # mountinfo 的讀取位置與 poll 事件由 refresh 獨占，讀取後事件即被清除
+        self._refresh_lock = threading.Lock()
+        self.mounts: list[MountInfo] = []
+        self._roots: dict[str, MountInfo] = {}
+        self._devices: dict[int, MountInfo] = {}
+        self._mountinfo = None
+        self._poller = None
+        self._fstypes: set[str] = set()
+        self._loaded_time = 0.0
+        self._usage_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._usage_pending: set[str] = set()
+        # 掛載點 -> (總容量, 已使用, 可用)
+        self.usage: dict[str, tuple[int, int, int]] = {}
+        if sys.platform.startswith("linux"):
+            try:
+                self._fstypes = _physical_fstypes()
+                self._mountinfo = open(mountinfo_path, "r", encoding="utf-8")
+                self._poller = select.poll()
+                self._poller.register(
+                    self._mountinfo.fileno(), select.POLLERR | select.POLLPRI
+                )
+            except OSError:
+                self._mountinfo = None
+                self._poller = None
+        self._load()
+
+    def _load(self) -> None:
+        if self._mountinfo is not None:
+            self._mountinfo.seek(0)
+            mounts = parse_mountinfo(self._mountinfo.read(), self._fstypes)
+        else:
+            import psutil  # 延遲載入，縮短啟動時間
+
+            mounts = [
+                MountInfo(
+                    os.path.normpath(disk.mountpoint), disk.device, disk.fstype, -1
+                )
+                for disk in psutil.disk_partitions()
+            ]
+        with self._lock:
+            self.mounts = mounts
+            # 同一個掛載點被重複掛載時，以最後（最上層）的為準
+            self._roots = {mount.mountpoint: mount for mount in mounts}
+            self._devices = {mount.dev: mount for mount in mounts if mount.dev != -1}
+            self._loaded_time = time.monotonic()
+        pfm_logger.debug("重新讀取掛載表，共 %d 個掛載點", len(mounts))
+
+    def changed(self) -> bool:
+        if self._poller is not None:
+            return bool(self._poller.poll(0))
+        return time.monotonic() - self._loaded_time >= mount_poll_interval
+
+    def refresh(self) -> bool:
+        # 成本只有一次 poll 系統呼叫，掛載表改變時才重新解析
+        with self._refresh_lock:
+            if not self.changed():
+                return False
+            self._load()
+        return True
+
+    def partitions(self) -> list[MountInfo]:
+        # 在讀取執行緒呼叫，只取目前的快照；重新讀取由 UI 執行緒的 refresh 負責，
+        # 否則讀取執行緒可能先清除 poll 事件，UI 就不會知道掛載表已改變
+        with self._lock:
+            return list(self._roots.values())
+
+    def is_mount_root(self, path: str) -> bool:
+        return os.path.normpath(path) in self._roots
+
+    def mount_of_device(self, dev: int) -> MountInfo | None:
+        return self._devices.get(dev)
+
+    def request_usage(self, mountpoint: str) -> None:
+        # 每個掛載點各用一條執行緒，卡住的網路掛載點不會影響其他掛載點與 UI
+        if mountpoint in self._usage_pending:
+            return None
+        self._usage_pending.add(mountpoint)
+        threading.Thread(
+            target=self._usage_worker,
+            args=(mountpoint,),
+            name="pfm-disk-usage",
+            daemon=True,
+        ).start()
+        return None
+
+    def _usage_worker(self, mountpoint: str) -> None:
+        try:
+            usage = shutil.disk_usage(mountpoint)
+            self._usage_queue.put((mountpoint, (usage.total, usage.used, usage.free)))
+        except OSError:
+            self._usage_queue.put((mountpoint, None))
+
+    def poll_usage(self) -> list[str]:
+        updated = []
+        while True:
+            try:
+                mountpoint, usage = self._usage_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._usage_pending.discard(mountpoint)
+            if usage is not None:
+                self.usage[mountpoint] = usage
+            updated.append(mountpoint)
+        return updated
@@ -0,0 +1,43 @@
+import os
+import threading
+
+from dir_loader import DirectoryLoader
+from dir_model import DirectoryModel
+from dir_view import DirectoryView, SORT_NAME
+from selection import Selection
+from watcher import DirectoryWatcher
+
+# 一個分頁的瀏覽狀態：路徑與歷史、排序、列表與顯示順序、選取，以及各自的讀取與監看。
+# 列表快取、檔案工作、剪貼簿等由 FileManagerCore 共用，所有分頁讀取同一個列表快取。
+
+
+class Pane:
+    def __init__(
+        self, path: str, fs, sort_key: str = SORT_NAME, sort_reverse: bool = False
+    ) -> None:
+        self.path = path
+        self.path_history_back: list[str] = []
+        self.path_history_forward: list[str] = []
+        # 排序方式在切換資料夾時保留
+        self.sort_key = sort_key
+        self.sort_reverse = sort_reverse
+        self._sort_thread: threading.Thread | None = None
+        # path 所在的檔案系統（本機磁碟或壓縮檔）
+        self.fs = fs
+        self.dir_model = DirectoryModel(path)
+        # 顯示順序，列號 -> dir_model index
+        self.dir_view = DirectoryView(self.dir_model, sort_key, sort_reverse)
+        self.dir_loader = DirectoryLoader()
+        self.dir_watcher = DirectoryWatcher()
+        # 快取的列表需要更新時，新列表先讀入 _pending_dir_model，讀完再替換
+        self._pending_dir_model: DirectoryModel | None = None
+        self._dir_stamp = None
+        self.selection = Selection()
+
+    def title(self) -> str:
+        return os.path.basename(self.path.rstrip(os.sep)) or self.path
+
+    def close(self) -> None:
+        self.dir_loader.cancel()
+        self.dir_watcher.stop()
+        self.dir_view.cancel_precompute()
@@ -1,17 +1,57 @@
+import time
+
+# 啟動時間量測的起點，需在其他 import 之前
+pfm_start_time = time.perf_counter()
+
 import logging
 import os
-import json
-import shutil
-import psutil
-import platform
-import subprocess
-
-from PIL import Image, ImageDraw
+import tempfile
+from array import array
+from collections import OrderedDict
 
 from dearpygui import dearpygui as dpg
 
 import pt
 
+from core import (
+    CLICK_NONE,
+    CLICK_OPEN_DIR,
+    CLICK_OPEN_FILE,
+    CLICK_SELECT,
+    FileManagerCore,
+    startup_target_ms,
+)
+from dir_model import DirectoryModel, STAT_UNKNOWN
+from dir_view import SORT_MTIME, SORT_NAME, SORT_NONE, SORT_SIZE, SORT_TYPE
+from thumbnails import ThumbnailLoader, is_image
+from font_glyphs import GlyphSet
+from ui_glyphs import ui_glyphs
+from folder_size import FolderSizeCalculator, FolderSizeTask
+from file_index import FileIndex
+from file_types import FileTypeCache, KIND_FILE, file_kinds
+from icon_atlas import atlas_cell_size, build_atlas, kind_icon_colors, recolor
+from icon_atlas import scale_icon
+from app_launcher import AppLauncher
+from instrument import traced, tracer
+from app_dirs import cache_dir
+from dir_compare import CMP_DIFFERENT, CMP_ONLY_LEFT, CMP_ONLY_RIGHT, CMP_SAME
+from duplicates import CacheKey
+from jobs import (
+    JOB_CANCELLED,
+    JOB_COPY,
+    JOB_DELETE,
+    JOB_DONE,
+    JOB_EXTRACT,
+    JOB_LINK,
+    JOB_MOVE,
+    JOB_PAUSED,
+    JOB_QUEUED,
+    JOB_RENAME,
+    JOB_RUNNING,
+    JOB_SYNC,
+    JOB_SYNC_DELTA,
+)
+
 pfm_version = "b-2"
 pfm_pre_version = True
 
@@ -34,106 +74,227 @@ file_icon_path = os.path.join(
     os.path.dirname(__file__), "..", "data", "icons", "file.png"
 )
 
-selected_rectangle_path = os.path.join(
-    os.path.dirname(__file__), "..", "data", "icons", "selected_rectangle.png"
-)
-
 config_path = os.path.normpath(
     os.path.join(os.path.dirname(__file__), "..", "data", "config.json")
 )
 
-path = os.getcwd()
+font_size = 30
+
+job_kind_labels = {
+    JOB_COPY: "複製",
+    JOB_MOVE: "移動",
+    JOB_DELETE: "刪除",
+    JOB_RENAME: "重新命名",
+    JOB_LINK: "硬連結",
+    JOB_EXTRACT: "解壓縮",
+    JOB_SYNC: "同步",
+    JOB_SYNC_DELTA: "同步（區塊差異）",
+}
+job_status_labels = {
+    JOB_QUEUED: "等待中",
+    JOB_RUNNING: "執行中",
+    JOB_PAUSED: "已暫停",
+    JOB_DONE: "完成",
+    JOB_CANCELLED: "已取消",
+}
+
+# 分頁列在路徑列下方，檔案列表與預覽窗格從 dir_list_top 開始
+tab_bar_top = 150
+tab_bar_height = 35
+dir_list_top = tab_bar_top + tab_bar_height
+dir_list_row_height = 30
+dir_list_row_top = 10
+dir_list_overscan = 5
+# 大小欄與列表右側的距離
+dir_list_size_column_width = 220
+
+thumbnail_size = 48
+
+search_result_limit = 500
+
+# 效能面板顯示的最近區段數與更新間隔 (秒)
+overlay_span_count = 12
+overlay_refresh_interval = 0.25
 
+# 預覽窗格佔主視窗寬度的比例、每行高度、滾輪一格捲動的行數，以及索引進度的更新間隔 (秒)
+preview_width_ratio = 0.4
+preview_line_height = 32
+preview_wheel_lines = 3
+preview_status_interval = 0.25
 
-class FileManager:
+# 重複檔案視窗最多顯示的組數，以及搜尋進度的更新間隔 (秒)
+duplicate_group_display_limit = 500
+duplicate_refresh_interval = 0.25
+
+# 比較資料夾視窗最多顯示的不同項目數，以及比較進度的更新間隔 (秒)
+compare_display_limit = 1000
+compare_refresh_interval = 0.25
+compare_state_labels = {
+    CMP_ONLY_LEFT: "只在左側",
+    CMP_ONLY_RIGHT: "只在右側",
+    CMP_DIFFERENT: "不同",
+}
+
+sort_button_labels = {
+    SORT_NAME: "名稱",
+    SORT_SIZE: "大小",
+    SORT_MTIME: "修改時間",
+    SORT_TYPE: "類型",
+}
+
+# 視窗調整大小的合併時間 (秒)
+resize_debounce = 0.1
+resize_max_delay = 0.25
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+
+
+class FileManager(FileManagerCore):
     def __init__(self) -> None:
-        global config_path
-        #
-        self.config: dict = {}
-        self.init_config()
-        if os.path.exists(config_path) is True:
-            self.load_config()
-        self._config_save_to_file()
+        super().__init__(os.getcwd(), config_path)
         #
+        self.load_font()
         self.load_icons()
         self.create_notification_window()
+        self.create_overlay_window()
         self.create_dir_list()
         self.create_control_center()
         self.create_path_viewer()
+        self.create_tab_bar()
+        self.create_preview_window()
         self.dir_list_ids = []
+        self.dir_list_size_ids = []
         self.dir_list_pictures = []
-        self._copy_dir: str | None = None
-        self.selected_dir: str | None = None
+        self.dir_list_slot_index: list[int] = []
+        self.dir_list_highlights = []
+        self.dir_list_highlight_index: list[int] = []
+        self.dir_list_scroll = -1.0
+        # 滑鼠所在的列，改變時預讀該列的資料夾
+        self._hover_row = -1
+        # 各分頁切換離開時的捲動位置
+        self._pane_scroll: dict[object, float] = {}
+        self._resize_first_time: float | None = None
+        self._resize_last_time = 0.0
+        self.job_rows: dict[int, int | str] = {}
+        self._job_refresh_time = 0.0
+        self._delete_paths: list[str] = []
+        self._rename_path: str | None = None
+        self.thumbnail_loader = ThumbnailLoader(thumbnail_size)
+        self.file_types = FileTypeCache()
+        self.app_launcher = AppLauncher()
+        # 解壓縮後要開啟的檔案：工作 id -> 解壓縮後的路徑
+        self._extract_to_open: dict[int, str] = {}
+        # 已上傳的縮圖材質，依最近使用排序，超過上限時重複使用最舊的材質
+        self.thumbnail_textures: OrderedDict[str, int | str] = OrderedDict()
+        self.thumbnail_failed: set[str] = set()
+        # 每個列元件正在等待縮圖的路徑
+        self.dir_list_slot_thumbnail: list[str | None] = []
+        self.folder_size_calculator = FolderSizeCalculator()
+        # 完整路徑 -> 資料夾大小計算，計算中的數值會持續增加
+        self.folder_sizes: dict[str, FolderSizeTask] = {}
+        # 目前資料夾中檔案的背景 stat
+        self._file_size_task: FolderSizeTask | None = None
+        self._folder_size_refresh_time = 0.0
+        self._folder_size_running = False
+        self.file_index = FileIndex(self.config["index_roots"])
+        self.file_index.start()
+        # 搜尋中時檔案列表顯示搜尋結果（名稱為完整路徑），而不是 path 的內容
+        self.search_query = ""
         self.create_config_window()
+        self.create_file_operation_windows()
+        self.create_job_window()
+        self.create_duplicates_window()
+        self.create_compare_window()
         self.refresh_dir_list()
         self._config_refresh()
         #
 
-    def load_config(self) -> None:
-        with open(config_path, "r", encoding="utf-8") as f:
-            tmp = json.load(f)
-        for key in tmp:
-            if key in [
-                "selected_rectangle_color_fill",
-                "selected_rectangle_color_outline",
-            ]:
-                self.config[key] = tuple(tmp[key])
-            else:
-                self.config[key] = tmp[key]
-        pfm_logger.debug(f"設定：{self.config}")
-        return None
+    def load_font(self) -> None:
+        # 只建立實際用到的字元：介面字串的字元取自 ui_glyphs，其餘字元在顯示時加入
+        self.font_glyphs = GlyphSet(ui_glyphs)
+        self.font_glyphs.add_text(self.path)
+        self.font: int | str | None = None
+        self._font_rebuild_time = 0.0
+        dpg.add_font_registry(tag="font_reg")
+        self.rebuild_font()
 
-    def init_config(self):
-        self.config = {
-            "selected_rectangle_color_fill": (99, 118, 255, 255),
-            "selected_rectangle_color_outline": (99, 118, 255, 255),
-            "selected_rectangle_color_width": 2,
-        }
+    def rebuild_font(self) -> None:
+        with dpg.font(main_font_path, font_size, parent="font_reg") as font:
+            dpg.add_font_range_hint(dpg.mvFontRangeHint_Default)
+            dpg.add_font_chars(sorted(self.font_glyphs.chars))
+        dpg.bind_font(font)
+        if self.font is not None:
+            dpg.delete_item(self.font)
+        self.font = font
+        self.font_glyphs.dirty = False
+        self._font_rebuild_time = time.monotonic()
+        pfm_logger.debug(
+            "重建字型圖集，非 ASCII 字元數：%d", len(self.font_glyphs.chars)
+        )
+
+    def _selected_rectangle_texture_data(self) -> list[float]:
+        # 在記憶體中繪製 200x200 透明底、左上角 11x11 的長方形，不經過 PIL 與磁碟
+        fill = [c / 255 for c in self.config["selected_rectangle_color_fill"]]
+        outline = [c / 255 for c in self.config["selected_rectangle_color_outline"]]
+        line_width = self.config["selected_rectangle_color_width"]
+        size = 200
+        rect_size = 11
+        transparent = [1.0, 1.0, 1.0, 0.0]
+        data: list[float] = []
+        for y in range(rect_size):
+            for x in range(rect_size):
+                if (
+                    x < line_width
+                    or y < line_width
+                    or x >= rect_size - line_width
+                    or y >= rect_size - line_width
+                ):
+                    data += outline
+                else:
+                    data += fill
+            data += transparent * (size - rect_size)
+        data += transparent * (size * (size - rect_size))
+        return data
 
     def load_icons(self):
-        global file_icon_path, folder_icon_path, selected_rectangle_path
-        # 動態繪製
-        rectangle_draw_img = Image.new("RGBA", (200, 200), (255, 255, 255, 0))
-        rectangle_draw_imgdraw = ImageDraw.Draw(rectangle_draw_img)
-        rectangle_draw_imgdraw.rectangle(
-            [(0, 0), (10, 10)],
-            self.config["selected_rectangle_color_fill"],
-            self.config["selected_rectangle_color_outline"],
-            self.config["selected_rectangle_color_width"],
-        )
-        rectangle_draw_img.save(selected_rectangle_path)
-        #
+        global file_icon_path, folder_icon_path
+        # 資料夾與各檔案類型的圖示合成一張材質，列元件以 uv 選擇圖示
+        width, height, channels, data = dpg.load_image(folder_icon_path)
+        icons = {"folder": scale_icon(width, height, data, atlas_cell_size)}
+        width, height, channels, data = dpg.load_image(file_icon_path)
+        file_icon = scale_icon(width, height, data, atlas_cell_size)
+        for kind in file_kinds:
+            color = kind_icon_colors.get(kind)
+            icons[kind] = file_icon if color is None else recolor(file_icon, color)
+        width, height, data, self.icon_uvs = build_atlas(icons)
         with dpg.texture_registry(tag="icon_reg"):
-            width, height, channels, data = dpg.load_image(folder_icon_path)
             dpg.add_static_texture(
                 width=width,
                 height=height,
                 default_value=data,
-                tag="folder_icon_texture",
+                tag="icon_atlas_texture",
             )
-            width, height, channels, data = dpg.load_image(file_icon_path)
             dpg.add_static_texture(
-                width=width,
-                height=height,
-                default_value=data,
-                tag="file_icon_texture",
-            )
-            width, height, channels, data = dpg.load_image(selected_rectangle_path)
-            dpg.add_static_texture(
-                width=width,
-                height=height,
-                default_value=data,
+                width=200,
+                height=200,
+                default_value=self._selected_rectangle_texture_data(),
                 tag="selected_rectangle_texture",
             )
 
     def create_dir_list(self):
         width = dpg.get_viewport_width()
-        height = dpg.get_viewport_height() - 150
-        pfm_logger.debug(f"主視窗寬：{width}，主視窗高：{height}")
+        height = dpg.get_viewport_height() - dir_list_top
+        pfm_logger.debug("主視窗寬：%s，主視窗高：%s", width, height)
         with dpg.window(
             width=width,
             height=height,
-            pos=[0, 150],
+            pos=[0, dir_list_top],
             no_move=True,
             no_resize=True,
             no_title_bar=True,
@@ -148,15 +309,6 @@ class FileManager:
                 pos=[0, 0],
                 tag="dir_list_child_window",
             ):
-                dpg.add_image(
-                    "selected_rectangle_texture",
-                    tag="selected_rectangle_image",
-                    width=1,
-                    height=30 - 15,
-                    parent="dir_list_child_window",
-                    pos=[1, 1],
-                    show=False,
-                )
                 dpg.bind_item_handler_registry(
                     "dir_list_child_window", "dir_list_child_window_handler"
                 )
@@ -165,68 +317,405 @@ class FileManager:
                 dpg.add_mouse_click_handler(3, callback=self.wheel_handler)
                 dpg.add_mouse_click_handler(4, callback=self.wheel_handler)
                 dpg.add_mouse_wheel_handler(callback=self.wheel_handler)
+                dpg.add_mouse_move_handler(callback=self._dir_list_hover)
 
-    def wheel_handler(self, arg1, arg2):
-        pass
+    def wheel_handler(self, sender, app_data):
+        # 滾動後只更新進入可視範圍的列
+        self.render_dir_list_rows()
 
-    def refresh_dir_list(self):
-        global path
-        pfm_logger.info(f"開始重新整理檔案列表...，路徑：「 {path} 」")
-        pfm_logger.debug("刪除舊文字、圖片...")
-        for dir in self.dir_list_ids:
-            dpg.delete_item(dir)
-        for dir in self.dir_list_pictures:
-            dpg.delete_item(dir)
-        self.dir_list_ids.clear()
-        self.dir_list_pictures.clear()
-        #
-        pfm_logger.debug("新增檔案名稱、圖片(icon)...")
-        self.dirs = []
-        if path == "/":
-            disks = psutil.disk_partitions()
-            for disk in disks:
-                self.dirs.append(disk.device)
-        else:
-            self.dirs = os.listdir(path)
-        pfm_logger.debug(f"路徑：「 {path} 」，取得的檔案列表：「 {self.dirs} 」")
-        dir_height = 10
-        for dir in self.dirs:
-            full_dir_path = os.path.join(path, dir)
-            pfm_logger.debug(f"製作檔名文字，檔案：{full_dir_path}")
-            if os.path.isdir(full_dir_path) is True:
-                picture_id = dpg.add_image(
-                    "folder_icon_texture",
-                    pos=(5, dir_height),
-                    width=30,
-                    height=30,
-                    # (35, dir_height + 30),
-                    parent="dir_list_child_window",
-                    use_internal_label=True,
-                )
-            elif os.path.isfile(full_dir_path) is True:
-                picture_id = dpg.add_image(
-                    "file_icon_texture",
-                    pos=(5, dir_height),
-                    width=30,
-                    height=30,
-                    # (35, dir_height + 30),
-                    parent="dir_list_child_window",
-                    use_internal_label=True,
-                )
-            self.dir_list_pictures.append(picture_id)
+    def _dir_list_hover(self, sender, app_data):
+        # 滑鼠停在資料夾上時預讀，停留時間不足的由 prefetcher 忽略
+        if not dpg.is_item_hovered("dir_list_child_window"):
+            self._hover_row = -1
+            return None
+        child_window_pos = dpg.get_item_pos("dir_list_child_window")
+        row = int((dpg.get_mouse_pos()[1] - child_window_pos[1]) // dir_list_row_height)
+        if row == self._hover_row:
+            return None
+        self._hover_row = row
+        if 0 <= row < len(self.dir_view) and self.fs.local:
+            index = self.dir_view.index_at(row)
+            if self.dir_model.is_dir(index):
+                self.prefetch(self.dir_model.path_at(index))
+        return None
+
+    @traced("frame.update")
+    def update_frame(self) -> None:
+        tracer.frame()
+        if self.overlay_shown:
+            self._refresh_overlay()
+        if self.preview_shown:
+            self._refresh_preview_status()
+        if self.font_glyphs.dirty and time.monotonic() - self._font_rebuild_time > 0.2:
+            # 出現新字元時重建字型圖集，限制頻率避免捲動時連續重建
+            self.rebuild_font()
+        # 每一幀呼叫：套用背景讀取的結果，並偵測拖曳捲軸等滾輪以外的滾動
+        self._check_resize()
+        self._refresh_jobs()
+        self._refresh_folder_sizes()
+        thumbnails = self.thumbnail_loader.poll()
+        if thumbnails:
+            self._apply_thumbnails(thumbnails)
+        if self.file_types.poll():
+            # 讀取內容判斷出類型後更新圖示，只影響可視的列
+            self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+            self.render_dir_list_rows()
+        self._check_launched()
+        self.apply_prefetched()
+        if self.duplicate_task is not None:
+            self._refresh_duplicates()
+        if self.compare_task is not None:
+            self._refresh_compare()
+        search_results = self.file_index.poll_search()
+        if search_results is not None and self.search_query:
+            self._show_search_results(*search_results)
+        if self.path == "/" and not self.search_query:
+            self._check_mounts()
+        messages = self.dir_loader.poll()
+        if messages:
+            self._apply_dir_loader_messages(messages)
+            return None
+        if not self.dir_loader.loading and self._pending_dir_model is None:
+            # 讀取完成後才套用監看到的變更，讀取期間的事件留在佇列中
+            changes = self.dir_watcher.poll()
+            if changes:
+                self._apply_watcher_messages(changes)
+                return None
+            if self.dir_view.unsorted:
+                self._check_sort()
+        if dpg.get_y_scroll("dir_list_window") != self.dir_list_scroll:
+            self.render_dir_list_rows()
+
+    def _check_mounts(self) -> None:
+        # 儲存空間列表：掛載表改變時重新列出，容量結果送達時重繪
+        if self.mount_table.refresh():
+            self.refresh_dir_list()
+            return None
+        if self.mount_table.poll_usage():
+            self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+            self.render_dir_list_rows()
+        return None
+
+    def _apply_dir_loader_messages(self, messages) -> None:
+        self.apply_loader_messages(messages)
+        self._set_dir_list_height()
+        self.render_dir_list_rows()
+
+    def _on_listing_loaded(self) -> None:
+        dpg.hide_item("path_viewer_loading_indicator")
+
+    def _on_listing_replaced(self) -> None:
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+
+    def _on_listing_error(self, err_msg: str) -> None:
+        self.push_notification(err_msg)
+
+    def _on_entry_changed(self, full_path: str) -> None:
+        self._drop_thumbnail(full_path)
+        self.file_types.forget(full_path)
+
+    def _apply_watcher_messages(self, messages) -> None:
+        # 只重繪變更位置之後的列
+        first_changed = self.apply_watcher_messages(messages)
+        if first_changed is None:
+            return None
+        self.file_index.notify(self.dir_model.path)
+        for slot, row in enumerate(self.dir_list_slot_index):
+            if row >= first_changed:
+                self.dir_list_slot_index[slot] = -2
+                self.dir_list_highlight_index[slot] = -2
+        self._set_dir_list_height()
+        self.render_dir_list_rows()
+        return None
+
+    def _new_dir_view(self, model: DirectoryModel, sort_key: str | None = None):
+        if dpg.does_item_exist("control_filter_input"):
+            dpg.set_value("control_filter_input", "")
+        return super()._new_dir_view(model, sort_key)
+
+    def _check_sort(self) -> bool:
+        if not super()._check_sort():
+            return False
+        self._reset_dir_list_rows()
+        return True
+
+    def _reset_dir_list_rows(self) -> None:
+        # 顯示順序整個改變：列號不再對應原本的項目，回到頂端重新繪製
+        self.selection.anchor = None
+        self.selection.focus = None
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        self.dir_list_highlight_index = [-2] * len(self.dir_list_ids)
+        self._set_dir_list_height()
+        dpg.set_y_scroll("dir_list_window", 0)
+        self.render_dir_list_rows()
+
+    def _set_dir_list_height(self) -> None:
+        dir_height = dir_list_row_top + len(self.dir_view) * dir_list_row_height
+        dpg.set_item_height("dir_list_child_window", dir_height + 20)
+
+    def _ensure_dir_list_row_pool(self) -> None:
+        view_height = dpg.get_item_height("dir_list_window") or 0
+        pool_size = view_height // dir_list_row_height + 1 + dir_list_overscan * 2
+        if pool_size <= len(self.dir_list_ids):
+            return None
+        pfm_logger.debug("擴充列元件池：%d -> %d", len(self.dir_list_ids), pool_size)
+        for _ in range(len(self.dir_list_ids), pool_size):
+            picture_id = dpg.add_image(
+                "icon_atlas_texture",
+                uv_min=self.icon_uvs[KIND_FILE][0],
+                uv_max=self.icon_uvs[KIND_FILE][1],
+                pos=(5, 0),
+                width=30,
+                height=30,
+                parent="dir_list_child_window",
+                use_internal_label=True,
+                show=False,
+            )
             text_id = dpg.add_text(
-                dir,
-                pos=[40, dir_height],
+                "",
+                pos=[40, 0],
                 parent="dir_list_child_window",
-                # size=30,
                 use_internal_label=True,
+                show=False,
             )
+            size_id = dpg.add_text(
+                "",
+                pos=[0, 0],
+                parent="dir_list_child_window",
+                use_internal_label=True,
+                show=False,
+            )
+            highlight_id = dpg.add_image(
+                "selected_rectangle_texture",
+                pos=(3, 0),
+                width=1,
+                height=30 - 15,
+                parent="dir_list_child_window",
+                show=False,
+            )
+            self.dir_list_pictures.append(picture_id)
             self.dir_list_ids.append(text_id)
-            dir_height += 30
-        dpg.set_item_height("dir_list_child_window", dir_height + 20)
+            self.dir_list_size_ids.append(size_id)
+            self.dir_list_highlights.append(highlight_id)
+        # 池大小改變後，列與元件的對應全部重算（-2：狀態未知，-1：已隱藏）
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        self.dir_list_highlight_index = [-2] * len(self.dir_list_ids)
+        self.dir_list_slot_thumbnail = [None] * len(self.dir_list_ids)
+        return None
+
+    @traced("render")
+    def render_dir_list_rows(self) -> None:
+        self._ensure_dir_list_row_pool()
+        pool_size = len(self.dir_list_ids)
+        scroll = dpg.get_y_scroll("dir_list_window")
+        self.dir_list_scroll = scroll
+        first = max(0, int(scroll) // dir_list_row_height - dir_list_overscan)
+        last = min(len(self.dir_view), first + pool_size)
+        size_x = (
+            dpg.get_item_width("dir_list_child_window") or 0
+        ) - dir_list_size_column_width
+        # 列號以 row % pool_size 對應到固定元件，滾動時只需更新新進入的列
+        for row in range(first, first + pool_size):
+            slot = row % pool_size
+            if row >= last:
+                if self.dir_list_slot_index[slot] != -1:
+                    dpg.hide_item(self.dir_list_pictures[slot])
+                    dpg.hide_item(self.dir_list_ids[slot])
+                    dpg.hide_item(self.dir_list_size_ids[slot])
+                    self.dir_list_slot_index[slot] = -1
+                continue
+            if self.dir_list_slot_index[slot] == row:
+                continue
+            index = self.dir_view.index_at(row)
+            dir = self.dir_model.name_at(index)
+            label = dir
+            if self.dir_model.path == "/":
+                usage = self.mount_table.usage.get(dir)
+                if usage is not None:
+                    total, used, free = usage
+                    label = (
+                        f"{dir}    可用 {format_size(free)} / 共 {format_size(total)}"
+                    )
+            dir_height = dir_list_row_top + row * dir_list_row_height
+            self.dir_list_slot_thumbnail[slot] = None
+            texture = "icon_atlas_texture"
+            if self.dir_model.is_dir(index) is True:
+                uv = self.icon_uvs["folder"]
+            else:
+                full_dir_path = self.dir_model.path_at(index)
+                uv = self.icon_uvs[self.file_types.kind_of(full_dir_path)]
+                if is_image(dir):
+                    thumbnail = self._thumbnail_texture(full_dir_path)
+                    if thumbnail is not None:
+                        texture = thumbnail
+                        uv = ((0.0, 0.0), (1.0, 1.0))
+                    elif full_dir_path not in self.thumbnail_failed:
+                        self.thumbnail_loader.request(full_dir_path)
+                        self.dir_list_slot_thumbnail[slot] = full_dir_path
+            dpg.configure_item(
+                self.dir_list_pictures[slot],
+                texture_tag=texture,
+                uv_min=uv[0],
+                uv_max=uv[1],
+                pos=(5, dir_height),
+                show=True,
+            )
+            self.font_glyphs.add_text(label)
+            dpg.set_value(self.dir_list_ids[slot], label)
+            dpg.configure_item(self.dir_list_ids[slot], pos=[40, dir_height], show=True)
+            dpg.set_value(self.dir_list_size_ids[slot], self._size_label(index))
+            dpg.configure_item(
+                self.dir_list_size_ids[slot], pos=[size_x, dir_height], show=True
+            )
+            self.dir_list_slot_index[slot] = row
+        self.thumbnail_loader.retain(
+            {p for p in self.dir_list_slot_thumbnail if p is not None}
+        )
+        self._refresh_dir_list_selection()
+        return None
+
+    def _size_label(self, index: int) -> str:
+        if self.dir_model.is_dir(index):
+            task = self.folder_sizes.get(self.dir_model.path_at(index))
+            if task is None:
+                return ""
+            label = format_size(task.size)
+            return label if task.done else f"{label} …"
+        size = self.dir_model.known_size(index)
+        return "" if size == STAT_UNKNOWN else format_size(size)
+
+    def _refresh_folder_sizes(self) -> None:
+        # 計算中每 0.25 秒更新一次可視列的大小欄，結束後再更新最後一次
+        if not self._folder_size_running:
+            return None
+        now = time.monotonic()
+        if now - self._folder_size_refresh_time < 0.25:
+            return None
+        self._folder_size_refresh_time = now
+        self._folder_size_running = any(
+            not task.done for task in self.folder_sizes.values()
+        ) or (self._file_size_task is not None and not self._file_size_task.done)
+        for slot, row in enumerate(self.dir_list_slot_index):
+            if row >= 0:
+                dpg.set_value(
+                    self.dir_list_size_ids[slot],
+                    self._size_label(self.dir_view.index_at(row)),
+                )
+        return None
+
+    def _control_folder_size(self):
+        # 計算選取的項目；沒有選取時計算目前資料夾中的所有項目
+        if self.dir_model.path == "/" or self._pending_dir_model is not None:
+            return
+        indices = [
+            index
+            for index in self.selection.indices()
+            if index < len(self.dir_model) and not self.dir_model.is_removed(index)
+        ]
+        if not indices:
+            indices = list(self.dir_view.order)
+        files = []
+        for index in indices:
+            if self.dir_model.is_dir(index):
+                full_path = self.dir_model.path_at(index)
+                task = self.folder_sizes.get(full_path)
+                if task is None or task.done:
+                    self.folder_sizes[full_path] = (
+                        self.folder_size_calculator.calculate(full_path)
+                    )
+            else:
+                files.append(index)
+        if files:
+            # 檔案大小在背景 stat，結果寫回 dir_model，由 _refresh_folder_sizes 顯示
+            if self._file_size_task is not None:
+                self._file_size_task.cancel()
+            self._file_size_task = self.folder_size_calculator.stat_files(
+                self.dir_model, files
+            )
+        self._folder_size_running = True
+        self._folder_size_refresh_time = 0.0
+
+    def _thumbnail_texture(self, full_path: str) -> int | str | None:
+        texture = self.thumbnail_textures.get(full_path)
+        if texture is not None:
+            self.thumbnail_textures.move_to_end(full_path)
+        return texture
+
+    def _drop_thumbnail(self, full_path: str) -> None:
+        # 圖片內容改變，捨棄舊的縮圖材質，重繪時重新產生
+        self.thumbnail_failed.discard(full_path)
+        texture = self.thumbnail_textures.pop(full_path, None)
+        if texture is not None:
+            dpg.delete_item(texture)
+
+    def _apply_thumbnails(self, results) -> None:
+        for full_path, data in results:
+            if data is None:
+                self.thumbnail_failed.add(full_path)
+                continue
+            data = array("f", data)
+            if len(self.thumbnail_textures) < self.config["thumbnail_texture_limit"]:
+                texture = dpg.add_dynamic_texture(
+                    thumbnail_size, thumbnail_size, data, parent="icon_reg"
+                )
+            else:
+                # 重複使用最久未使用的材質，使用它的列改回重新繪製
+                evicted_path, texture = self.thumbnail_textures.popitem(last=False)
+                dpg.set_value(texture, data)
+                for slot, row in enumerate(self.dir_list_slot_index):
+                    if (
+                        row >= 0
+                        and self.dir_model.path_at(self.dir_view.index_at(row))
+                        == evicted_path
+                    ):
+                        self.dir_list_slot_index[slot] = -2
+            self.thumbnail_textures[full_path] = texture
+        ready = {full_path for full_path, _ in results}
+        for slot, waiting in enumerate(self.dir_list_slot_thumbnail):
+            if waiting in ready:
+                self.dir_list_slot_index[slot] = -2
+        self.render_dir_list_rows()
+        return None
+
+    @traced("render.selection")
+    def _refresh_dir_list_selection(self) -> None:
+        # 只檢查列元件池中的列，成本與可視列數成正比
+        child_window_width = dpg.get_item_width("dir_list_child_window")
+        if type(child_window_width) is not int:
+            err_msg = f"DPG回傳值類型錯誤，回傳類型{type(child_window_width)}，應為int"
+            pfm_logger.error(err_msg)
+            raise RuntimeError(err_msg)
+        for slot, row in enumerate(self.dir_list_slot_index):
+            if row < 0 or self.dir_view.index_at(row) not in self.selection:
+                row = -1
+            if self.dir_list_highlight_index[slot] == row:
+                continue
+            self.dir_list_highlight_index[slot] = row
+            if row == -1:
+                dpg.hide_item(self.dir_list_highlights[slot])
+                continue
+            # 項目高度 30 - 15 變類底線
+            dpg.configure_item(
+                self.dir_list_highlights[slot],
+                pos=[3, row * dir_list_row_height + 30],
+                width=child_window_width * 30,
+                height=30 * 10 - 30,
+                show=True,
+            )
+        return None
+
+    def refresh_dir_list(self):
+        # 讀取結果由 update_frame 分批套用
+        self.thumbnail_loader.cancel_pending()
+        super().refresh_dir_list()
+        dpg.show_item("path_viewer_loading_indicator")
+        self._set_dir_list_height()
+        # 只重設元件對應，不刪除、不重建元件
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        dpg.set_y_scroll("dir_list_window", 0)
+        self.render_dir_list_rows()
 
     def get_click_pos(self, sender, app_data) -> None:
-        global path
         window_now = dpg.get_active_window()
         window_now_tag = dpg.get_item_alias(window_now)
         if window_now_tag != "dir_list_child_window":
@@ -235,59 +724,50 @@ class FileManager:
         pos_xy = dpg.get_mouse_pos()
         child_window_pos = dpg.get_item_pos("dir_list_child_window")
         pos_y = pos_xy[1] - child_window_pos[1]
-        pfm_logger.debug(f"點擊y軸: {pos_y}")
-        for y in range(0, len(self.dirs)):
-            if pos_y in range(y * 30, y * 30 + 30):
-                if (self.selected_dir == os.path.join(path, self.dirs[y])) and (
-                    self.selected_dir is not None
-                ):
-                    # 開啟檔案或資料夾
-                    if os.path.isdir(self.selected_dir):
-                        path = os.path.join(path, self.dirs[y])
-                        self.refresh_dir_list()
-                        self.refresh_path_viewer()
-                    elif os.path.isfile(self.selected_dir):
-                        self.open_file_by_default_app(self.selected_dir)
-                else:
-                    # 選擇檔案或資料夾
-                    self.selected_dir = os.path.join(path, self.dirs[y])
-                    pfm_logger.info(f"選擇：{self.selected_dir}")
-                    child_window_width = dpg.get_item_width("dir_list_child_window")
-                    pfm_logger.debug(
-                        f"子視窗寬(width)：{child_window_width}，資料類型：{type(child_window_width)}"
-                    )
-                    if type(child_window_width) is not int:
-                        err_msg = f"DPG回傳值類型錯誤，回傳類型{type(child_window_width)}，應為int"
-                        pfm_logger.error(err_msg)
-                        raise RuntimeError(err_msg)
-                    else:
-                        dpg.set_item_pos(
-                            "selected_rectangle_image",
-                            [3, y * 30 + 30],  # X 軸位置 3, Y 軸位置 (已扣除滾動距離)
-                        )
-                        dpg.set_item_width(
-                            "selected_rectangle_image", child_window_width * 30
-                        )
-                        dpg.set_item_height(
-                            "selected_rectangle_image", (30 * 10 - 30)
-                        )  # 項目高度 30 - 15 變類底線
-                        dpg.show_item("selected_rectangle_image")
-                break
-            else:
-                pass
+        pfm_logger.debug("點擊y軸: %s", pos_y)
+        # 直接由座標計算列號 (座標已扣除滾動距離)
+        y = int(pos_y // dir_list_row_height)
+        shift = dpg.is_key_down(dpg.mvKey_LShift) or dpg.is_key_down(dpg.mvKey_RShift)
+        ctrl = dpg.is_key_down(dpg.mvKey_LControl) or dpg.is_key_down(
+            dpg.mvKey_RControl
+        )
+        action = self.click(y, shift, ctrl)
+        if action == CLICK_NONE:
+            return None
+        if action == CLICK_SELECT and self.preview_shown:
+            index = self.dir_view.index_at(y)
+            if index in self.selection and self.dir_model.is_file(index):
+                self._show_preview(self.dir_model.path_at(index))
+        if action == CLICK_OPEN_DIR:
+            self.change_path(self.dir_model.path_at(self.dir_view.index_at(y)))
+            return None
+        if action == CLICK_OPEN_FILE:
+            self.open_file_by_default_app(
+                self.dir_model.path_at(self.dir_view.index_at(y))
+            )
+        self._refresh_dir_list_selection()
+        return None
 
     def open_file_by_default_app(self, filepath: str):
-        sys_platform = platform.system()
-        if sys_platform == "Windows":
-            os.startfile(filepath)
-        elif sys_platform == "Darwin":  # macOS
-            subprocess.run(["open", filepath], check=True)
-        elif sys_platform == "Linux":
-            subprocess.run(["xdg-open", filepath], check=True)
-        else:
-            err_msg = f"無法開啟檔案，不支援的系統：{sys_platform}"
-            pfm_logger.warning(err_msg)
-            self.push_notification(err_msg)
+        if self.vfs.is_virtual(filepath):
+            # 壓縮檔中的檔案先解壓縮到快取資料夾，工作完成後由 _refresh_jobs 開啟；
+            # 每次使用新的資料夾，避免與之前解開的同名檔案衝突
+            dst_dir = tempfile.mkdtemp(dir=cache_dir("archive_open"))
+            job = self.extract([filepath], dst_dir)
+            self._extract_to_open[job.id] = os.path.join(
+                dst_dir, os.path.basename(filepath)
+            )
+            return
+        # 不等待開啟的程式，失敗的結束代碼由 update_frame 回報
+        try:
+            self.app_launcher.launch(filepath)
+        except OSError as e:
+            pfm_logger.warning("無法開啟檔案：「 %s 」，%s", filepath, e)
+            self.push_notification(f"無法開啟檔案：\n{filepath}\n{e}")
+
+    def _check_launched(self) -> None:
+        for filepath, code in self.app_launcher.poll():
+            self.push_notification(f"無法開啟檔案（結束代碼 {code}）：\n{filepath}")
 
     def create_control_center(self):
         width = dpg.get_viewport_width()
@@ -311,38 +791,672 @@ class FileManager:
                 pos=[5, 5],
             )
             dpg.add_button(
-                label="複製(未完)",
+                label="複製",
                 width=70,
                 height=30,
                 callback=self._control_copy,
                 pos=[100, 5],
             )
             dpg.add_button(
-                label="貼上(未完)",
+                label="剪下",
+                width=70,
+                height=30,
+                callback=self._control_cut,
+                pos=[180, 5],
+            )
+            dpg.add_button(
+                label="貼上",
                 width=70,
                 height=30,
                 callback=self._control_paste,
                 enabled=False,
                 tag="control_paste",
-                pos=[200, 5],
+                pos=[260, 5],
+            )
+            dpg.add_button(
+                label="刪除",
+                width=70,
+                height=30,
+                callback=self._control_delete,
+                pos=[340, 5],
+            )
+            dpg.add_button(
+                label="重新命名",
+                width=100,
+                height=30,
+                callback=self._control_rename,
+                pos=[420, 5],
+            )
+            dpg.add_button(
+                label="工作",
+                width=70,
+                height=30,
+                callback=self.show_job_window,
+                pos=[530, 5],
+            )
+            dpg.add_button(
+                label="計算大小",
+                width=100,
+                height=30,
+                callback=self._control_folder_size,
+                pos=[610, 5],
+            )
+            dpg.add_input_text(
+                hint="搜尋檔名",
+                tag="control_search_input",
+                width=300,
+                callback=self._control_search,
+                pos=[720, 5],
+            )
+            dpg.add_text("", tag="control_job_summary_text", pos=[1030, 10])
+            for i, sort_key in enumerate(sort_button_labels):
+                dpg.add_button(
+                    label=sort_button_labels[sort_key],
+                    width=95,
+                    height=30,
+                    callback=self._control_sort,
+                    user_data=sort_key,
+                    tag=f"control_sort_{sort_key}",
+                    pos=[5 + i * 100, 40],
+                )
+            dpg.add_input_text(
+                hint="篩選目前資料夾",
+                tag="control_filter_input",
+                width=300,
+                callback=self._control_filter,
+                pos=[420, 40],
             )
+            dpg.add_button(
+                label="預覽",
+                width=70,
+                height=30,
+                callback=self._toggle_preview,
+                pos=[730, 40],
+            )
+            dpg.add_button(
+                label="重複檔案",
+                width=100,
+                height=30,
+                callback=self.show_duplicates_window,
+                pos=[810, 40],
+            )
+            dpg.add_button(
+                label="比較資料夾",
+                width=110,
+                height=30,
+                callback=self.show_compare_window,
+                pos=[920, 40],
+            )
+        self.refresh_sort_buttons()
+
+    def refresh_sort_buttons(self) -> None:
+        for sort_key, label in sort_button_labels.items():
+            if sort_key == self.sort_key:
+                label += " ▼" if self.sort_reverse else " ▲"
+            dpg.configure_item(f"control_sort_{sort_key}", label=label)
+
+    def _control_sort(self, sender, app_data, user_data):
+        # 再按一次目前的排序方式則反向，大列表由 update_frame 在背景排序完成後顯示
+        self.set_sort(user_data)
+        self.refresh_sort_buttons()
+
+    def _control_filter(self, sender, app_data):
+        self.font_glyphs.add_text(app_data)
+        self.dir_view.set_filter(app_data)
+        self._reset_dir_list_rows()
+
+    def _control_search(self, sender, app_data):
+        query = app_data.strip()
+        self.font_glyphs.add_text(query)
+        if not query:
+            if self.search_query:
+                self.search_query = ""
+                self.refresh_dir_list()
+                self.refresh_path_viewer()
+            return
+        self.search_query = query
+        self.file_index.request_search(query, search_result_limit)
+
+    def _show_search_results(self, query: str, results) -> None:
+        # 搜尋結果以完整路徑作為名稱放入 dir_model，沿用既有的列表、選取與開啟
+        self.dir_loader.cancel()
+        self.dir_watcher.stop()
+        self._pending_dir_model = None
+        self.thumbnail_loader.cancel_pending()
+        model = DirectoryModel("")
+        for full_path, kind in results:
+            model.append(full_path, kind)
+        self.dir_model = model
+        # 保留搜尋的相關度順序，按下排序按鈕後才排序
+        self.dir_view = self._new_dir_view(model, SORT_NONE)
+        dpg.hide_item("path_viewer_loading_indicator")
+        self.selection.clear()
+        self._set_dir_list_height()
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        dpg.set_y_scroll("dir_list_window", 0)
+        self.render_dir_list_rows()
+        self.refresh_path_viewer()
 
     def refresh_control_center(self):
-        if self._copy_dir is None:
+        if not self._clipboard:
             dpg.configure_item("control_paste", enabled=False)
         else:
             dpg.configure_item("control_paste", enabled=True)
 
     def _control_copy(self):
-        if self.selected_dir is None:
+        if self.copy_selection():
+            self.refresh_control_center()
+
+    def _control_cut(self):
+        if self.read_only():
+            self.push_notification("壓縮檔內容為唯讀，只能複製")
             return
-        self._copy_dir = self.selected_dir
-        self.refresh_control_center()
+        if self.cut_selection():
+            self.refresh_control_center()
 
     def _control_paste(self):
-        if self._copy_dir is None:
+        if self.read_only():
+            self.push_notification("無法貼上到壓縮檔中")
             return
-        self.copy(self._copy_dir, path)
+        if self.paste() is not None:
+            self.refresh_control_center()
+
+    def _control_delete(self):
+        selected = self.selected_paths()
+        if not selected:
+            return
+        if self.read_only():
+            self.push_notification("壓縮檔內容為唯讀，無法刪除")
+            return
+        self._delete_paths = selected
+        if len(selected) == 1:
+            msg = f"確定要刪除？\n{selected[0]}"
+        else:
+            msg = f"確定要刪除 {len(selected)} 個項目？"
+        dpg.set_value("delete_confirm_text", msg)
+        dpg.show_item("delete_confirm_window")
+
+    def _delete_confirm(self):
+        dpg.hide_item("delete_confirm_window")
+        if not self._delete_paths:
+            return
+        self.delete(self._delete_paths)
+        self._drop_duplicate_paths(self._delete_paths)
+        self._delete_paths = []
+
+    def _control_rename(self):
+        self._rename_path = self.focused_path()
+        if self._rename_path is None:
+            return
+        if self.read_only():
+            self._rename_path = None
+            self.push_notification("壓縮檔內容為唯讀，無法重新命名")
+            return
+        dpg.set_value("rename_input", os.path.basename(self._rename_path))
+        dpg.show_item("rename_window")
+
+    def _rename_confirm(self):
+        dpg.hide_item("rename_window")
+        new_name = dpg.get_value("rename_input")
+        if self._rename_path is None or not new_name:
+            return
+        try:
+            self.rename(self._rename_path, new_name)
+        except ValueError as e:
+            self.push_notification(str(e))
+
+    def create_file_operation_windows(self):
+        window_width = 500
+        window_height = 150
+        pos_width = dpg.get_viewport_width()
+        pos_height = dpg.get_viewport_height()
+        window_pos_width = (pos_width - window_width) // 2
+        window_pos_height = (pos_height - window_height) // 2
+        with dpg.window(
+            label="刪除",
+            tag="delete_confirm_window",
+            pos=[window_pos_width, window_pos_height],
+            show=False,
+            modal=True,
+            height=window_height,
+            width=window_width,
+        ):
+            dpg.add_text("", tag="delete_confirm_text")
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="確定", callback=self._delete_confirm)
+                dpg.add_button(
+                    label="取消",
+                    callback=lambda: dpg.hide_item("delete_confirm_window"),
+                )
+        with dpg.window(
+            label="重新命名",
+            tag="rename_window",
+            pos=[window_pos_width, window_pos_height],
+            show=False,
+            modal=True,
+            height=window_height,
+            width=window_width,
+        ):
+            dpg.add_input_text(
+                tag="rename_input",
+                width=window_width - 20,
+                on_enter=True,
+                callback=self._rename_confirm,
+            )
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="確定", callback=self._rename_confirm)
+                dpg.add_button(
+                    label="取消", callback=lambda: dpg.hide_item("rename_window")
+                )
+
+    def create_job_window(self):
+        window_width = 720
+        window_height = 480
+        pos_width = dpg.get_viewport_width()
+        pos_height = dpg.get_viewport_height()
+        with dpg.window(
+            label="工作",
+            tag="job_window",
+            pos=[(pos_width - window_width) // 2, (pos_height - window_height) // 2],
+            show=False,
+            width=window_width,
+            height=window_height,
+        ):
+            dpg.add_button(label="清除已結束的工作", callback=self._job_clear_finished)
+            dpg.add_group(tag="job_list_group")
+
+    def show_job_window(self):
+        dpg.show_item("job_window")
+        self._refresh_job_window()
+
+    def _job_clear_finished(self):
+        self.job_scheduler.clear_finished()
+        self._refresh_job_window()
+
+    def _job_toggle_pause(self, sender, app_data, job):
+        if job.status == JOB_PAUSED:
+            self.job_scheduler.resume(job)
+        else:
+            self.job_scheduler.pause(job)
+        self._refresh_job_window()
+
+    def _job_cancel(self, sender, app_data, job):
+        self.job_scheduler.cancel(job)
+        self._refresh_job_window()
+
+    def _job_show_errors(self, sender, app_data, job):
+        errors = job.progress.errors
+        self.push_notification(
+            f"工作 #{job.id} 錯誤 {len(errors)} 個：\n" + "\n".join(errors[:10])
+        )
+
+    def _refresh_job_window(self) -> None:
+        jobs = {job.id: job for job in self.job_scheduler.jobs}
+        for job_id in list(self.job_rows):
+            if job_id not in jobs:
+                dpg.delete_item(self.job_rows.pop(job_id))
+        for job in jobs.values():
+            if job.id not in self.job_rows:
+                with dpg.group(parent="job_list_group") as row:
+                    dpg.add_text("", tag=f"job_{job.id}_text")
+                    with dpg.group(horizontal=True):
+                        dpg.add_progress_bar(tag=f"job_{job.id}_progress", width=400)
+                        dpg.add_button(
+                            label="暫停",
+                            tag=f"job_{job.id}_pause",
+                            callback=self._job_toggle_pause,
+                            user_data=job,
+                        )
+                        dpg.add_button(
+                            label="取消",
+                            tag=f"job_{job.id}_cancel",
+                            callback=self._job_cancel,
+                            user_data=job,
+                        )
+                        dpg.add_button(
+                            label="錯誤",
+                            tag=f"job_{job.id}_errors",
+                            callback=self._job_show_errors,
+                            user_data=job,
+                            show=False,
+                        )
+                self.job_rows[job.id] = row
+            progress = job.progress
+            sources = ", ".join(os.path.basename(src) for src in job.sources)
+            devices = ", ".join(
+                mount.mountpoint
+                for mount in map(self.mount_table.mount_of_device, job.devices)
+                if mount is not None
+            )
+            self.font_glyphs.add_text(sources + devices)
+            dpg.set_value(
+                f"job_{job.id}_text",
+                f"#{job.id} {job_kind_labels[job.kind]}「{sources}」"
+                f"［{job_status_labels[job.status]}］ {devices} "
+                f"{progress.files_done} / {progress.files_found} 個檔案，"
+                f"{progress.bytes_per_second() / 1024 / 1024:.1f} MB/s",
+            )
+            if progress.bytes_found:
+                fraction = progress.bytes_done / progress.bytes_found
+            elif progress.files_found:
+                fraction = progress.files_done / progress.files_found
+            else:
+                fraction = 1.0 if job.status == JOB_DONE else 0.0
+            dpg.set_value(f"job_{job.id}_progress", fraction)
+            finished = job.status in (JOB_DONE, JOB_CANCELLED)
+            dpg.configure_item(
+                f"job_{job.id}_pause",
+                label="繼續" if job.status == JOB_PAUSED else "暫停",
+                show=not finished,
+            )
+            dpg.configure_item(f"job_{job.id}_cancel", show=not finished)
+            dpg.configure_item(f"job_{job.id}_errors", show=bool(progress.errors))
+        return None
+
+    def _refresh_jobs(self) -> None:
+        # 每幀呼叫，工作列表與摘要以較低頻率更新
+        # 目前資料夾的變更由 dir_watcher 增量套用，不需要重新整理
+        for job in self.job_scheduler.poll_finished():
+            open_path = self._extract_to_open.pop(job.id, None)
+            done = job.status == JOB_DONE and not job.progress.errors
+            if open_path is not None and done:
+                self.open_file_by_default_app(open_path)
+            if job.progress.errors:
+                self.push_notification(
+                    f"工作 #{job.id} {job_kind_labels[job.kind]}完成，"
+                    f"錯誤 {len(job.progress.errors)} 個"
+                )
+        now = time.monotonic()
+        if now - self._job_refresh_time < 0.25:
+            return None
+        self._job_refresh_time = now
+        active = [
+            job
+            for job in self.job_scheduler.jobs
+            if job.status in (JOB_QUEUED, JOB_RUNNING, JOB_PAUSED)
+        ]
+        if active:
+            speed = sum(job.progress.bytes_per_second() for job in active)
+            dpg.set_value(
+                "control_job_summary_text",
+                f"{len(active)} 個工作進行中，{speed / 1024 / 1024:.1f} MB/s",
+            )
+        else:
+            dpg.set_value("control_job_summary_text", "")
+        if dpg.is_item_shown("job_window"):
+            self._refresh_job_window()
+        return None
+
+    def create_duplicates_window(self):
+        # 搜尋結果在背景陸續加入，每組的第一個檔案預設保留
+        self.duplicate_task = None
+        self._duplicate_refresh_time = 0.0
+        # 每組的 (大小, 核取方塊 -> 路徑)
+        self.duplicate_rows: list[tuple[int, dict[int | str, str]]] = []
+        # 顯示的路徑掃描時的 stat，以硬連結取代前確認檔案未再修改
+        self._duplicate_keys: dict[str, CacheKey] = {}
+        window_width = 900
+        window_height = 600
+        pos_width = dpg.get_viewport_width()
+        pos_height = dpg.get_viewport_height()
+        with dpg.window(
+            label="重複檔案",
+            tag="duplicates_window",
+            pos=[(pos_width - window_width) // 2, (pos_height - window_height) // 2],
+            show=False,
+            width=window_width,
+            height=window_height,
+        ):
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="搜尋目前資料夾", callback=self._duplicates_start)
+                dpg.add_button(label="停止", callback=self._duplicates_cancel)
+                dpg.add_button(
+                    label="選取重複項", callback=self._duplicates_select_extra
+                )
+                dpg.add_button(label="清除選取", callback=self._duplicates_clear)
+                dpg.add_button(label="刪除選取", callback=self._duplicates_delete)
+                dpg.add_button(label="以硬連結取代", callback=self._duplicates_link)
+            dpg.add_text("", tag="duplicates_status_text")
+            dpg.add_group(tag="duplicates_list_group")
+
+    def show_duplicates_window(self):
+        dpg.show_item("duplicates_window")
+
+    def _duplicates_start(self):
+        if self.duplicate_task is not None and not self.duplicate_task.done:
+            self.duplicate_task.cancel()
+        dpg.delete_item("duplicates_list_group", children_only=True)
+        self.duplicate_rows = []
+        self._duplicate_keys = {}
+        self.font_glyphs.add_text(self.path)
+        self.duplicate_task = self.find_duplicates()
+        self._duplicate_refresh_time = 0.0
+
+    def _duplicates_cancel(self):
+        if self.duplicate_task is not None:
+            self.duplicate_task.cancel()
+
+    def _refresh_duplicates(self) -> None:
+        task = self.duplicate_task
+        now = time.monotonic()
+        if now - self._duplicate_refresh_time < duplicate_refresh_interval:
+            return None
+        self._duplicate_refresh_time = now
+        # 先讀取 done 再取出結果，結束前加入的組不會遺漏
+        done = task.done
+        for size, _, paths in task.poll():
+            if len(self.duplicate_rows) >= duplicate_group_display_limit:
+                break
+            dpg.add_text(
+                f"{format_size(size)} × {len(paths)}", parent="duplicates_list_group"
+            )
+            checks = {}
+            for path in paths:
+                self._duplicate_keys[path] = task.keys[path]
+                self.font_glyphs.add_text(path)
+                check = dpg.add_checkbox(label=path, parent="duplicates_list_group")
+                checks[check] = path
+            self.duplicate_rows.append((size, checks))
+        stage_labels = {
+            "scan": "掃描中",
+            "partial": "比對開頭與結尾",
+            "full": "比對內容",
+        }
+        status = (
+            f"{task.files} 個檔案，{len(task.groups)} 組重複，"
+            f"可節省 {format_size(task.wasted)}"
+        )
+        if done:
+            status += f"，完成（{task.finished - task.started:.1f} 秒）"
+            if task.cancel_event.is_set():
+                status += "，已停止"
+        else:
+            status += (
+                f"，{stage_labels[task.stage]}，已讀取 {format_size(task.hashed_bytes)}"
+            )
+        if len(task.groups) > duplicate_group_display_limit:
+            status += f"，只顯示前 {duplicate_group_display_limit} 組"
+        if task.errors:
+            status += f"，{task.errors} 個錯誤"
+        dpg.set_value("duplicates_status_text", status)
+        if done:
+            self.duplicate_task = None
+        return None
+
+    def _duplicates_select_extra(self):
+        # 每組保留第一個，其餘全部選取
+        for _, checks in self.duplicate_rows:
+            for i, check in enumerate(checks):
+                dpg.set_value(check, i > 0)
+
+    def _duplicates_clear(self):
+        for _, checks in self.duplicate_rows:
+            for check in checks:
+                dpg.set_value(check, False)
+
+    def _duplicates_checked(self) -> list[tuple[list[str], list[str]]]:
+        # 每組的 (未選取, 已選取) 路徑
+        result = []
+        for _, checks in self.duplicate_rows:
+            kept = [path for check, path in checks.items() if not dpg.get_value(check)]
+            checked = [path for check, path in checks.items() if dpg.get_value(check)]
+            if checked:
+                result.append((kept, checked))
+        return result
+
+    def _duplicates_delete(self):
+        # 整組都選取時拒絕刪除，至少保留一份
+        groups = self._duplicates_checked()
+        if any(not kept for kept, _ in groups):
+            self.push_notification("每組至少需要保留一個檔案")
+            return
+        self._delete_paths = [path for _, checked in groups for path in checked]
+        if not self._delete_paths:
+            return
+        dpg.set_value(
+            "delete_confirm_text", f"確定要刪除 {len(self._delete_paths)} 個重複檔案？"
+        )
+        dpg.show_item("delete_confirm_window")
+
+    def _duplicates_link(self):
+        # 選取的檔案改為指向同組第一個未選取檔案的硬連結
+        groups = self._duplicates_checked()
+        if any(not kept for kept, _ in groups):
+            self.push_notification("每組至少需要保留一個檔案")
+            return
+        for kept, checked in groups:
+            self.link_duplicates(kept[0], checked, self._duplicate_keys)
+            self._drop_duplicate_paths(checked)
+
+    def _drop_duplicate_paths(self, paths: list[str]) -> None:
+        removed = set(paths)
+        for _, checks in self.duplicate_rows:
+            for check, path in list(checks.items()):
+                if path in removed:
+                    dpg.delete_item(check)
+                    del checks[check]
+
+    def create_compare_window(self):
+        # 左側預設為目前資料夾；結果只列出不同的項目，完成後可單向同步到右側
+        self.compare_task = None
+        # 比較完成、可以同步的結果
+        self.compare_result = None
+        self._compare_refresh_time = 0.0
+        self._compare_rows = 0
+        window_width = 900
+        window_height = 600
+        pos_width = dpg.get_viewport_width()
+        pos_height = dpg.get_viewport_height()
+        with dpg.window(
+            label="比較資料夾",
+            tag="compare_window",
+            pos=[(pos_width - window_width) // 2, (pos_height - window_height) // 2],
+            show=False,
+            width=window_width,
+            height=window_height,
+        ):
+            dpg.add_input_text(label="左側", tag="compare_left_input", width=700)
+            dpg.add_input_text(label="右側", tag="compare_right_input", width=700)
+            with dpg.group(horizontal=True):
+                dpg.add_checkbox(label="比較內容", tag="compare_content_check")
+                dpg.add_button(label="比較", callback=self._compare_start)
+                dpg.add_button(label="停止", callback=self._compare_cancel)
+                dpg.add_checkbox(
+                    label="大型檔案只寫入不同區塊", tag="compare_delta_check"
+                )
+                dpg.add_button(label="同步到右側", callback=self._compare_sync)
+            dpg.add_text("", tag="compare_status_text")
+            dpg.add_group(tag="compare_list_group")
+
+    def show_compare_window(self):
+        if not dpg.get_value("compare_left_input"):
+            self.font_glyphs.add_text(self.path)
+            dpg.set_value("compare_left_input", self.path)
+        if not dpg.get_value("compare_right_input") and len(self.panes) > 1:
+            # 右側預設為下一個分頁的資料夾
+            index = (self.panes.index(self.pane) + 1) % len(self.panes)
+            right = self.panes[index].path
+            self.font_glyphs.add_text(right)
+            dpg.set_value("compare_right_input", right)
+        dpg.show_item("compare_window")
+
+    def _compare_start(self):
+        if self.compare_task is not None and not self.compare_task.done:
+            self.compare_task.cancel()
+        left = dpg.get_value("compare_left_input").strip()
+        right = dpg.get_value("compare_right_input").strip()
+        self.font_glyphs.add_text(left + right)
+        try:
+            task = self.compare_dirs(
+                left, right, dpg.get_value("compare_content_check")
+            )
+        except ValueError as e:
+            self.push_notification(str(e))
+            return
+        dpg.delete_item("compare_list_group", children_only=True)
+        self._compare_rows = 0
+        self.compare_task = task
+        self.compare_result = None
+        self._compare_refresh_time = 0.0
+
+    def _compare_cancel(self):
+        if self.compare_task is not None:
+            self.compare_task.cancel()
+
+    def _refresh_compare(self) -> None:
+        task = self.compare_task
+        now = time.monotonic()
+        if now - self._compare_refresh_time < compare_refresh_interval:
+            return None
+        self._compare_refresh_time = now
+        # 先讀取 done 再取出結果，結束前加入的項目不會遺漏
+        done = task.done
+        for rel, state, left_size, right_size in task.poll():
+            if self._compare_rows >= compare_display_limit:
+                break
+            sizes = " / ".join(
+                format_size(size) if size >= 0 else "-"
+                for size in (left_size, right_size)
+            )
+            text = f"{compare_state_labels[state]}  {rel}  {sizes}"
+            self.font_glyphs.add_text(text)
+            dpg.add_text(text, parent="compare_list_group")
+            self._compare_rows += 1
+        counts = task.counts
+        status = (
+            f"{task.compared} 個項目：相同 {counts[CMP_SAME]}，"
+            f"不同 {counts[CMP_DIFFERENT]}，只在左側 {counts[CMP_ONLY_LEFT]}，"
+            f"只在右側 {counts[CMP_ONLY_RIGHT]}"
+        )
+        if done:
+            status += f"，完成（{task.finished - task.started:.1f} 秒）"
+            if task.cancel_event.is_set():
+                status += "，已停止"
+        elif task.stage == "content":
+            status += f"，比對內容，已讀取 {format_size(task.hashed_bytes)}"
+        if len(task.entries) > compare_display_limit:
+            status += f"，只顯示前 {compare_display_limit} 項"
+        if task.errors:
+            status += f"，{task.errors} 個錯誤"
+        dpg.set_value("compare_status_text", status)
+        if done:
+            self.compare_task = None
+            if not task.cancel_event.is_set():
+                self.compare_result = task
+        return None
+
+    def _compare_sync(self):
+        # 只有完整比較過的結果可以同步，停止的比較可能漏掉不同的項目
+        task = self.compare_result
+        if task is None:
+            self.push_notification("請先完成比較")
+            return
+        job = self.sync_dirs(task, dpg.get_value("compare_delta_check"))
+        if job is None:
+            self.push_notification("沒有需要同步的項目")
+            return
+        self.compare_result = None
+        dpg.set_value("compare_status_text", f"已新增同步工作 #{job.id}")
 
     def show_config_window(self):
         dpg.show_item("config_window")
@@ -412,7 +1526,7 @@ class FileManager:
     def _config_init(self):
         dpg.hide_item("config_window")
         self.init_config()
-        self._config_save_to_file
+        self._config_save_to_file()
 
     def _config_save(self):
         #
@@ -423,20 +1537,46 @@ class FileManager:
         self._config_save_to_file()
         dpg.hide_item("config_window")
 
-    def _config_save_to_file(self):
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(self.config, f, ensure_ascii=False, indent=4)
-        pfm_logger.debug("已將設定儲存到檔案。")
-
     def resize_window(self):
+        # 拖曳視窗邊緣時每秒會觸發數十次，只記錄時間，由 update_frame 合併處理
+        now = time.monotonic()
+        if self._resize_first_time is None:
+            self._resize_first_time = now
+        self._resize_last_time = now
+
+    def _check_resize(self) -> None:
+        if self._resize_first_time is None:
+            return None
+        now = time.monotonic()
+        # 停止調整 resize_debounce 秒後套用；持續拖曳時至少每 resize_max_delay 秒套用一次
+        if (
+            now - self._resize_last_time < resize_debounce
+            and now - self._resize_first_time < resize_max_delay
+        ):
+            return None
+        self._resize_first_time = None
+        self._apply_resize()
+        return None
+
+    def _apply_resize(self) -> None:
+        # 只重新計算版面，使用記憶體中的列表，不讀取檔案系統也不重建元件
         width = dpg.get_viewport_width() - 10
-        height = dpg.get_viewport_height() - 180
+        height = dpg.get_viewport_height() - dir_list_top - 30
+        # 顯示預覽時列表讓出右側的寬度
+        list_width = width
+        if self.preview_shown:
+            list_width = int(width * (1 - preview_width_ratio))
+            self._layout_preview(list_width, width - list_width, height)
         dpg.set_item_height("dir_list_window", height)
-        dpg.set_item_width("dir_list_window", width)
-        dpg.set_item_height("dir_list_child_window", height)
-        dpg.set_item_width("dir_list_child_window", width)
-        self.refresh_dir_list()
+        dpg.set_item_width("dir_list_window", list_width)
+        dpg.set_item_width("dir_list_child_window", list_width)
+        self._set_dir_list_height()
+        # 視窗變高時擴充列元件池；寬度改變時選取框與大小欄需要重新設定位置
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        self.dir_list_highlight_index = [-2] * len(self.dir_list_ids)
+        self.render_dir_list_rows()
         dpg.set_item_width("path_viewer_window", width)
+        dpg.set_item_width("tab_bar_window", width)
         dpg.set_item_width("control_center_window", width)
         #
         pos_width = dpg.get_viewport_width()
@@ -447,6 +1587,213 @@ class FileManager:
             "config_window", [config_window_pos_width, config_window_pos_height]
         )
 
+    def create_overlay_window(self):
+        # 效能面板：F12 顯示 / 隱藏，顯示時開始記錄計時區段
+        self.overlay_shown = False
+        self._overlay_refresh_time = 0.0
+        with dpg.window(
+            label="效能",
+            tag="overlay_window",
+            pos=[dpg.get_viewport_width() - 420, 160],
+            width=400,
+            height=420,
+            show=False,
+            no_collapse=True,
+            on_close=self._toggle_overlay,
+        ):
+            dpg.add_text("", tag="overlay_frame_text")
+            dpg.add_text("", tag="overlay_spans_text")
+            dpg.add_button(label="匯出追蹤", callback=self._export_trace)
+        with dpg.handler_registry(tag="overlay_key_handler"):
+            dpg.add_key_press_handler(dpg.mvKey_F12, callback=self._toggle_overlay)
+
+    def _toggle_overlay(self):
+        self.overlay_shown = not self.overlay_shown
+        if self.overlay_shown:
+            tracer.set_enabled(True)
+            dpg.show_item("overlay_window")
+        else:
+            # 以 PFM_TRACE 啟動時持續記錄
+            tracer.set_enabled(os.environ.get("PFM_TRACE") == "1")
+            dpg.hide_item("overlay_window")
+
+    def _refresh_overlay(self) -> None:
+        now = time.monotonic()
+        if now - self._overlay_refresh_time < overlay_refresh_interval:
+            return None
+        self._overlay_refresh_time = now
+        average, worst = tracer.frame_stats()
+        dpg.set_value(
+            "overlay_frame_text",
+            f"幀時間：平均 {average:.1f} ms，最大 {worst:.1f} ms",
+        )
+        lines = [
+            f"{duration / 1e6:8.2f} ms  {name}"
+            for name, _, duration, _ in reversed(tracer.recent(overlay_span_count))
+        ]
+        dpg.set_value("overlay_spans_text", "\n".join(lines))
+        return None
+
+    def _export_trace(self):
+        trace_path = os.path.join(
+            cache_dir("traces"), time.strftime("pfm-trace-%Y%m%d-%H%M%S.json")
+        )
+        try:
+            count = tracer.export_chrome_trace(trace_path)
+        except OSError as e:
+            self.push_notification(f"無法匯出追蹤：{e}")
+            return
+        pfm_logger.info("已匯出追蹤：%s，%d 個事件", trace_path, count)
+        self.push_notification(f"已匯出追蹤：\n{trace_path}")
+
+    def create_preview_window(self):
+        # 選取檔案時在列表右側顯示內容，每次只繪製可視的行
+        self.preview_shown = False
+        # 目前第一行在檔案中的位移
+        self.preview_offset = 0
+        self._preview_status_time = 0.0
+        with dpg.window(
+            tag="preview_window",
+            pos=[0, dir_list_top],
+            no_move=True,
+            no_resize=True,
+            no_title_bar=True,
+            no_close=True,
+            no_scrollbar=True,
+            show=False,
+        ):
+            dpg.add_text("", tag="preview_status_text", pos=[5, 5])
+            dpg.add_input_int(
+                tag="preview_goto_input",
+                width=150,
+                step=0,
+                min_value=1,
+                min_clamped=True,
+                on_enter=True,
+                callback=self._preview_goto,
+            )
+            dpg.add_text("", tag="preview_text", pos=[5, 40])
+            # 垂直滑桿的最小值在下方，數值為 1 - 位置比例
+            dpg.add_slider_float(
+                tag="preview_scrollbar",
+                vertical=True,
+                min_value=0.0,
+                max_value=1.0,
+                default_value=1.0,
+                format="",
+                width=20,
+                callback=self._preview_seek,
+            )
+        with dpg.handler_registry(tag="preview_handler"):
+            dpg.add_mouse_wheel_handler(callback=self._preview_wheel)
+
+    def _layout_preview(self, x: int, width: int, height: int) -> None:
+        dpg.set_item_pos("preview_window", [x, dir_list_top])
+        dpg.set_item_width("preview_window", width)
+        dpg.set_item_height("preview_window", height)
+        dpg.set_item_pos("preview_goto_input", [width - 160, 5])
+        dpg.set_item_pos("preview_scrollbar", [width - 30, 40])
+        dpg.set_item_height("preview_scrollbar", max(50, height - 50))
+
+    def _toggle_preview(self):
+        self.preview_shown = not self.preview_shown
+        if self.preview_shown:
+            dpg.show_item("preview_window")
+            path = self.focused_path()
+            if path is not None and os.path.isfile(path):
+                self._show_preview(path)
+        else:
+            dpg.hide_item("preview_window")
+            self.close_preview()
+        self._apply_resize()
+
+    def _show_preview(self, full_path: str) -> None:
+        preview = self.open_preview(full_path)
+        if preview is None:
+            dpg.set_value("preview_status_text", "無法預覽")
+            dpg.set_value("preview_text", "")
+            return None
+        self.font_glyphs.add_text(os.path.basename(full_path))
+        self.preview_offset = preview.start_offset()
+        self._preview_status_time = 0.0
+        self._render_preview()
+        return None
+
+    def _preview_visible_lines(self) -> int:
+        height = dpg.get_item_height("preview_window") or 0
+        return max(1, (height - 50) // preview_line_height)
+
+    @traced("render.preview")
+    def _render_preview(self) -> None:
+        if self.preview is None:
+            return None
+        text = "\n".join(
+            self.preview.lines(self.preview_offset, self._preview_visible_lines())
+        )
+        self.font_glyphs.add_text(text)
+        dpg.set_value("preview_text", text)
+        dpg.set_value(
+            "preview_scrollbar", 1.0 - self.preview.fraction(self.preview_offset)
+        )
+        self._preview_status_time = 0.0
+        self._refresh_preview_status()
+        return None
+
+    def _refresh_preview_status(self) -> None:
+        # 行索引建立中時定期更新進度
+        preview = self.preview
+        if preview is None:
+            return None
+        now = time.monotonic()
+        if now - self._preview_status_time < preview_status_interval:
+            return None
+        self._preview_status_time = now
+        status = f"{os.path.basename(preview.path)}  {format_size(preview.size)}"
+        if not preview.encoding:
+            status += "  二進位"
+        else:
+            status += f"  {preview.encoding}"
+            line = preview.line_number(self.preview_offset)
+            if line is not None:
+                status += f"  第 {line + 1} 行"
+            lines = preview.line_count()
+            if lines is None:
+                status += f"  索引中 {preview.index_progress():.0%}"
+            else:
+                status += f" / 共 {lines} 行"
+        dpg.set_value("preview_status_text", status)
+        return None
+
+    def _preview_wheel(self, sender, app_data):
+        if self.preview is None or not dpg.is_item_hovered("preview_window"):
+            return None
+        delta = -int(app_data) * preview_wheel_lines
+        offset = self.preview.scroll(self.preview_offset, delta)
+        if offset != self.preview_offset:
+            self.preview_offset = offset
+            self._render_preview()
+        return None
+
+    def _preview_seek(self, sender, app_data):
+        # 拖曳捲軸依比例跳到檔案中的位置，不需要等行索引
+        if self.preview is None:
+            return None
+        self.preview_offset = self.preview.seek(1.0 - app_data)
+        self._render_preview()
+        return None
+
+    def _preview_goto(self, sender, app_data):
+        # 跳到指定行號，需要行索引已建立到該處
+        if self.preview is None or not self.preview.encoding:
+            return None
+        offset = self.preview.line_offset(app_data - 1)
+        if offset is None:
+            self.push_notification(f"第 {app_data} 行尚未索引或超過檔尾")
+            return None
+        self.preview_offset = offset
+        self._render_preview()
+        return None
+
     def create_notification_window(self):
         window_width = 300
         window_height = 150
@@ -475,6 +1822,7 @@ class FileManager:
         return None
 
     def push_notification(self, text: str):
+        self.font_glyphs.add_text(text)
         dpg.set_value("notification_text", text)
         self.show_notification_window()
 
@@ -495,9 +1843,33 @@ class FileManager:
             pos=[0, 105],
         ):
             dpg.add_text(
-                path,
+                self.path,
                 tag="path_viewer_window_path_text",
-                pos=[100, 5],
+                pos=[280, 5],
+            )
+            dpg.add_loading_indicator(
+                tag="path_viewer_loading_indicator",
+                pos=[240, 8],
+                radius=1.2,
+                show=False,
+            )
+            dpg.add_button(
+                label="上一頁",
+                width=70,
+                height=30,
+                callback=self._path_viewer_history_back,
+                enabled=False,
+                tag="path_viewer_history_back_button",
+                pos=[5, 8],
+            )
+            dpg.add_button(
+                label="下一頁",
+                width=70,
+                height=30,
+                callback=self._path_viewer_history_forward,
+                enabled=False,
+                tag="path_viewer_history_forward_button",
+                pos=[85, 8],
             )
             dpg.add_button(
                 label="上一層",
@@ -505,85 +1877,168 @@ class FileManager:
                 height=30,
                 callback=self._path_viewer_dirname,
                 tag="path_viewer_back_button",
+                pos=[165, 8],
             )
 
-    def _path_viewer_dirname(self):
-        global path
-        pfm_logger.info(f"返回上層資料夾，原路徑： 「 {path} 」")
-        disks = psutil.disk_partitions()
-        disks_list = []
-        for disk in disks:
-            disks_list.append(os.path.normpath(disk.mountpoint))
-        pfm_logger.debug(f"偵測到的儲存空間：「 {disks_list} 」")
-        if path in disks_list:
-            path = "/"
-        else:
-            path = os.path.dirname(path)
-        self.refresh_dir_list()
+    def change_path(self, new_path: str, record_history: bool = True) -> None:
+        if self.search_query:
+            self.search_query = ""
+            dpg.set_value("control_search_input", "")
+        super().change_path(new_path, record_history)
+        self.refresh_path_viewer()
+        self.refresh_tab_bar()
+
+    def create_tab_bar(self):
+        with dpg.window(
+            no_close=True,
+            no_move=True,
+            no_resize=True,
+            no_collapse=True,
+            no_scrollbar=True,
+            no_title_bar=True,
+            min_size=[10, 10],
+            max_size=[10000, 100],
+            height=tab_bar_height,
+            width=dpg.get_viewport_width(),
+            tag="tab_bar_window",
+            pos=[0, tab_bar_top],
+        ):
+            dpg.add_group(horizontal=True, tag="tab_bar_group")
+        self.refresh_tab_bar()
+
+    def refresh_tab_bar(self) -> None:
+        # 分頁數量很少，每次整列重建
+        dpg.delete_item("tab_bar_group", children_only=True)
+        for i, pane in enumerate(self.panes):
+            title = pane.title()
+            self.font_glyphs.add_text(title)
+            dpg.add_button(
+                label=f"● {title}" if pane is self.pane else title,
+                callback=self._tab_clicked,
+                user_data=i,
+                parent="tab_bar_group",
+            )
+        dpg.add_button(label="+", callback=self._tab_new, parent="tab_bar_group")
+        dpg.add_button(
+            label="關閉分頁",
+            callback=self._tab_close,
+            enabled=len(self.panes) > 1,
+            parent="tab_bar_group",
+        )
+
+    def _leave_search(self) -> None:
+        # 切換分頁前結束搜尋，目前分頁回到原本的資料夾
+        if self.search_query:
+            self.search_query = ""
+            dpg.set_value("control_search_input", "")
+            self.refresh_dir_list()
+
+    def _tab_clicked(self, sender, app_data, user_data):
+        self.switch_tab(user_data)
+
+    def _tab_new(self):
+        self.new_tab()
+
+    def _tab_close(self):
+        self.close_tab(self.panes.index(self.pane))
+
+    def new_tab(self, path: str | None = None):
+        self._leave_search()
+        self._pane_scroll[self.pane] = dpg.get_y_scroll("dir_list_window")
+        return super().new_tab(path)
+
+    def switch_tab(self, index: int) -> None:
+        self._leave_search()
+        self._pane_scroll[self.pane] = dpg.get_y_scroll("dir_list_window")
+        super().switch_tab(index)
+
+    def close_tab(self, index: int) -> None:
+        self._leave_search()
+        if 0 <= index < len(self.panes):
+            self._pane_scroll.pop(self.panes[index], None)
+        super().close_tab(index)
+
+    def _on_pane_changed(self) -> None:
+        # 列表元件改為顯示另一個分頁的列表，回到該分頁離開時的捲動位置
+        self.thumbnail_loader.cancel_pending()
+        self._hover_row = -1
+        dpg.set_value("control_filter_input", self.dir_view.filter_text)
+        self.refresh_sort_buttons()
         self.refresh_path_viewer()
+        self.refresh_tab_bar()
+        if self.dir_loader.loading:
+            dpg.show_item("path_viewer_loading_indicator")
+        else:
+            dpg.hide_item("path_viewer_loading_indicator")
+        self.dir_list_slot_index = [-2] * len(self.dir_list_ids)
+        self.dir_list_highlight_index = [-2] * len(self.dir_list_ids)
+        self._set_dir_list_height()
+        dpg.set_y_scroll("dir_list_window", self._pane_scroll.get(self.pane, 0.0))
+        self.render_dir_list_rows()
+
+    def _path_viewer_history_back(self):
+        self.history_back()
+
+    def _path_viewer_history_forward(self):
+        self.history_forward()
+
+    def _path_viewer_dirname(self):
+        self.go_up()
 
     def refresh_path_viewer(self):
-        global path
-        dpg.set_value("path_viewer_window_path_text", path)
-        if path == "/":
+        if self.search_query:
+            text = f"搜尋「{self.search_query}」：{len(self.dir_model)} 筆"
+            if not self.file_index.ready:
+                text += "（索引建立中）"
+        else:
+            text = self.path
+        self.font_glyphs.add_text(text)
+        dpg.set_value("path_viewer_window_path_text", text)
+        if self.path == "/":
             dpg.hide_item("path_viewer_back_button")
             dpg.disable_item("path_viewer_back_button")
         else:
             dpg.show_item("path_viewer_back_button")
             dpg.enable_item("path_viewer_back_button")
-
-    def copy(self, dir: str, to_dir: str):
-        if os.path.isdir(to_dir) is False:
-            msg = f"to_dir非資料夾，路徑：{to_dir}"
-            pfm_logger.error(msg)
-            raise RuntimeError(msg)
-        elif (os.path.exists(dir) is False) or (os.path.exists(to_dir) is False):
-            msg = "arg包含不存在的路徑"
-            pfm_logger.error(msg)
-            raise RuntimeError(msg)
-        #
-        wait_for_copy = []
-        if os.path.isfile(dir) is True:
-            wait_for_copy.append(dir)
-        elif os.path.isdir(dir) is True:
-            base_dir_path = dir
-            wait_for_copy = self._copy(path, ".", wait_for_copy)
-            dir_check_finish = False
-            while True:
-                for i in wait_for_copy:
-                    if os.path.isfile(i) is False:
-                        wait_for_copy = self._copy(base_dir_path, i, wait_for_copy)
-                        dir_check_finish = False
-                        break
-                    else:
-                        dir_check_finish = True
-                if dir_check_finish is True:
-                    break
-        for file in wait_for_copy:
-            print(file)
-            # shutil.copy2(file, to_dir)
-
-    def _copy(self, base_dir_path, dir, wait_for_copy):
-        dirs = os.listdir(path)
-        for dir in dirs:
-            dir_full_path = os.path.join(base_dir_path, dir)
-            wait_for_copy.append(dir_full_path)
-        return wait_for_copy
+        dpg.configure_item(
+            "path_viewer_history_back_button", enabled=bool(self.path_history_back)
+        )
+        dpg.configure_item(
+            "path_viewer_history_forward_button",
+            enabled=bool(self.path_history_forward),
+        )
 
 
 def launcher():
     dpg.create_context()
-    with dpg.font_registry():
-        with dpg.font(main_font_path, 30) as default_font:
-            dpg.add_font_range_hint(dpg.mvFontRangeHint_Chinese_Full)
-    dpg.bind_font(default_font)
     dpg.create_viewport(title="Positive File Manager")
     dpg.setup_dearpygui()
     dpg.show_viewport()
     dpg.maximize_viewport()
     window = FileManager()
     dpg.set_viewport_resize_callback(window.resize_window)
-    dpg.start_dearpygui()
+    window.update_frame()
+    dpg.render_dearpygui_frame()
+    # 啟動時間量測：PFM_STARTUP_BENCH=1 時第一幀後結束，由 benchmarks/test_startup.py 計時
+    first_frame_ms = (time.perf_counter() - pfm_start_time) * 1000
+    pfm_logger.info("第一幀耗時：%.1f ms", first_frame_ms)
+    if first_frame_ms > startup_target_ms:
+        pfm_logger.warning(
+            "第一幀耗時 %.1f ms，超過目標 %d ms", first_frame_ms, startup_target_ms
+        )
+    if os.environ.get("PFM_STARTUP_BENCH") == "1":
+        dpg.stop_dearpygui()
+    while dpg.is_dearpygui_running():
+        window.update_frame()
+        dpg.render_dearpygui_frame()
+    window.thumbnail_loader.shutdown()
+    window.file_types.shutdown()
+    window.folder_size_calculator.shutdown()
+    window.file_index.shutdown()
+    window.shutdown()
+    trace_file = os.environ.get("PFM_TRACE_FILE")
+    if tracer.enabled and trace_file:
+        tracer.export_chrome_trace(trace_file)
     dpg.destroy_context()
 
 
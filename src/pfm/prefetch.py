@@ -0,0 +1,154 @@
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from dir_model import DirectoryModel
+from instrument import traced
+from listing_cache import DirStamp, dir_stamp
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 預先讀取選取或滑鼠停留的子資料夾，之後開啟時直接使用列表快取，只需驗證 stamp。
+# 預讀是低優先的背景工作，不與前景讀取競爭：
+# - 前景正在讀取時不開始，讀取中途前景開始讀取則放棄，稍後重試
+# - 請求需要維持 prefetch_delay 秒才開始（滑鼠掃過的資料夾不讀取）
+# - 每秒最多讀取 prefetch_entry_rate 個項目，超過 prefetch_max_entries 的資料夾不預讀
+# - 執行緒的 CPU 優先權調低（Linux 可以個別設定執行緒的 nice 值）
+prefetch_delay = 0.15
+prefetch_entry_rate = 100_000
+prefetch_max_entries = 50_000
+# 等待中的請求數，只保留最新的
+prefetch_queue_limit = 4
+prefetch_nice = 10
+
+# (路徑, 列表, 列出前的 stamp)
+PrefetchResult = tuple[str, DirectoryModel, DirStamp]
+
+
+class Prefetcher:
+    def __init__(self, busy: Callable[[], bool]) -> None:
+        # busy 回傳前景是否正在讀取，在背景執行緒呼叫
+        self.busy = busy
+        self._cond = threading.Condition()
+        # (路徑, 請求時間)，最新的在最前面
+        self._requests: deque[tuple[str, float]] = deque()
+        self._done: queue.SimpleQueue = queue.SimpleQueue()
+        self._stopped = False
+        self._thread: threading.Thread | None = None
+        # 讀取預算：可以讀取的項目數，依時間補充
+        self._budget = float(prefetch_entry_rate)
+        self._budget_time = time.monotonic()
+        self.prefetched = 0
+        self.skipped = 0
+
+    def request(self, path: str) -> None:
+        with self._cond:
+            if self._stopped:
+                return None
+            for i, (queued, _) in enumerate(self._requests):
+                if queued == path:
+                    del self._requests[i]
+                    break
+            self._requests.appendleft((path, time.monotonic()))
+            while len(self._requests) > prefetch_queue_limit:
+                self._requests.pop()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker, name="pfm-prefetch", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+        return None
+
+    def discard(self, path: str) -> None:
+        # path 已由前景讀取，不需要預讀
+        with self._cond:
+            self._requests = deque(item for item in self._requests if item[0] != path)
+
+    def poll(self) -> list[PrefetchResult]:
+        # UI 執行緒取出讀取完成的列表，由呼叫端放入列表快取
+        results = []
+        while True:
+            try:
+                results.append(self._done.get_nowait())
+            except queue.Empty:
+                return results
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._requests.clear()
+            self._cond.notify()
+
+    def _next_request(self) -> str | None:
+        # 取出已等待 prefetch_delay 且前景閒置時的最新請求；停止時回傳 None
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                if not self._requests:
+                    self._cond.wait()
+                    continue
+                path, requested = self._requests[0]
+                wait = requested + prefetch_delay - time.monotonic()
+                if wait > 0 or self.busy():
+                    self._cond.wait(max(wait, prefetch_delay))
+                    continue
+                self._requests.popleft()
+                return path
+
+    def _worker(self) -> None:
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(
+                    os.PRIO_PROCESS, threading.get_native_id(), prefetch_nice
+                )
+            except (AttributeError, OSError):
+                pass
+        while True:
+            path = self._next_request()
+            if path is None:
+                return None
+            self._prefetch(path)
+
+    @traced("prefetch")
+    def _prefetch(self, path: str) -> None:
+        try:
+            stamp = dir_stamp(path)
+            model = DirectoryModel(path)
+            for batch in DirectoryModel.scan_batches(path):
+                model.extend(batch)
+                if len(model) > prefetch_max_entries:
+                    pfm_logger.debug("資料夾過大，不預讀：「 %s 」", path)
+                    self.skipped += 1
+                    return None
+                if self.busy() or self._stopped:
+                    # 前景開始讀取，放棄這次預讀，稍後重試
+                    with self._cond:
+                        if not self._stopped:
+                            self._requests.append((path, time.monotonic()))
+                    return None
+                self._spend(len(batch))
+        except OSError as e:
+            pfm_logger.debug("無法預讀：「 %s 」，%s", path, e)
+            return None
+        self.prefetched += 1
+        self._done.put((path, model, stamp))
+        return None
+
+    def _spend(self, entries: int) -> None:
+        # 超過每秒的讀取預算時等待補充
+        now = time.monotonic()
+        self._budget = min(
+            prefetch_entry_rate,
+            self._budget + (now - self._budget_time) * prefetch_entry_rate,
+        )
+        self._budget_time = now
+        self._budget -= entries
+        if self._budget < 0:
+            time.sleep(-self._budget / prefetch_entry_rate)
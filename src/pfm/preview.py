@@ -0,0 +1,308 @@
+import codecs
+import logging
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+from instrument import traced
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 檔案預覽：只讀取畫面上的範圍，開啟任何大小的檔案都是常數時間。
+# 以 os.pread 讀取而不 mmap：檔案被其他行程截短時（例如 copytruncate 的日誌輪替），
+# 讀取 mmap 超出檔尾的部分會讓整個行程收到 SIGBUS；pread 只會讀到較短的內容。
+# 沒有 pread 的 Windows 才使用 mmap，已被對應的檔案在 Windows 上無法截短。
+# 捲動位置以位元組位移表示（文字為某一行的開頭，十六進位為某一列的開頭），不需要等行索引；
+# 行索引在背景建立，每 index_block_size 位元組只記錄一個累計行數，
+# 20 GB 的檔案約 160 KB，並在讀過後釋放分頁，記憶體用量與檔案大小無關。
+
+# 判斷編碼與文字 / 二進位時讀取的開頭長度
+sample_size = 64 * 1024
+index_block_size = 1024 * 1024
+# 單行最多顯示的位元組數，超過的部分換到下一行，沒有換行的巨大檔案也不會一次讀入
+max_line_bytes = 4096
+hex_row_width = 16
+
+# 沒有 BOM 時依序嘗試的文字編碼，使用第一個能解碼開頭的
+text_encodings = ("utf-8", "big5", "gb18030")
+
+PREVIEW_TEXT = "text"
+PREVIEW_HEX = "hex"
+
+_boms = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# 文字檔中常見的控制字元：\b \t \n \f \r ESC
+_text_controls = {8, 9, 10, 12, 13, 27}
+_control_table = bytes(
+    1 if value < 32 and value not in _text_controls else 0 for value in range(256)
+)
+_printable_table = bytes(
+    value if 32 <= value < 127 else ord(".") for value in range(256)
+)
+
+
+def detect_encoding(sample: bytes) -> tuple[str | None, int]:
+    # 回傳 (編碼, BOM 長度)；二進位檔的編碼為 None
+    for bom, encoding in _boms:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    if b"\0" in sample:
+        return None, 0
+    # 控制字元超過 1% 視為二進位
+    if sample.translate(_control_table).count(1) * 100 > len(sample):
+        return None, 0
+    for encoding in text_encodings:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            # final=False：取樣在多位元組字元中間截斷時不算錯誤
+            decoder.decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding, 0
+    return "latin-1", 0
+
+
+class FilePreview:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm: mmap.mmap | None = None
+        if self.size > 0 and not hasattr(os, "pread"):
+            # 長度為 0 的檔案無法 mmap
+            try:
+                self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self._file.close()
+                raise
+        encoding, self.bom_size = detect_encoding(self._read(0, sample_size))
+        self.encoding = encoding or ""
+        self.mode = PREVIEW_HEX if encoding is None else PREVIEW_TEXT
+        # UTF-16 / UTF-32 的換行為多位元組，只在字元邊界上的才算
+        self._newline = "\n".encode(encoding) if encoding else b"\n"
+        self._unit = len(self._newline)
+        # 第 i 個元素為前 (i + 1) 個區塊中的換行數
+        self._block_lines = array("Q")
+        self._cancel_event = threading.Event()
+        self._index_thread: threading.Thread | None = None
+
+    def _read(self, start: int, end: int) -> bytes:
+        # 檔案在開啟後被截短時回傳的內容比要求的短
+        if end <= start:
+            return b""
+        if self._mm is not None:
+            return self._mm[start:end]
+        if self._file.closed:
+            return b""
+        return os.pread(self._file.fileno(), end - start, start)
+
+    def close(self) -> None:
+        self._cancel_event.set()
+        if self._index_thread is not None:
+            self._index_thread.join()
+            self._index_thread = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    # ---- 行索引 ----
+
+    def start_index(self) -> None:
+        if self.mode != PREVIEW_TEXT or self._index_thread is not None:
+            return None
+        self._index_thread = threading.Thread(
+            target=self._index_worker, name="pfm-preview-index", daemon=True
+        )
+        self._index_thread.start()
+        return None
+
+    @traced("preview.index")
+    def _index_worker(self) -> None:
+        # 區塊大小為換行長度的倍數，邊界上的換行不會被切開
+        mm = self._mm
+        can_release = (
+            mm is not None and hasattr(mm, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+        )
+        total = 0
+        for start in range(0, self.size, index_block_size):
+            if self._cancel_event.is_set():
+                return None
+            end = min(start + index_block_size, self.size)
+            total += self._read(start, end).count(self._newline)
+            # array.append 為原子操作，UI 執行緒可同時讀取已完成的部分
+            self._block_lines.append(total)
+            if can_release:
+                # 檔案對應的分頁不會寫回，直接釋放以維持常數記憶體
+                mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+        pfm_logger.debug("預覽行索引完成：「 %s 」，%d 行", self.path, total)
+        return None
+
+    def index_progress(self) -> float:
+        if self.mode != PREVIEW_TEXT or self.size == 0:
+            return 1.0
+        return min(1.0, len(self._block_lines) * index_block_size / self.size)
+
+    def line_count(self) -> int | None:
+        # 索引完成前為 None；最後一行沒有換行也算一行
+        if self.index_progress() < 1.0:
+            return None
+        if self.size <= self.bom_size:
+            return 0
+        lines = self._block_lines[-1] if self._block_lines else 0
+        if self._read(self.size - self._unit, self.size) != self._newline:
+            lines += 1
+        return lines
+
+    def line_number(self, offset: int) -> int | None:
+        # offset 所在的行號（從 0 開始）；該處尚未索引時為 None
+        block = offset // index_block_size
+        if block > len(self._block_lines):
+            return None
+        before = self._block_lines[block - 1] if block else 0
+        return before + self._read(block * index_block_size, offset).count(
+            self._newline
+        )
+
+    def line_offset(self, line: int) -> int | None:
+        # 第 line 行（從 0 開始）的位移；尚未索引到或超過檔尾時為 None
+        if line <= 0:
+            return self.bom_size
+        block = bisect_left(self._block_lines, line)
+        if block >= len(self._block_lines):
+            return None
+        remaining = line - (self._block_lines[block - 1] if block else 0)
+        start = block * index_block_size
+        end = min(start + index_block_size, self.size)
+        # 以計數二分縮小範圍，最後在小範圍內逐一尋找
+        while end - start > 4096:
+            middle = start + (end - start) // 2 // self._unit * self._unit
+            count = self._read(start, middle).count(self._newline)
+            if count >= remaining:
+                end = middle
+            else:
+                remaining -= count
+                start = middle
+        position = start - self._unit
+        for _ in range(remaining):
+            position = self._find_newline(position + self._unit, end)
+        return position + self._unit
+
+    # ---- 文字 ----
+
+    def _find_newline(self, start: int, end: int) -> int:
+        # 範圍最多 max_line_bytes，一次讀入後在記憶體中搜尋
+        data = self._read(start, end)
+        position = data.find(self._newline)
+        while position != -1 and (start + position - self.bom_size) % self._unit:
+            position = data.find(self._newline, position + 1)
+        return position if position == -1 else start + position
+
+    def _rfind_newline(self, start: int, end: int) -> int:
+        data = self._read(start, end)
+        position = data.rfind(self._newline)
+        while position != -1 and (start + position - self.bom_size) % self._unit:
+            position = data.rfind(self._newline, 0, position + self._unit - 1)
+        return position if position == -1 else start + position
+
+    def _align(self, offset: int) -> int:
+        offset = max(self.bom_size, min(offset, self.size))
+        return offset - (offset - self.bom_size) % self._unit
+
+    def _next_line(self, offset: int) -> int:
+        # 下一行的開頭；過長的行每 max_line_bytes 切成一行
+        end = min(offset + max_line_bytes, self.size)
+        position = self._find_newline(offset, end)
+        if position == -1:
+            return self._align(end) if end < self.size else self.size
+        return position + self._unit
+
+    def _previous_line(self, offset: int) -> int:
+        if offset <= self.bom_size:
+            return self.bom_size
+        low = max(self.bom_size, offset - self._unit - max_line_bytes)
+        position = self._rfind_newline(low, offset - self._unit)
+        if position == -1:
+            return self._align(low)
+        return position + self._unit
+
+    def _line_start(self, offset: int) -> int:
+        # 包含 offset 的行的開頭
+        offset = self._align(offset)
+        low = max(self.bom_size, offset - max_line_bytes)
+        position = self._rfind_newline(low, offset)
+        if position == -1:
+            return self._align(low)
+        return position + self._unit
+
+    def _text_lines(self, offset: int, count: int) -> list[str]:
+        lines = []
+        while len(lines) < count and offset < self.size:
+            end = self._next_line(offset)
+            data = self._read(offset, end)
+            if not data:
+                # 開啟後被截短，之後已沒有內容
+                break
+            if data.endswith(self._newline):
+                data = data[: -self._unit]
+            text = data.decode(self.encoding, errors="replace")
+            lines.append(text.rstrip("\r").expandtabs(4))
+            offset = end
+        return lines
+
+    # ---- 十六進位 ----
+
+    def _hex_lines(self, offset: int, count: int) -> list[str]:
+        data = self._read(offset, offset + count * hex_row_width)
+        lines = []
+        for start in range(0, len(data), hex_row_width):
+            row = data[start : start + hex_row_width]
+            lines.append(
+                f"{offset + start:010x}  {row.hex(' '):<{hex_row_width * 3 - 1}}  "
+                f"{row.translate(_printable_table).decode('ascii')}"
+            )
+        return lines
+
+    # ---- 捲動 ----
+
+    def scroll(self, offset: int, delta: int) -> int:
+        # 由 offset 往下 (delta > 0) 或往上捲動 delta 行，回傳新的位移
+        if self.mode == PREVIEW_HEX:
+            last_row = max(0, (self.size - 1) // hex_row_width * hex_row_width)
+            return max(0, min(offset + delta * hex_row_width, last_row))
+        for _ in range(delta):
+            following = self._next_line(offset)
+            if following >= self.size:
+                break
+            offset = following
+        for _ in range(-delta):
+            offset = self._previous_line(offset)
+        return offset
+
+    def seek(self, fraction: float) -> int:
+        # 拖曳捲軸：依比例跳到對應的位置，不需要行索引
+        target = int(self.size * max(0.0, min(fraction, 1.0)))
+        if self.mode == PREVIEW_HEX:
+            return self.scroll(target // hex_row_width * hex_row_width, 0)
+        return self._line_start(min(target, max(self.bom_size, self.size - 1)))
+
+    def fraction(self, offset: int) -> float:
+        if self.size == 0:
+            return 0.0
+        return offset / self.size
+
+    def lines(self, offset: int, count: int) -> list[str]:
+        # 只讀取並解碼可視範圍
+        if self.mode == PREVIEW_HEX:
+            return self._hex_lines(offset, count)
+        return self._text_lines(max(offset, self.bom_size), count)
+
+    def start_offset(self) -> int:
+        return self.bom_size if self.mode == PREVIEW_TEXT else 0
@@ -0,0 +1,91 @@
+from bisect import bisect_left
+
+
+def _moved_row(
+    row: int | None, removed: list[int], inserted: list[int], keep: bool
+) -> int | None:
+    if row is None:
+        return None
+    before = bisect_left(removed, row)
+    if not keep and before < len(removed) and removed[before] == row:
+        return None
+    row -= before
+    for position in inserted:
+        if position > row:
+            break
+        row += 1
+    return row
+
+
+# 以 bytearray 作為點陣圖的多選模型，以 DirectoryModel index 為位置，每項 1 byte；
+# 項目增刪或顯示順序改變時選取不會錯位。anchor / focus 則記錄列號。
+class Selection:
+    __slots__ = ("_bits", "anchor", "focus")
+
+    def __init__(self) -> None:
+        self._bits = bytearray()
+        # anchor：shift 範圍選取的起點列；focus：最後點擊的列
+        self.anchor: int | None = None
+        self.focus: int | None = None
+
+    def __len__(self) -> int:
+        return self._bits.count(1)
+
+    def __contains__(self, index: int) -> bool:
+        return 0 <= index < len(self._bits) and self._bits[index] == 1
+
+    def _ensure(self, size: int) -> None:
+        if len(self._bits) < size:
+            self._bits.extend(bytes(size - len(self._bits)))
+
+    def clear(self) -> None:
+        self._bits = bytearray()
+        self.anchor = None
+        self.focus = None
+
+    def select_only(self, row: int, index: int) -> None:
+        self._bits = bytearray(index + 1)
+        self._bits[index] = 1
+        self.anchor = row
+        self.focus = row
+
+    def toggle(self, row: int, index: int) -> None:
+        self._ensure(index + 1)
+        self._bits[index] ^= 1
+        self.anchor = row
+        self.focus = row
+
+    def discard(self, index: int) -> None:
+        if index < len(self._bits):
+            self._bits[index] = 0
+
+    def rows_changed(self, removed: list[int], inserted: list[int]) -> None:
+        # 一批列的增刪：removed 為移除的舊列號，inserted 為插入後的新列號（皆遞增）。
+        # 移除的列之後的列往前移，插入的列與之後的列往後移；focus 所在的列被移除時清除
+        self.anchor = _moved_row(self.anchor, removed, inserted, True)
+        self.focus = _moved_row(self.focus, removed, inserted, False)
+
+    def select_range(self, row: int, view, additive: bool = False) -> None:
+        # 從 anchor 選到 row；additive 為 True 時保留原本的選取 (ctrl + shift)
+        if self.anchor is None or self.anchor >= len(view):
+            self.select_only(row, view.index_at(row))
+            return None
+        start, end = sorted((self.anchor, row))
+        if not additive:
+            self._bits = bytearray(len(view.model))
+        self._ensure(len(view.model))
+        bits = self._bits
+        for index in view.order[start : end + 1]:
+            bits[index] = 1
+        self.focus = row
+        return None
+
+    def is_single(self, row: int, index: int) -> bool:
+        return self.focus == row and len(self) == 1 and index in self
+
+    def indices(self):
+        find = self._bits.find
+        index = find(1)
+        while index != -1:
+            yield index
+            index = find(1, index + 1)
@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import queue
+from array import array
+from concurrent.futures import Future
+
+from app_dirs import cache_dir, prune_cache_dir_later
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 磁碟上縮圖快取的上限，每次執行第一次產生縮圖時在背景整理
+thumbnail_cache_max_bytes = 512 * 1024 * 1024
+thumbnail_cache_max_age = 90 * 24 * 3600
+
+thumbnail_extensions = {
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".gif",
+    ".bmp",
+    ".webp",
+    ".tif",
+    ".tiff",
+}
+
+
+def is_image(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in thumbnail_extensions
+
+
+def render_thumbnail(path: str, size: int, cache_root: str) -> bytes | None:
+    # 在子行程執行：回傳 size x size 的 RGBA float32 資料，可直接交給 DPG 材質
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = hashlib.sha1(
+        f"{path}\0{st.st_size}\0{st.st_mtime_ns}\0{size}".encode(
+            "utf-8", "surrogateescape"
+        )
+    ).hexdigest()
+    cache_path = os.path.join(cache_root, key[:2], key + ".rgba")
+    raw = None
+    try:
+        with open(cache_path, "rb") as f:
+            raw = f.read()
+        if len(raw) != size * size * 4:
+            raw = None
+    except OSError:
+        pass
+    if raw is None:
+        from PIL import Image
+
+        try:
+            with Image.open(path) as im:
+                # JPEG 可以在解碼時直接縮小，省去大部分解碼時間
+                im.draft("RGB", (size, size))
+                im.thumbnail((size, size))
+                im = im.convert("RGBA")
+                canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+                canvas.paste(im, ((size - im.width) // 2, (size - im.height) // 2))
+                raw = canvas.tobytes()
+        except Exception:
+            return None
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    scale = 1 / 255
+    return array("f", [b * scale for b in raw]).tobytes()
+
+
+# 縮圖在行程池中解碼，結果放入佇列由 UI 執行緒每幀取出。
+# 以路徑為 key；磁碟快取的 key 另外包含檔案大小與 mtime。
+class ThumbnailLoader:
+    def __init__(self, size: int = 48, max_workers: int | None = None) -> None:
+        self.size = size
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._executor: "ProcessPoolExecutor | None" = None
+        self._pending: dict[str, Future] = {}
+        self._done: queue.SimpleQueue = queue.SimpleQueue()
+        self._cache_root: str | None = None
+
+    def request(self, path: str) -> None:
+        if path in self._pending:
+            return None
+        if self._executor is None:
+            # 行程池與 multiprocessing 在第一次需要縮圖時才匯入，不拖慢啟動；
+            # spawn：避免在已有多個執行緒的行程中 fork
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            self._cache_root = cache_dir("thumbnails")
+            prune_cache_dir_later(
+                self._cache_root, thumbnail_cache_max_bytes, thumbnail_cache_max_age
+            )
+        future = self._executor.submit(
+            render_thumbnail, path, self.size, self._cache_root
+        )
+        self._pending[path] = future
+        future.add_done_callback(lambda f, path=path: self._done.put((path, f)))
+        return None
+
+    def retain(self, paths: set[str]) -> None:
+        # 取消已經離開可視範圍、尚未開始的工作
+        for path in [p for p in self._pending if p not in paths]:
+            if self._pending[path].cancel():
+                del self._pending[path]
+
+    def cancel_pending(self) -> None:
+        self.retain(set())
+
+    def poll(self, max_items: int = 32) -> list[tuple[str, bytes | None]]:
+        results = []
+        while len(results) < max_items:
+            try:
+                path, future = self._done.get_nowait()
+            except queue.Empty:
+                break
+            if self._pending.get(path) is future:
+                del self._pending[path]
+            if future.cancelled():
+                continue
+            try:
+                results.append((path, future.result()))
+            except Exception as e:
+                pfm_logger.debug("縮圖失敗：「 %s 」，%s", path, e)
+                results.append((path, None))
+        return results
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
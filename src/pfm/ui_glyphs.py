@@ -0,0 +1,14 @@
+# 介面字串用到的非 ASCII 字元，啟動時直接放入字型圖集，不需要在執行時讀取原始碼。
+# 由各模組的字串常數產生（不含註解）；新增介面字串後執行 benchmarks/test_startup.py，
+# 缺少的字元會列在失敗訊息中，加到這裡即可。
+ui_glyphs = (
+    "…▲▼●。「」一上下不中主事二仍代以件位作使保修個值停側傳儲元"
+    "充先入內全共出分列刪到前剩剪動包匯區原取只可右同名含命員唯啟回"
+    "圖在均型執塊增壓外大失夾套始字存安完定容寫寬將尋對小少尚尾層工"
+    "左差己已幀平底度建引待後徑快憶應成或才批找掃掛描援搜擇擊擴支改"
+    "效敗整數料新是時暫更最有未束框案標檔欄次止此步殊每比池沒法消清"
+    "湊為無特理用由留略異的監目相省看知硬確碼示秒移稱窗立符第筆等算"
+    "節篩系索組結統縮繼續置耗能自至致與色號行表裝製複要視覽解計記設"
+    "詢誤請讀變貼資超路蹤軸較載輪返追通連進過選遺部重量錯長閉開間關"
+    "除隔集雜需非頁項預頭顏類顯餘體高點（），：？［］"
+)
@@ -0,0 +1,579 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import BinaryIO, Iterator
+
+from app_dirs import cache_dir, prune_cache_dir_later
+from copy_engine import CopyCancelledError, CopyProgress, unique_destination
+from dir_model import DirectoryModel, KIND_DIR, KIND_FILE, KIND_OTHER
+from instrument import traced
+from listing_cache import DirStamp, dir_stamp
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 檔案系統抽象：本機磁碟 (LocalFS) 與壓縮檔 (ArchiveFS) 提供相同的列出、stamp 與讀取介面，
+# 列表讀取、快取與檔案工作不需要知道路徑在哪一種檔案系統上。
+# 壓縮檔內的路徑為「壓縮檔路徑/成員路徑」，例如 /data/logs.tar.gz/2024/app.log。
+# zip 只讀取中央目錄；tar 沒有目錄，第一次開啟時串流讀過一次建立成員索引並存到快取資料夾，
+# 之後依壓縮檔的 (mtime, inode) 直接載入。
+# zipfile / tarfile 與解壓縮模組在第一次開啟壓縮檔時才匯入，不拖慢啟動。
+
+ARCHIVE_ZIP = "zip"
+ARCHIVE_TAR = "tar"
+
+archive_suffixes = (
+    (".zip", ARCHIVE_ZIP),
+    (".jar", ARCHIVE_ZIP),
+    (".tar", ARCHIVE_TAR),
+    (".tar.gz", ARCHIVE_TAR),
+    (".tgz", ARCHIVE_TAR),
+    (".tar.bz2", ARCHIVE_TAR),
+    (".tbz2", ARCHIVE_TAR),
+    (".tar.xz", ARCHIVE_TAR),
+    (".txz", ARCHIVE_TAR),
+    (".tar.zst", ARCHIVE_TAR),
+    (".tzst", ARCHIVE_TAR),
+)
+# 同時保持開啟的壓縮檔數量
+archive_open_limit = 8
+# 解壓縮時每次讀寫的大小，也是進度回報與取消檢查的間隔
+extract_chunk_size = 1024 * 1024
+archive_index_magic = b"PFMTAR1\n"
+# 磁碟上 tar 索引快取的上限，每次執行第一次建立索引時在背景整理
+archive_index_cache_max_bytes = 256 * 1024 * 1024
+archive_index_cache_max_age = 90 * 24 * 3600
+
+_section = struct.Struct("<Q")
+
+
+def archive_format(name: str) -> str | None:
+    lower = name.lower()
+    for suffix, archive_type in archive_suffixes:
+        if lower.endswith(suffix):
+            return archive_type
+    return None
+
+
+def _clean_member_name(name: str) -> str | None:
+    # 成員路徑統一為不含開頭 / 與 ./ 的相對路徑；含 .. 的成員不列出也不解壓縮
+    parts = [
+        part for part in name.replace("\\", "/").split("/") if part not in ("", ".")
+    ]
+    if not parts or ".." in parts:
+        return None
+    return "/".join(parts)
+
+
+def _open_decompressed(path: str) -> BinaryIO:
+    # 依魔術位元組選擇解壓縮串流；回傳的串流都支援向前 seek
+    with open(path, "rb") as f:
+        magic = f.read(6)
+    if magic.startswith(b"\x1f\x8b"):
+        import gzip
+
+        return gzip.open(path, "rb")
+    if magic.startswith(b"BZh"):
+        import bz2
+
+        return bz2.open(path, "rb")
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        import lzma
+
+        return lzma.open(path, "rb")
+    if magic.startswith(b"\x28\xb5\x2f\xfd"):
+        try:
+            from compression import zstd
+
+            return zstd.open(path, "rb")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise OSError("需要安裝 zstandard 套件才能讀取 zstd 壓縮檔") from None
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    return open(path, "rb")
+
+
+class LocalFS:
+    local = True
+
+    def scan_batches(self, path: str) -> Iterator[DirectoryModel]:
+        return DirectoryModel.scan_batches(path)
+
+    def stamp(self, path: str) -> DirStamp:
+        return dir_stamp(path)
+
+    def open(self, path: str) -> BinaryIO:
+        return open(path, "rb")
+
+
+# 壓縮檔成員的欄位陣列；locator 在 zip 為 infolist 的位置，在 tar 為資料在解壓縮串流中的位移
+class ArchiveIndex:
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.kinds = bytearray()
+        self.sizes = array("q")
+        self.mtimes = array("q")
+        self.locators = array("q")
+        # 成員路徑 -> index；資料夾路徑 -> 子項目 index（根目錄為 ""）
+        self.lookup: dict[str, int] = {}
+        self.children: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, kind: int, size: int, mtime: int, locator: int) -> None:
+        self.names.append(name)
+        self.kinds.append(kind)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.locators.append(locator)
+
+    def finish(self) -> None:
+        # 建立查詢表與子項目表，補上沒有獨立成員的中間資料夾；同名成員以後出現的為準
+        self.lookup = {}
+        for index, name in enumerate(self.names):
+            self.lookup[name] = index
+        for index in range(len(self.names)):
+            parent = self.names[index].rpartition("/")[0]
+            while parent and parent not in self.lookup:
+                self.lookup[parent] = len(self.names)
+                self.add(parent, KIND_DIR, 0, 0, -1)
+                parent = parent.rpartition("/")[0]
+        self.children = {"": []}
+        for name, index in self.lookup.items():
+            if self.kinds[index] == KIND_DIR:
+                self.children.setdefault(name, [])
+        for name, index in self.lookup.items():
+            self.children.setdefault(name.rpartition("/")[0], []).append(index)
+
+    def descendants(self, name: str) -> Iterator[int]:
+        stack = [name]
+        while stack:
+            for index in self.children.get(stack.pop(), ()):
+                yield index
+                if self.kinds[index] == KIND_DIR:
+                    stack.append(self.names[index])
+
+    def to_bytes(self) -> bytes:
+        sections = [
+            "\0".join(self.names).encode("utf-8", "surrogateescape"),
+            bytes(self.kinds),
+            self.sizes.tobytes(),
+            self.mtimes.tobytes(),
+            self.locators.tobytes(),
+        ]
+        out = [archive_index_magic]
+        for section in sections:
+            out.append(_section.pack(len(section)))
+            out.append(section)
+        return b"".join(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ArchiveIndex":
+        if not data.startswith(archive_index_magic):
+            raise ValueError("不是壓縮檔索引")
+        sections = []
+        pos = len(archive_index_magic)
+        for _ in range(5):
+            (length,) = _section.unpack_from(data, pos)
+            pos += _section.size
+            sections.append(data[pos : pos + length])
+            pos += length
+        index = cls()
+        names = sections[0].decode("utf-8", "surrogateescape")
+        index.names = names.split("\0") if names else []
+        index.kinds = bytearray(sections[1])
+        for column, section in zip(
+            (index.sizes, index.mtimes, index.locators), sections[2:]
+        ):
+            column.frombytes(section)
+        if not (
+            len(index.names)
+            == len(index.kinds)
+            == len(index.sizes)
+            == len(index.mtimes)
+            == len(index.locators)
+        ):
+            raise ValueError("壓縮檔索引欄位長度不一致")
+        index.finish()
+        return index
+
+
+class ArchiveFS:
+    local = False
+
+    def __init__(self, archive_path: str, cache_root: str | None = None) -> None:
+        self.archive_path = archive_path
+        self.archive_type = archive_format(archive_path)
+        self._cache_root = cache_root
+        self._lock = threading.Lock()
+        self._index: ArchiveIndex | None = None
+        self._index_stamp: DirStamp | None = None
+        self._zip: "zipfile.ZipFile | None" = None
+
+    def inner(self, path: str) -> str:
+        # 虛擬路徑 -> 成員路徑（根目錄為 ""）
+        if path == self.archive_path:
+            return ""
+        return path[len(self.archive_path) + 1 :].replace(os.sep, "/")
+
+    def stamp(self, path: str) -> DirStamp:
+        # 壓縮檔內的資料夾不會單獨改變，以壓縮檔本身判斷快取是否有效
+        return dir_stamp(self.archive_path)
+
+    def index(self) -> ArchiveIndex:
+        # 在背景執行緒呼叫；壓縮檔改變後重新建立
+        stamp = dir_stamp(self.archive_path)
+        with self._lock:
+            if self._index is None or self._index_stamp != stamp:
+                self._close()
+                started = time.monotonic()
+                if self.archive_type == ARCHIVE_ZIP:
+                    self._index = self._index_zip()
+                else:
+                    self._index = self._load_tar_index(stamp)
+                self._index_stamp = stamp
+                pfm_logger.info(
+                    "壓縮檔索引：「 %s 」 %d 個成員，%.2f 秒",
+                    self.archive_path,
+                    len(self._index),
+                    time.monotonic() - started,
+                )
+            return self._index
+
+    def close(self) -> None:
+        # 關閉 zip 並丟棄索引，之後的 index() / open() 重新開啟；
+        # 已開啟的 zip 成員在 ZipFile 關閉後仍可讀完
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self._index = None
+        self._index_stamp = None
+
+    def _open_zip_member(self, locator: int) -> BinaryIO:
+        # _zip 可能已被 VirtualFileSystem 關閉，或正由 index() 替換，只在 _lock 中使用
+        import zipfile
+
+        with self._lock:
+            if self._zip is None:
+                try:
+                    self._zip = zipfile.ZipFile(self.archive_path)
+                except zipfile.BadZipFile as e:
+                    raise OSError(f"無法讀取 zip：{e}") from None
+            return self._zip.open(self._zip.infolist()[locator])
+
+    @traced("archive.index_zip")
+    def _index_zip(self) -> ArchiveIndex:
+        # 只讀取中央目錄，不解壓縮任何成員
+        import zipfile
+
+        try:
+            self._zip = zipfile.ZipFile(self.archive_path)
+        except zipfile.BadZipFile as e:
+            raise OSError(f"無法讀取 zip：{e}") from None
+        index = ArchiveIndex()
+        # 同一個壓縮檔中的成員時間大多相同，mktime 需要查時區，結果重複使用
+        mtimes: dict[tuple, int] = {}
+        for locator, info in enumerate(self._zip.infolist()):
+            name = _clean_member_name(info.filename)
+            if name is None:
+                continue
+            mtime = mtimes.get(info.date_time)
+            if mtime is None:
+                try:
+                    mtime = int(time.mktime(info.date_time + (0, 0, -1)) * 1e9)
+                except (OverflowError, ValueError):
+                    mtime = 0
+                mtimes[info.date_time] = mtime
+            if info.is_dir():
+                index.add(name, KIND_DIR, 0, mtime, locator)
+            else:
+                index.add(name, KIND_FILE, info.file_size, mtime, locator)
+        index.finish()
+        return index
+
+    def _tar_index_path(self, stamp: DirStamp) -> str:
+        st = os.stat(self.archive_path)
+        key = hashlib.sha1(
+            f"{self.archive_path}\0{st.st_size}\0{stamp[0]}\0{stamp[1]}".encode(
+                "utf-8", "surrogateescape"
+            )
+        ).hexdigest()
+        return os.path.join(self._cache_root or cache_dir("archives"), key + ".idx")
+
+    def _load_tar_index(self, stamp: DirStamp) -> ArchiveIndex:
+        index_path = self._tar_index_path(stamp)
+        try:
+            with open(index_path, "rb") as f:
+                return ArchiveIndex.from_bytes(f.read())
+        except (OSError, ValueError, struct.error):
+            pass
+        index = self._index_tar()
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(index.to_bytes())
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            pfm_logger.warning("無法儲存壓縮檔索引：%s", e)
+        prune_cache_dir_later(
+            os.path.dirname(index_path),
+            archive_index_cache_max_bytes,
+            archive_index_cache_max_age,
+        )
+        return index
+
+    @traced("archive.index_tar")
+    def _index_tar(self) -> ArchiveIndex:
+        # 串流讀過整個 tar 一次，只記錄標頭，資料區塊直接略過
+        import tarfile
+
+        index = ArchiveIndex()
+        with _open_decompressed(self.archive_path) as stream:
+            try:
+                with tarfile.open(fileobj=stream, mode="r|") as tar:
+                    for info in tar:
+                        # 串流模式下 tarfile 會保留所有 TarInfo，逐一清除以維持常數記憶體
+                        tar.members = []
+                        name = _clean_member_name(info.name)
+                        if name is None:
+                            continue
+                        mtime = int(info.mtime * 1e9)
+                        if info.isdir():
+                            index.add(name, KIND_DIR, 0, mtime, -1)
+                        elif info.isreg():
+                            index.add(
+                                name, KIND_FILE, info.size, mtime, info.offset_data
+                            )
+                        else:
+                            index.add(name, KIND_OTHER, 0, mtime, -1)
+            except tarfile.TarError as e:
+                raise OSError(f"無法讀取 tar：{e}") from None
+        index.finish()
+        return index
+
+    # ---- 列出與讀取 ----
+
+    def scan_batches(
+        self, path: str, batch_size: int = 2000
+    ) -> Iterator[DirectoryModel]:
+        index = self.index()
+        inner = self.inner(path)
+        children = index.children.get(inner)
+        if children is None:
+            raise NotADirectoryError(f"壓縮檔中沒有此資料夾：{path}")
+        batch = DirectoryModel(path)
+        for member in children:
+            batch.append(
+                index.names[member].rpartition("/")[2],
+                index.kinds[member],
+                index.sizes[member],
+                index.mtimes[member],
+            )
+            if len(batch) >= batch_size:
+                yield batch
+                batch = DirectoryModel(path, batch.name_offset_end())
+        yield batch
+
+    def _member(self, path: str) -> int:
+        index = self.index()
+        member = index.lookup.get(self.inner(path))
+        if member is None:
+            raise FileNotFoundError(f"壓縮檔中沒有此項目：{path}")
+        return member
+
+    def open(self, path: str) -> BinaryIO:
+        # 只解壓縮這個成員；壓縮的 tar 需要從頭解壓縮到成員位置，但不寫入磁碟
+        member = self._member(path)
+        index = self.index()
+        if index.kinds[member] != KIND_FILE:
+            raise IsADirectoryError(f"不是檔案：{path}")
+        if self.archive_type == ARCHIVE_ZIP:
+            return self._open_zip_member(index.locators[member])
+        stream = _open_decompressed(self.archive_path)
+        stream.seek(index.locators[member])
+        return _LimitedReader(stream, index.sizes[member])
+
+    @traced("archive.extract")
+    def extract(self, paths: list[str], dst_dir: str, progress: CopyProgress) -> None:
+        # 把成員（或整個資料夾）串流寫到 dst_dir，其他成員不解壓縮
+        index = self.index()
+        plan: list[tuple[int, str]] = []
+        for path in paths:
+            progress.checkpoint()
+            member = index.lookup.get(self.inner(path))
+            if member is None and path != self.archive_path:
+                progress.add_error(f"壓縮檔中沒有此項目：{path}")
+                continue
+            name = os.path.basename(path)
+            if path == self.archive_path:
+                # 整個壓縮檔：以去掉副檔名的檔名為資料夾
+                name = name.partition(".")[0] or name
+            dst = unique_destination(os.path.join(dst_dir, name))
+            if member is not None and index.kinds[member] == KIND_FILE:
+                plan.append((member, dst))
+                continue
+            if member is not None and index.kinds[member] != KIND_DIR:
+                continue
+            inner = self.inner(path)
+            prefix = len(inner) + 1 if inner else 0
+            try:
+                os.makedirs(dst)
+                for child in index.descendants(inner):
+                    target = os.path.join(dst, *index.names[child][prefix:].split("/"))
+                    if index.kinds[child] == KIND_DIR:
+                        os.makedirs(target, exist_ok=True)
+                    elif index.kinds[child] == KIND_FILE:
+                        plan.append((child, target))
+            except OSError as e:
+                progress.add_error(f"{dst}：{e}")
+        for member, _ in plan:
+            progress.add_found(index.sizes[member])
+        if self.archive_type == ARCHIVE_ZIP:
+            import zipfile
+
+            for member, dst in plan:
+                progress.checkpoint()
+                try:
+                    with self._open_zip_member(index.locators[member]) as src:
+                        self._write_member(src, dst, progress)
+                except (OSError, zipfile.BadZipFile) as e:
+                    progress.add_error(f"{dst}：{e}")
+            return None
+        # tar：依資料位移排序，整個工作只需要解壓縮串流一次
+        plan.sort(key=lambda item: index.locators[item[0]])
+        with _open_decompressed(self.archive_path) as stream:
+            for member, dst in plan:
+                progress.checkpoint()
+                try:
+                    stream.seek(index.locators[member])
+                    reader = _LimitedReader(stream, index.sizes[member], close=False)
+                    self._write_member(reader, dst, progress)
+                except (OSError, EOFError) as e:
+                    progress.add_error(f"{dst}：{e}")
+        return None
+
+    def _write_member(self, src, dst: str, progress: CopyProgress) -> None:
+        try:
+            with open(dst, "xb") as f:
+                while True:
+                    progress.checkpoint()
+                    chunk = src.read(extract_chunk_size)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    progress.add_bytes(len(chunk))
+        except (CopyCancelledError, OSError):
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            raise
+        progress.file_done()
+
+
+class _LimitedReader:
+    # 只讀取串流中接下來的 size 位元組
+    def __init__(self, stream: BinaryIO, size: int, close: bool = True) -> None:
+        self._stream = stream
+        self._remaining = size
+        self._close = close
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._stream.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        if self._close:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class VirtualFileSystem:
+    def __init__(self, cache_root: str | None = None) -> None:
+        self.local_fs = LocalFS()
+        self._cache_root = cache_root
+        self._lock = threading.Lock()
+        # 壓縮檔路徑 -> ArchiveFS，最近使用的在最後
+        self._archives: OrderedDict[str, ArchiveFS] = OrderedDict()
+
+    def archive_path_of(self, path: str) -> str | None:
+        # 路徑中第一個名稱符合壓縮檔副檔名且為檔案的部分；只有名稱符合時才 stat
+        parts = path.split(os.sep)
+        for end in range(1, len(parts) + 1):
+            if not archive_format(parts[end - 1]):
+                continue
+            candidate = os.sep.join(parts[:end]) or os.sep
+            if candidate in self._archives or os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def is_virtual(self, path: str) -> bool:
+        archive_path = self.archive_path_of(path)
+        return archive_path is not None and archive_path != path
+
+    def is_archive(self, path: str) -> bool:
+        return self.archive_path_of(path) == path
+
+    def filesystem_for(self, path: str) -> LocalFS | ArchiveFS:
+        archive_path = self.archive_path_of(path)
+        if archive_path is None:
+            return self.local_fs
+        with self._lock:
+            fs = self._archives.get(archive_path)
+            if fs is None:
+                fs = ArchiveFS(archive_path, self._cache_root)
+                self._archives[archive_path] = fs
+                while len(self._archives) > archive_open_limit:
+                    _, old = self._archives.popitem(last=False)
+                    old.close()
+            self._archives.move_to_end(archive_path)
+        return fs
+
+    def extract(self, paths: list[str], dst_dir: str, progress: CopyProgress) -> None:
+        # 來源可以來自不同的壓縮檔，依壓縮檔分組
+        if not os.path.isdir(dst_dir):
+            progress.add_error(f"目標不是資料夾：{dst_dir}")
+            return None
+        groups: dict[str, list[str]] = {}
+        for path in paths:
+            archive_path = self.archive_path_of(path)
+            if archive_path is None:
+                progress.add_error(f"不在壓縮檔中：{path}")
+                continue
+            groups.setdefault(archive_path, []).append(path)
+        for archive_path, members in groups.items():
+            try:
+                self.filesystem_for(archive_path).extract(members, dst_dir, progress)
+            except CopyCancelledError:
+                raise
+            except OSError as e:
+                progress.add_error(f"{archive_path}：{e}")
+        return None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for fs in self._archives.values():
+                fs.close()
+            self._archives.clear()
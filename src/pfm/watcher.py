@@ -0,0 +1,237 @@
+import ctypes
+import logging
+import os
+import queue
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+
+from dir_model import KIND_DIR, KIND_FILE, KIND_OTHER, KIND_SYMLINK
+from listing_cache import DirStamp, dir_stamp
+
+pfm_logger = logging.getLogger("positive_file_manager_logger")
+
+# 監看目前顯示的資料夾，變更以 (generation, 類型, 內容) 放入佇列，由 UI 執行緒每幀取出。
+# 類型："changes"（內容為 (DirStamp, [(檔名, (kind, size, mtime) 或 None)])，None 代表已不存在）、
+# "overflow"（事件遺失或資料夾本身被刪除 / 移動，需要重新讀取）
+WATCH_CHANGES = "changes"
+WATCH_OVERFLOW = "overflow"
+
+# 收到第一個事件後再等待這段時間 (秒)，把一連串事件合併成一次變更
+watch_coalesce_delay = 0.1
+# 沒有 inotify 時重新列出資料夾比對的間隔 (秒)
+watch_poll_interval = 1.0
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+
+_watch_mask = (
+    IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+_reload_mask = IN_DELETE_SELF | IN_MOVE_SELF | IN_Q_OVERFLOW | IN_IGNORED
+_event_header = struct.Struct("iIII")
+
+_libc = None
+
+
+def _inotify_libc():
+    # ctypes.util 會匯入 subprocess，第一次監看時才在監看執行緒匯入，不拖慢啟動
+    global _libc
+    if _libc is None and sys.platform.startswith("linux"):
+        import ctypes.util
+
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+        except (OSError, AttributeError):
+            libc = False
+        _libc = libc
+    return _libc or None
+
+
+def entry_info(path: str) -> tuple[int, int, int] | None:
+    # 與 DirectoryModel 相同的 kind 位元、size 與 mtime(ns)，檔案不存在時回傳 None。
+    # 在監看執行緒 stat，UI 執行緒依大小或時間排序插入時不需要再 stat
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    kind = KIND_OTHER
+    if stat.S_ISLNK(st.st_mode):
+        kind |= KIND_SYMLINK
+        try:
+            st = os.stat(path)
+        except OSError:
+            return kind, 0, 0
+    if stat.S_ISDIR(st.st_mode):
+        kind |= KIND_DIR
+    elif stat.S_ISREG(st.st_mode):
+        kind |= KIND_FILE
+    return kind, st.st_size, st.st_mtime_ns
+
+
+class DirectoryWatcher:
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._stop_event: threading.Event | None = None
+        self.generation = 0
+
+    def watch(self, path: str) -> int:
+        self.stop()
+        self.generation += 1
+        self._stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self._inotify_worker,
+            args=(path, self.generation, self._stop_event),
+            name=f"pfm-watcher-{self.generation}",
+            daemon=True,
+        )
+        thread.start()
+        return self.generation
+
+    def stop(self) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+            self._stop_event = None
+            self.generation += 1
+
+    def poll(self, max_items: int = 16) -> list[tuple[str, object]]:
+        messages = []
+        while len(messages) < max_items:
+            try:
+                generation, kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            messages.append((kind, payload))
+        return messages
+
+    def _emit(self, path: str, generation: int, stamp: DirStamp, names) -> None:
+        # 只 stat 有事件的檔名，成本與變更數量成正比，與資料夾大小無關
+        changes = [(name, entry_info(os.path.join(path, name))) for name in names]
+        self._queue.put((generation, WATCH_CHANGES, (stamp, changes)))
+
+    def _inotify_worker(
+        self, path: str, generation: int, stop_event: threading.Event
+    ) -> None:
+        # 尋找 libc 需要執行 ldconfig，在監看執行緒進行；沒有 inotify 時改用輪詢
+        libc = _inotify_libc()
+        if libc is None:
+            self._poll_worker(path, generation, stop_event)
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            pfm_logger.warning("inotify 無法使用，改用輪詢：「 %s 」", path)
+            self._poll_worker(path, generation, stop_event)
+            return None
+        try:
+            if libc.inotify_add_watch(fd, os.fsencode(path), _watch_mask) < 0:
+                err = ctypes.get_errno()
+                pfm_logger.warning(
+                    "無法監看資料夾，改用輪詢：「 %s 」，%s", path, os.strerror(err)
+                )
+                self._poll_worker(path, generation, stop_event)
+                return None
+            while not stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if not readable:
+                    continue
+                # 先取得 stamp 再讀取事件，之後的變更會產生新的事件
+                try:
+                    stamp = dir_stamp(path)
+                except OSError:
+                    self._queue.put((generation, WATCH_OVERFLOW, None))
+                    return None
+                time.sleep(watch_coalesce_delay)
+                names: dict[str, None] = {}
+                overflow = False
+                while True:
+                    try:
+                        data = os.read(fd, 64 * 1024)
+                    except BlockingIOError:
+                        break
+                    offset = 0
+                    while offset < len(data):
+                        _, mask, _, size = _event_header.unpack_from(data, offset)
+                        offset += _event_header.size
+                        if mask & _reload_mask:
+                            overflow = True
+                        elif size:
+                            raw = data[offset : offset + size].rstrip(b"\0")
+                            names[os.fsdecode(raw)] = None
+                        offset += size
+                if stop_event.is_set():
+                    return None
+                if overflow:
+                    self._queue.put((generation, WATCH_OVERFLOW, None))
+                    if not os.path.isdir(path):
+                        return None
+                    continue
+                if names:
+                    self._emit(path, generation, stamp, names)
+        finally:
+            os.close(fd)
+        return None
+
+    def _poll_worker(
+        self, path: str, generation: int, stop_event: threading.Event
+    ) -> None:
+        # 沒有 inotify 時的備援：每次重新列出並比對檔名與每個項目的 (size, mtime)。
+        # 就地改寫的檔案不會改變資料夾的 mtime，只比對資料夾 mtime 會漏掉
+        try:
+            entries = _entry_stats(path)
+        except OSError:
+            return None
+        while not stop_event.wait(watch_poll_interval):
+            try:
+                stamp = dir_stamp(path)
+                new_entries = _entry_stats(path)
+            except OSError:
+                self._queue.put((generation, WATCH_OVERFLOW, None))
+                return None
+            changed = [
+                name
+                for name in entries.keys() | new_entries.keys()
+                if entries.get(name) != new_entries.get(name)
+            ]
+            entries = new_entries
+            if changed:
+                self._emit(path, generation, stamp, changed)
+        return None
+
+
+def _entry_stats(path: str) -> dict[str, tuple[int, int]]:
+    # 檔名 -> (size, mtime(ns))，不追蹤符號連結
+    entries = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            entries[entry.name] = (st.st_size, st.st_mtime_ns)
+    return entries